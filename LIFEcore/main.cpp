@@ -9,14 +9,65 @@
  * ([target_X,target_Y]).
  * 
  * Command:
- * life <in_filename> <max_it_s> <target_X> <target_Y> <out_filename> 
+ * life <in_filename> <max_it_s> <target_X> <target_Y> [<target_X> <target_Y>
+ *      ...] <out_filename> 
  * 
  * With SAVEVIDEO flag set to TRUE:
- * life <in_filename> <max_it_s> <target_X> <target_Y> <out_filename> <folder>
+ * life <in_filename> <max_it_s> <target_X> <target_Y> [...] <out_filename> 
+ *      <folder>
+ * 
+ * Every grid is simulated once for all its targets: the run goes on until
+ * every target is reached or another rule stops it, and the metrics of a
+ * target are frozen when it is reached, so they are those of a separate run
+ * with that target only. One record of metrics is given per target, in order.
+ * 
+ * Worker mode (not available with SAVEVIDEO):
+ * life --worker
+ * 
+ * In worker mode the process stays alive and serves simulation requests read
+ * from stdin until EOF. Every request is a uint32 payload length followed by
+ * the payload: int32 max_it, size, the number of targets K and the K pairs
+ * target_X, target_Y, then the size rows of the grid (borders included), each
+ * packed in (size+63)/64 uint64 words, column j being bit j%64 of word j/64.
+ * For every request, K records of seven int32 (the metrics and stop reason,
+ * same content and order as <out_filename>) are written to stdout. All
+ * integers use the native byte order.
+ * 
+ * Shared library (compiled with the LIBRARY flag, see README.md):
+ * int evaluate_batch(const uint8_t *grids, int count, int size, int max_it,
+ *                    const int32_t *targets, int target_count,
+ *                    int32_t *results)
+ * 
+ * Simulates @count grids of @size x @size cells (borders included, one byte
+ * per cell, row major, contiguous) for the @target_count pairs target_X,
+ * target_Y of @targets and writes @target_count records of seven int32
+ * (metrics and stop reason) per grid in @results. The grid size is only known
+ * at runtime and the function does not use any global state, so it can be
+ * called from several threads at once. Returns 0, or -1 for invalid
+ * arguments.
+ * 
+ * Shared memory mode (not available with SAVEVIDEO):
+ * life --shm <name> <capacity>
+ * 
+ * Same as worker mode, but grids and metrics are exchanged through the POSIX
+ * shared memory object <name> created by the caller, laid out as: int32
+ * max_it, size, K and the K target pairs, padded to a multiple of 8 bytes;
+ * <capacity> bit-packed grids of that size (rows packed as in worker mode);
+ * <capacity> times K records of seven int32. Requests read from stdin are a
+ * uint32 count of grids to simulate, found at the beginning of the grids
+ * area; once their metrics are in the records area the same count is written
+ * back to stdout. The header is read again for every request and the object
+ * must hold <capacity> grids of that size and their records.
+ * 
+ * The grid size is a run parameter in every mode: the executables take it
+ * from the input file, the worker modes from every request and the library
+ * from its arguments. Grids are simulated in buffers aligned to cache lines,
+ * with rows padded to whole cache lines.
  * 
  * Input:
- *  - <in_filename>   File with a @N_VALUE x @N_VALUE square matrics of 0/1 
- *                    values representing LIFE's grid.
+ *  - <in_filename>   File with a n x n square matrix of 0/1 values 
+ *                    representing LIFE's grid (borders excluded), one row per
+ *                    line; the number of lines sets the grid size.
  *  - <max_it>        Maximum number of LIFE iterations to execute
  *  - <target_X>      X coordinate of the Target
  *  - <target_Y>      Y coordinate of the Target
@@ -29,6 +80,10 @@
  *                    automaton(group of alive cells) and the target
  *  - <size>          Final Size of the bounding box containing the alive cells
  *  - <iterations>    Number of iterations required to reach the end of the sim.
+ *  - <max size>, <average size>, <min distance> over all the iterations
+ *  - <stop reason>   Why the simulation stopped: 0 target reached, 1 death,
+ *                    2 static, 3 period 2, 4 max_it iterations run
+ *                    (profiling.STOP_REASONS of the Python side)
  * 
  *
  * File:   main.cpp
@@ -46,6 +101,16 @@
 #include <fstream>
 #include <string>
 #include <string.h> //memset
+#include <stdint.h>
+#include <climits>
+#include <memory>
+#include <new>
+#include <vector>
+#if !defined(SAVEVIDEO) && !defined(LIBRARY)
+#include <fcntl.h>     //shm_open
+#include <sys/mman.h>  //mmap
+#include <sys/stat.h>  //fstat
+#endif
 
 /*----------------------------------------------------------------------------*/
 /* PRECOMPILER FLAGS                                                          */
@@ -53,58 +118,127 @@
 
 //#define VERBOSE   // Compile this for verbose output and display (debug only)
 //#define SAVEVIDEO   // Compile with this flag to produce the image animation
+//#define LIBRARY     // Compile with this flag (and -shared) to build liblifecore
 
 /*----------------------------------------------------------------------------*/
 /* CONSTANTS                                                                  */
 /*----------------------------------------------------------------------------*/
 
-#define N_VALUE 40  // Effective grid size (Check coherency with EC script
-unsigned const short R_SIZE = N_VALUE + 2;  //RealGridSize, accounts for borders
 unsigned const short min_bound = 1;         //First effective row/column
-unsigned const short max_bound = R_SIZE-1;  //Last effective row/column
+const int METRICS = 7;                      //Computed metrics, stop reason last
+const int HEADER = 3;                       //Request fields before the targets
+const size_t CACHE_LINE = 64;               //Alignment of the grid buffers
 
 using namespace std;
 
+/* Why a simulation stopped, the last of its metrics */
+enum StopReason { STOP_REACHED, STOP_DIED, STOP_STATIC, STOP_PERIODIC, 
+                  STOP_TIMEOUT };
+
 /*----------------------------------------------------------------------------*/
 /* FUNCTION DECLARATIONS                                                      */
 /*----------------------------------------------------------------------------*/
 
+/* Square game board of @size x @size cells (borders included), row major, 
+ * rows @stride cells apart */
+struct Grid {
+    bool *cells;
+    short size;
+    int stride;
+    bool* operator[](int i) const { return cells + (size_t)i*stride; }
+    short max_bound() const { return size-1; }  //Last effective row/column
+};
+
+/* Cache-aligned, zero-filled storage for @count grids of @size x @size cells
+ * and @extra more cells, every row padded to whole cache lines */
+class GridBuffer {
+public:
+    GridBuffer(int size, int count, size_t extra = 0);
+    ~GridBuffer() { free(data); }
+    GridBuffer(const GridBuffer&) = delete;
+    GridBuffer& operator=(const GridBuffer&) = delete;
+    Grid grid(int k) const { return {data + k*cells, (short)size, stride}; }
+    bool* end() const { return data + count*cells; }  //The @extra cells
+    int size, count, stride;
+    size_t cells;
+private:
+    bool *data;
+};
+
+/**
+ * Number of uint64 words of a bit-packed row of @size cells
+ * @param size
+ * @return 
+ */
+inline int row_words(int size){ return (size + 63) / 64; }
+
+/**
+ * Fill @grid with the bit-packed rows @words (worker and shared memory modes)
+ * @param grid
+ * @param words   @grid.size rows of row_words(@grid.size) words
+ */
+void unpack_grid(Grid grid, const uint64_t* words);
+
 #ifdef VERBOSE
-void display(bool grid[][R_SIZE])  
-void display2(bool grid[][R_SIZE],int it, int jt);
+void display(Grid grid);
+void display2(Grid grid,int it, int jt);
 #endif
 
 #ifdef SAVEVIDEO
-void save_img(bool grid[][R_SIZE], string filename, int magnification, 
+void save_img(Grid grid, string filename, int magnification, 
               short targetX, short targetY);
 #endif
 
 struct Boundaries {
-    short min_i = max_bound, max_i= min_bound;
-    short min_j = max_bound, max_j = min_bound;
+    short min_i, max_i, min_j, max_j;
+    explicit Boundaries(short max_bound) : min_i(max_bound), max_i(min_bound),
+                                           min_j(max_bound), max_j(min_bound) {}
 };
 
+/* Smallest rectangle containing all the alive cells (empty if top > bottom) */
+struct Region {
+    short top = SHRT_MAX, bottom = min_bound-1;
+    short left = SHRT_MAX, right = min_bound-1;
+};
+
+/**
+ * Smallest rectangle containing both @a and @b
+ * @param a
+ * @param b
+ * @return 
+ */
+Region merge(Region a, Region b);
+
+/**
+ * Compute the region of the alive cells scanning the whole grid
+ * @param grid
+ * @return 
+ */
+Region compute_region(Grid grid);
+
 /**
  * Copy @gridOne into @gridTwo
  * @param gridOne structure to copy
  * @param gridTwo scructure where to copy
+ * @param area    region holding every alive cell of both grids
  */
-void copygrid(bool gridOne[R_SIZE][R_SIZE], bool gridTwo[R_SIZE][R_SIZE]);
+void copygrid(Grid gridOne, Grid gridTwo, Region area);
 
 /**
  * Check if two grids are equal
  * @param gridOne
  * @param gridTwo
+ * @param area    region holding every alive cell of both grids
  * @return 
  */
-bool boolgridequal(bool gridOne[R_SIZE][R_SIZE], bool gridTwo[R_SIZE][R_SIZE]);
+bool boolgridequal(Grid gridOne, Grid gridTwo, Region area);
 
 /**
  * Compute the boundaries (indexes) of the set of alive cells (automaton)
  * @param grid
  * @param b
  */
-Boundaries compute_bounds(bool grid[R_SIZE][R_SIZE]);
+Boundaries compute_bounds(Grid grid);
 
 /**
  * Compute the center of the bounding box of the automaton
@@ -134,11 +268,84 @@ int automatonsize(Boundaries b);
 
 /**
  * Simulate one iteration of LIFE
- * @param grid  game board
- * @return      number of alive cells
+ * Only the cells of @region, grown by one cell, can be alive after the update,
+ * so the rest of the grid is left untouched.
+ * @param grid    game board
+ * @param region  region of the alive cells, updated for the new generation
+ * @param b       boundaries of the new generation (same as compute_bounds)
+ * @param rows    scratch space for two rows of the grid
+ * @return        number of alive cells
  */
-int update(bool grid[][R_SIZE]);
+int update(Grid grid, Region &region, Boundaries &b, bool *rows);
 
+/**
+ * Run the simulation on @grid and compute the metrics of every target
+ * @param grid      initial configuration, overwritten with the final one
+ * @param max_it    maximum number of LIFE iterations
+ * @param targets   @count pairs targetX, targetY
+ * @param count
+ * @param results   @count records of computed metrics (distance, final size,
+ *                  iterations, max size, average size, min distance, stop 
+ *                  reason)
+ */
+#ifdef SAVEVIDEO
+void simulate(Grid grid, int max_it, const int *targets, int count,
+              int *results, string folder);
+#else
+void simulate(Grid grid, int max_it, const int *targets, int count,
+              int *results);
+#endif
+
+/**
+ * Check the @count targets of @targets against a grid of @size cells
+ * @return      true if every target is inside the grid
+ */
+bool valid_targets(const int *targets, int count, int size);
+
+#if !defined(SAVEVIDEO) && !defined(LIBRARY)
+/**
+ * Serve bit-packed simulation requests from stdin until EOF (worker mode)
+ * @return      program state
+ */
+int worker();
+
+/**
+ * Serve simulation requests through the shared memory object @name until EOF
+ * on stdin (shared memory mode)
+ * @param name      name of the POSIX shared memory object
+ * @param capacity  number of grids that fit in the shared memory object
+ * @return          program state
+ */
+int shared_worker(const char* name, int capacity);
+#endif
+
+#ifdef LIBRARY
+extern "C" int evaluate_batch(const uint8_t *grids, int count, int size,
+                              int max_it, const int32_t *targets, 
+                              int target_count, int32_t *results){
+  if(size < 3 || size > SHRT_MAX || count < 0 || max_it < 0 ||
+     !valid_targets(targets,target_count,size))
+    return -1;
+  const size_t cells = (size_t)size*size;
+  const size_t record = (size_t)target_count*METRICS;
+  GridBuffer board(size,1);
+  Grid grid = board.grid(0);
+  vector<int> metrics(record);
+  
+  for(int g=0; g<count; ++g){
+    const uint8_t* initial = grids + g*cells;
+    for(int i=0; i<size; ++i)
+      for(int j=0; j<size; ++j)
+        grid[i][j] = initial[(size_t)i*size + j] != 0;
+    
+    simulate(grid,max_it,targets,target_count,metrics.data());
+    
+    for(size_t m=0; m<record; ++m)
+      results[g*record + m] = metrics[m];
+  }
+  return 0;
+}
+#else
 /**
  * Main routine
  * @param argc
@@ -150,24 +357,26 @@ int main(int argc, char** argv)
   // READ CLI PARAMETERS
   
 #ifdef SAVEVIDEO
-  if(argc != 7){
-    fprintf( stderr, "Error: wrong argument number\n");
-    return -1;
-  }
+  const int outputs = 2;    // <out_filename> <folder>
 #else
-  if(argc != 6){
+  const int outputs = 1;    // <out_filename>
+  if(argc == 2 && string(argv[1]) == "--worker")
+    return worker();
+  if(argc == 4 && string(argv[1]) == "--shm")
+    return shared_worker(argv[2],std::stoi(argv[3]));
+#endif
+  // in_filename, max_it, pairs of targets and the outputs
+  const int target_args = argc - 3 - outputs;
+  if(target_args < 2 || target_args % 2 != 0){
     fprintf( stderr, "Error: wrong argument number\n");
     return -1;
   }
-#endif
   
   string  in_filename = argv[1];
   string  max_it_s = argv[2];
-  string  targetX_s = argv[3];
-  string  targetY_s = argv[4];
-  string  out_filename = argv[5];
+  string  out_filename = argv[3 + target_args];
 #ifdef SAVEVIDEO
-  string  folder = argv[6];  
+  string  folder = argv[4 + target_args];  
 #endif
   
   #ifdef VERBOSE
@@ -175,46 +384,215 @@ int main(int argc, char** argv)
   #endif
   
   int max_it = std::stoi(max_it_s);
-  int targetX = std::stoi(targetX_s);
-  int targetY = std::stoi(targetY_s);
+  const int target_count = target_args / 2;
+  vector<int> targets(target_args);
+  for(int t=0; t<target_args; ++t)
+    targets[t] = std::stoi(argv[3 + t]);
   
   #ifdef VERBOSE
     printf("max_it: %d\n",max_it);
-    printf("targetX: %d\n",targetX);
-    printf("targetY: %d\n",targetY);
+    for(int k=0; k<target_count; ++k)
+      printf("target: %d %d\n",targets[2*k],targets[2*k+1]);
   #endif
     
-  bool grid[R_SIZE][R_SIZE] = {false};
-  int linenumber = 0;
+  vector<string> lines;
   string line;
   ifstream myfile(in_filename);
   if (myfile.is_open())
   {
     while ( getline (myfile,line) )
-    {
-      const char* cline;
-      cline = line.c_str();
-      for(int j=0; j<R_SIZE; ++j){
-        grid[linenumber+min_bound][j+min_bound] = (*(cline+j) == '1'?true:false);
-      } 
-      linenumber++;
-    }
+      lines.push_back(line);
     myfile.close();
   }else{
     fprintf(stderr,"ERROR: unable to open file!\n"); 
     return -1;
   }
+  // One line per row of the effective grid
+  const int n = lines.size();
+  if(n < 1 || n + 2 > SHRT_MAX){
+    fprintf(stderr,"ERROR: bad grid size %d\n",n); 
+    return -1;
+  }
+  if(!valid_targets(targets.data(),target_count,n + 2)){
+    fprintf(stderr,"ERROR: target out of the grid\n"); 
+    return -1;
+  }
+  GridBuffer grid(n + 2,1);
+  Grid board = grid.grid(0);
+  for(int i=0; i<n; ++i)
+    for(int j=0; j<n && j<(int)lines[i].size(); ++j)
+      board[i+min_bound][j+min_bound] = (lines[i][j] == '1'?true:false);
+  
+  vector<int> results(target_count*METRICS);
+#ifdef SAVEVIDEO
+  simulate(board,max_it,targets.data(),target_count,results.data(),folder);
+#else
+  simulate(board,max_it,targets.data(),target_count,results.data());
+#endif
+  
+  // one line per metric, the records of the targets one after the other
+  FILE * fp;
+  fp = fopen (out_filename.c_str(),"w");
+  for(size_t m=0; m<results.size(); ++m)
+    fprintf(fp,"%d\n",results[m]);
+  fclose (fp);
   
-  bool reached = false;
-  int iterations;
+  return 0;
+}
+#endif
+
+#if !defined(SAVEVIDEO) && !defined(LIBRARY)
+int worker(){
+  uint32_t length;
+  int32_t header[HEADER];
+  vector<int32_t> targets;
+  vector<uint64_t> words;
+  vector<int32_t> records;
+  vector<int> results;
+  std::unique_ptr<GridBuffer> grid;
+  
+  while(fread(&length,sizeof(length),1,stdin) == 1){
+    if(fread(header,sizeof(int32_t),HEADER,stdin) != HEADER){
+      fprintf(stderr,"ERROR: truncated request\n");
+      return -1;
+    }
+    const int size = header[1];
+    const int target_count = header[2];
+    if(size < 3 || size > SHRT_MAX || target_count < 1 || 
+       target_count > SHRT_MAX){
+      fprintf(stderr,"ERROR: bad grid size %d or target count %d\n",size,
+              target_count);
+      return -1;
+    }
+    targets.resize(2*target_count);
+    if(fread(targets.data(),sizeof(int32_t),targets.size(),stdin) != 
+       targets.size()){
+      fprintf(stderr,"ERROR: truncated request\n");
+      return -1;
+    }
+    if(!valid_targets(targets.data(),target_count,size)){
+      fprintf(stderr,"ERROR: target out of the grid\n");
+      return -1;
+    }
+    const size_t grid_words = (size_t)size*row_words(size);
+    const uint32_t payload_size = (HEADER + targets.size())*sizeof(int32_t) + 
+                                  grid_words*sizeof(uint64_t);
+    if(length != payload_size){
+      fprintf(stderr,"ERROR: bad request length %u (expected %u)\n",length,
+              payload_size);
+      return -1;
+    }
+    words.resize(grid_words);
+    if(fread(words.data(),sizeof(uint64_t),grid_words,stdin) != grid_words){
+      fprintf(stderr,"ERROR: truncated request\n");
+      return -1;
+    }
+    if(!grid || grid->size != size)
+      grid.reset(new GridBuffer(size,1));
+    Grid board = grid->grid(0);
+    unpack_grid(board,words.data());
+    
+    results.resize(target_count*METRICS);
+    simulate(board,header[0],targets.data(),target_count,results.data());
+    
+    records.assign(results.begin(),results.end());
+    fwrite(records.data(),sizeof(int32_t),records.size(),stdout);
+    fflush(stdout);
+  }
+  return 0;
+}
+
+int shared_worker(const char* name, int capacity){
+  int fd = shm_open(name,O_RDWR,0);
+  struct stat info;
+  if(fd < 0 || fstat(fd,&info) != 0 || capacity < 0){
+    fprintf(stderr,"ERROR: unable to open shared memory %s\n",name);
+    return -1;
+  }
+  const size_t size = info.st_size;
+  char* memory = (char*)mmap(NULL,size,PROT_READ|PROT_WRITE,MAP_SHARED,fd,0);
+  close(fd);
+  if(memory == MAP_FAILED){
+    fprintf(stderr,"ERROR: unable to map shared memory %s\n",name);
+    return -1;
+  }
+  int32_t* header = (int32_t*)memory;
+  vector<int> results;
+  std::unique_ptr<GridBuffer> grid;
+  
+  uint32_t count;
+  while(fread(&count,sizeof(count),1,stdin) == 1){
+    // the layout of the grids and records follows the header of the request
+    const int grid_size = header[1];
+    const int target_count = header[2];
+    const size_t header_bytes = (HEADER + 2*(size_t)target_count + 1)/2*
+                                2*sizeof(int32_t);
+    const size_t grid_words = grid_size > 0 ? (size_t)grid_size*row_words(grid_size) : 0;
+    const size_t record = (size_t)target_count*METRICS;
+    const size_t needed = header_bytes + 
+                          capacity*(grid_words*sizeof(uint64_t) + record*sizeof(int32_t));
+    if(grid_size < 3 || grid_size > SHRT_MAX || target_count < 1 ||
+       target_count > SHRT_MAX || header_bytes > size || needed > size || 
+       count > (uint32_t)capacity || 
+       !valid_targets(header + HEADER,target_count,grid_size)){
+      fprintf(stderr,"ERROR: bad request (%u grids of size %d for %d targets, "
+              "at most %d fit in %zu bytes)\n",count,grid_size,target_count,
+              capacity,size);
+      return -1;
+    }
+    uint64_t* words = (uint64_t*)(memory + header_bytes);
+    int32_t* records = (int32_t*)(words + capacity*grid_words);
+    if(!grid || grid->size != grid_size)
+      grid.reset(new GridBuffer(grid_size,1));
+    Grid board = grid->grid(0);
+    results.resize(record);
+    for(uint32_t g=0; g<count; ++g){
+      unpack_grid(board,words + g*grid_words);
+      
+      simulate(board,header[0],header + HEADER,target_count,results.data());
+      
+      for(size_t m=0; m<record; ++m)
+        records[g*record + m] = results[m];
+    }
+    fwrite(&count,sizeof(count),1,stdout);
+    fflush(stdout);
+  }
+  munmap(memory,size);
+  return 0;
+}
+#endif
+
+#ifdef SAVEVIDEO
+void simulate(Grid grid, int max_it, const int *targets, int count,
+              int *results, string folder){
+#else
+void simulate(Grid grid, int max_it, const int *targets, int count,
+              int *results){
+#endif
+  /* Metrics of a target, frozen when it is reached */
+  struct Target {
+    bool reached;
+    int iterations, size, max_size, min_distance;
+    long int sizeaccumulator;
+  };
+  int iterations = 0;
   long int sizeaccumulator = 0;
   int max_size = 0;
   int partial_size = 0;
-  int min_distance = 0;
   int partial_distance = 0;
   int countTrue = 0;
-  bool previous_grid[R_SIZE][R_SIZE] = {false};
-  bool previous_previous_grid[R_SIZE][R_SIZE] = {false};
+  int pending = count;          // targets not reached yet
+  StopReason reason = STOP_TIMEOUT;
+  vector<Target> tracked(count);
+#if defined(VERBOSE) || defined(SAVEVIDEO)
+  const int targetX = targets[0], targetY = targets[1];  // the first one is drawn
+#endif
+  GridBuffer buffers(grid.size,2,2*(size_t)grid.size);
+  Grid previous_grid = buffers.grid(0);
+  Grid previous_previous_grid = buffers.grid(1);
+  bool *rows = buffers.end();   // scratch space of update()
+  Region region = compute_region(grid);
+  Region previous_region, previous_previous_region;
   
 #ifdef VERBOSE
     display2(grid,targetY,targetX);
@@ -231,25 +609,45 @@ int main(int argc, char** argv)
   max_size = automatonsize(automata_bounds);
   sizeaccumulator += max_size;
   // Distance
-  min_distance = chebyshev_distance(targetX,targetY,automata_bounds);
+  for(int k=0; k<count; ++k){
+    tracked[k].reached = false;
+    tracked[k].min_distance = chebyshev_distance(targets[2*k],targets[2*k+1],
+                                                 automata_bounds);
+  }
   
   for(int i = 0; i < max_it; i++){
     iterations = i+1;
-    copygrid(previous_grid,previous_previous_grid);
-    copygrid(grid,previous_grid);
+    copygrid(previous_grid,previous_previous_grid,
+             merge(previous_region,previous_previous_region));
+    previous_previous_region = previous_region;
+    copygrid(grid,previous_grid,merge(region,previous_region));
+    previous_region = region;
     /* Run one iteration of LIFE (update) */
-    countTrue = update(grid);
+    countTrue = update(grid,region,automata_bounds,rows);
     /*------------------------------------*/
     // Compute size
-    Boundaries automata_bounds = compute_bounds(grid);
     partial_size = automatonsize(automata_bounds);
     sizeaccumulator += partial_size;
     if(partial_size > max_size)
       max_size = partial_size;
-    // Compute distance
-    partial_distance = chebyshev_distance(targetX,targetY,automata_bounds);
-    if(partial_distance < min_distance)
-      min_distance = partial_distance;
+    // Compute distance, and freeze the metrics of the targets reached
+    for(int k=0; k<count; ++k){
+      Target &target = tracked[k];
+      if(target.reached)
+        continue;
+      partial_distance = chebyshev_distance(targets[2*k],targets[2*k+1],
+                                            automata_bounds);
+      if(partial_distance < target.min_distance)
+        target.min_distance = partial_distance;
+      if(grid[targets[2*k+1]][targets[2*k]] == true){
+        target.reached = true;
+        target.iterations = iterations;
+        target.size = partial_size;
+        target.max_size = max_size;
+        target.sizeaccumulator = sizeaccumulator;
+        pending--;
+      }
+    }
     
 #ifdef VERBOSE
       display2(grid,targetY,targetX);
@@ -260,12 +658,12 @@ int main(int argc, char** argv)
       save_img(grid,folder + zero_pad + to_string(iterations) + ".bmp",10,targetX,targetY);
 #endif
     /* Stopping*/
-    // 1. Target reached
-    if (grid[targetY][targetX] == true){
+    // 1. Target(s) reached
+    if (pending == 0){
       #ifdef VERBOSE
         printf("// Stopping: Target reached\n");
       #endif
-      reached = true;
+      reason = STOP_REACHED;
       break;
     }
     // 2. Death
@@ -273,60 +671,90 @@ int main(int argc, char** argv)
       #ifdef VERBOSE
         printf("// Stopping: Automata died at iteration %d\n", i);
       #endif
+      reason = STOP_DIED;
       break;
     }
     // 3. Static behaviour
-    if (boolgridequal(previous_grid,grid)){
+    if (boolgridequal(previous_grid,grid,merge(previous_region,region))){
       #ifdef VERBOSE
         printf("// Stopping: Automata became static at iteration %d\n", i);
       #endif
+      reason = STOP_STATIC;
       break;
     }
     // 4. Repetitive behaviour
-    if (boolgridequal(previous_previous_grid,grid)){
+    if (boolgridequal(previous_previous_grid,grid,
+                      merge(previous_previous_region,region))){
       #ifdef VERBOSE
         printf("// Stopping: Automata became repetitive at iteration %d\n", i);
       #endif
+      reason = STOP_PERIODIC;
       break;
     }
   }
    
-  Boundaries final_automata_bounds = compute_bounds(grid);
+  Boundaries final_automata_bounds = automata_bounds;
   
-  int distance = 0;
-  int final_size = 0;
-  int avg_size = 0;
-  
-  /// distance
-  if (reached)
-      distance = 0;
-  else
-      distance = chebyshev_distance(targetX,targetY,final_automata_bounds);
-  
-  /// Final automata size
-  final_size = automatonsize(final_automata_bounds);
+  for(int k=0; k<count; ++k){
+    const Target &target = tracked[k];
+    int *record = results + k*METRICS;
+    if(target.reached){
+      /// the metrics of a separate run stopped by this target
+      record[0] = 0;
+      record[1] = target.size;
+      record[2] = target.iterations;
+      record[3] = target.max_size;
+      record[4] = (int) target.sizeaccumulator / (target.iterations+1);
+      record[5] = target.min_distance;
+      record[6] = STOP_REACHED;
+      continue;
+    }
+    /// distance
+    record[0] = chebyshev_distance(targets[2*k],targets[2*k+1],
+                                   final_automata_bounds);
+    /// Final automata size
+    record[1] = automatonsize(final_automata_bounds);
+    /// iterations
+    record[2] = iterations;
+    /// Maximum automatasize
+    record[3] = max_size;
+    /// Average automatasize
+    record[4] = (int) sizeaccumulator / (iterations+1); //Sum 1 to account for init
+    /// Min distance
+    record[5] = target.min_distance;
+    record[6] = reason;
+  }
+}
 
-  /// iterations
-  //  iterations is already correct
-  
-  
-  /// Maximum automatasize
-  //  max_size already computed
-  
-  /// Average automatasize
-  avg_size = (int) sizeaccumulator / (iterations+1); //Sum 1 to account for init
-  
-  /// Min distance
-  // already computed
-  
-  FILE * fp;
-  fp = fopen (out_filename.c_str(),"w");
-  fprintf(fp,"%d\n%d\n%d\n%d\n%d\n%d\n", distance,final_size,iterations,max_size,
-                                     avg_size,min_distance); 
-  fclose (fp);
-  
-  return 0;
+bool valid_targets(const int *targets, int count, int size){
+  if(count < 1)
+    return false;
+  for(int t=0; t<2*count; ++t)
+    if(targets[t] < 0 || targets[t] >= size)
+      return false;
+  return true;
+}
+
+GridBuffer::GridBuffer(int size, int count, size_t extra)
+    : size(size), count(count){
+  stride = (size + CACHE_LINE - 1) / CACHE_LINE * CACHE_LINE;
+  cells = (size_t)size*stride;
+  const size_t bytes = (count*cells + extra + CACHE_LINE - 1) / CACHE_LINE * CACHE_LINE;
+  void* memory = NULL;
+  if(posix_memalign(&memory,CACHE_LINE,bytes) != 0)
+    throw std::bad_alloc();
+  data = (bool*)memory;
+  memset(data,0,bytes);
+}
+
+#if !defined(SAVEVIDEO) && !defined(LIBRARY)
+void unpack_grid(Grid grid, const uint64_t* words){
+  const int words_per_row = row_words(grid.size);
+  for(int i=0; i<grid.size; ++i)
+    for(int j=0; j<grid.size; ++j)
+      grid[i][j] = (words[i*words_per_row + j/64] >> (j%64)) & 1;
 }
+#endif
 
 int chebyshev_distance(short targetX, short targetY, Boundaries b){
   short xc,yc;
@@ -335,22 +763,50 @@ int chebyshev_distance(short targetX, short targetY, Boundaries b){
   return max(abs(xc - targetX),abs(yc - targetY));
 }
 
-void copygrid(bool gridOne[R_SIZE][R_SIZE], bool gridTwo[R_SIZE][R_SIZE]){
-  for (int i = min_bound; i < max_bound; i++) 
-    for (int j = min_bound; j < max_bound; j++) 
-      gridTwo[i][j] = gridOne[i][j];
+Region merge(Region a, Region b){
+  Region m;
+  m.top = min(a.top,b.top);
+  m.bottom = max(a.bottom,b.bottom);
+  m.left = min(a.left,b.left);
+  m.right = max(a.right,b.right);
+  return m;
+}
+
+Region compute_region(Grid grid){
+  const short max_bound = grid.max_bound();
+  Region r;
+  for(short i=min_bound; i < max_bound; ++i){
+    for(short j=min_bound; j < max_bound; ++j){
+      if(grid[i][j] == true){
+        r.top = min(r.top,i);
+        r.bottom = max(r.bottom,i);
+        r.left = min(r.left,j);
+        r.right = max(r.right,j);
+      }
+    }
+  }
+  return r;
 }
 
-bool boolgridequal(bool gridOne[R_SIZE][R_SIZE], bool gridTwo[R_SIZE][R_SIZE]){
-  for (int i = min_bound; i < max_bound; i++) 
-    for (int j = min_bound; j < max_bound; j++) 
-      if(gridTwo[i][j] != gridOne[i][j])
-        return false;
+void copygrid(Grid gridOne, Grid gridTwo, Region area){
+  if(area.left > area.right)
+    return;
+  for (int i = area.top; i <= area.bottom; i++) 
+    memcpy(gridTwo[i]+area.left,gridOne[i]+area.left,area.right-area.left+1);
+}
+
+bool boolgridequal(Grid gridOne, Grid gridTwo, Region area){
+  if(area.left > area.right)
+    return true;
+  for (int i = area.top; i <= area.bottom; i++) 
+    if(memcmp(gridTwo[i]+area.left,gridOne[i]+area.left,area.right-area.left+1) != 0)
+      return false;
   return true;
 }
 
-Boundaries compute_bounds(bool grid[R_SIZE][R_SIZE]){
-  Boundaries b;
+Boundaries compute_bounds(Grid grid){
+  const short max_bound = grid.max_bound();
+  Boundaries b(max_bound);
   for(short i=min_bound; i < max_bound; ++i){
     for(short j=min_bound; j < max_bound; ++j){
       if(grid[i][j] == true){
@@ -379,50 +835,74 @@ int automatonsize(Boundaries b){
 }
 
 
-int update(bool grid[][R_SIZE]){
-  for (int idx = min_bound; idx < max_bound; idx++) {
+int update(Grid grid, Region &region, Boundaries &b, bool *rows){
+  const short max_bound = grid.max_bound();
+  b = Boundaries(max_bound);
+  if(region.top > region.bottom)
+    return 0;
+  
+  for (int idx = region.top; idx <= region.bottom; idx++) {
     grid[idx][min_bound] = false;
     grid[idx][max_bound-1] = false;
+  }
+  for (int idx = region.left; idx <= region.right; idx++) {
     grid[min_bound][idx] = false;
     grid[max_bound-1][idx] = false;
   }
   
-  bool new_grid[R_SIZE][R_SIZE] = {};
-  copygrid(grid,new_grid);
+  // Cells that can be alive after the update
+  short top = max(region.top-1,(int)min_bound);
+  short bottom = min(region.bottom+1,max_bound-1);
+  short left = max(region.left-1,(int)min_bound);
+  short right = min(region.right+1,max_bound-1);
+  
+  // Rows are overwritten in place, so the previous generation of the row above
+  // and of the current row is kept aside
+  bool *above = rows, *current = rows + grid.size;
+  memcpy(above+left-1,grid[top-1]+left-1,right-left+3);
+  memcpy(current+left-1,grid[top]+left-1,right-left+3);
   
+  Region next;
   int countTrue = 0;
   
-  for (int i = min_bound; i < max_bound; i++) {
-    for (int j = min_bound; j < max_bound; j++) {
+  for (short i = top; i <= bottom; i++) {
+    bool *row = grid[i], *below = grid[i+1];
+    for (short j = left; j <= right; j++) {
       
-      int total = int(new_grid[i][j-1]) + int(new_grid[i][j+1]) +
-                            int(new_grid[i-1][j]) + int(new_grid[i+1][j]) +
-                            int(new_grid[i-1][j-1]) + int(new_grid[i-1][j+1]) +
-                            int(new_grid[i+1][j-1]) + int(new_grid[i+1][j+1]);
-      if(new_grid[i][j] == true){
-        if(total >= 2 and total <= 3){
-          grid[i][j] = true;
-          countTrue++;
-        }else{
-          grid[i][j] = false;
-        }
-      }else{
-        if (total == 3){
-          grid[i][j] = true;
-          countTrue++;
-        }else{
-          grid[i][j] = false;
-        }
+      int total = int(current[j-1]) + int(current[j+1]) +
+                            int(above[j]) + int(below[j]) +
+                            int(above[j-1]) + int(above[j+1]) +
+                            int(below[j-1]) + int(below[j+1]);
+      bool alive = (total == 3) || (current[j] && total == 2);
+      row[j] = alive;
+      if(alive){
+        countTrue++;
+        // same scan order and rules as compute_bounds
+        if(i < b.min_i)
+          b.min_i = i;
+        else if( i > b.max_i)
+          b.max_i = i;
+        if(j < b.min_j)
+          b.min_j= j;
+        else if(j > b.max_j)
+          b.max_j = j;
+        
+        next.top = min(next.top,i);
+        next.bottom = max(next.bottom,i);
+        next.left = min(next.left,j);
+        next.right = max(next.right,j);
       }
-      
     }
+    memcpy(above+left-1,current+left-1,right-left+3);
+    memcpy(current+left-1,below+left-1,right-left+3);
   }
+  region = next;
   return countTrue;
 }
-
   
 #ifdef VERBOSE
-  void display(bool grid[][R_SIZE]){
+  void display(Grid grid){
+    const short max_bound = grid.max_bound();
     for (int i = min_bound; i < max_bound; i++) {
       for (int j = min_bound; j < max_bound; j++) {
         if(grid[i][j] == true)
@@ -436,7 +916,8 @@ int update(bool grid[][R_SIZE]){
     }
   }
   
-  void display2(bool grid[][R_SIZE],int it, int jt){
+  void display2(Grid grid,int it, int jt){
+    const short max_bound = grid.max_bound();
     for (int i = min_bound; i < max_bound; i++) {
       for (int j = min_bound; j < max_bound; j++) {
         if(grid[i][j] == true)
@@ -474,17 +955,18 @@ int update(bool grid[][R_SIZE]){
 #define color2g 43
 #define color2b 43
   
-void save_img(bool grid[][R_SIZE], string filename, int magnification, short targetX, short targetY){
+void save_img(Grid grid, string filename, int magnification, short targetX, short targetY){
   FILE *fileimg;
-  short w = N_VALUE*magnification, h = N_VALUE*magnification;
+  const short n = grid.size - 2;  //Effective grid size
+  short w = n*magnification, h = n*magnification;
   unsigned char * img = NULL;
   int filesize = 54 + 3*w*h;  //w is your image width, h is image height, both int
 
   img = (unsigned char *)malloc(3*w*h);
   memset(img,0,3*w*h);
 
-  for(int i=0; i<N_VALUE*magnification; i++){
-    for(int j=0; j<N_VALUE*magnification; j++){ 
+  for(int i=0; i<n*magnification; i++){
+    for(int j=0; j<n*magnification; j++){ 
           short x=i, y=(j);
           bool c = grid[(i/magnification)+min_bound][(j/magnification)+min_bound];
           if(((i/magnification)+min_bound == targetY)&&((j/magnification)+min_bound == targetX)){
@@ -0,0 +1,218 @@
+#! /usr/bin/python3
+
+## @package bench
+#  Benchmarks of the evaluation pipeline.
+#
+#  Times the simulation engines (life.compute_fitness one candidate at a time
+#  and life.compute_fitness_batch on the whole population), the genotype
+#  utilities of life.py, the crossover and mutation operators of main.py and
+#  a whole generation of main.main(), over fixed-seed populations and sweeping
+#  population size, grid size and number of iterations.
+#
+#  Every measure is written to the output file as soon as it is taken, one
+#  JSON object per line (or one CSV row if the file name ends in .csv).
+#  The "digest" field identifies the results of the simulations, so that
+#  engines can be compared head-to-head on the same genotypes.
+#
+#  Usage: python bench.py --engines numpy bitpacked --populations 50 200
+#                         --sizes 40 100 --iterations 1000 --output bench.jsonl
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+from random import Random
+
+import numpy as np
+
+import life
+import hashlife
+
+FIELDS = ["benchmark","engine","population","N","iterations","seed","repeats",
+          "best","mean","per_item","digest","timestamp","python","numpy","cpus"]
+
+## Write the measures to @path as soon as they are taken
+class ResultWriter():
+    def __init__(self,path):
+        self.file = open(path,"a",newline="")
+        self.csv = None
+        if path.endswith(".csv"):
+            self.csv = csv.DictWriter(self.file,fieldnames=FIELDS)
+            if self.file.tell() == 0:
+                self.csv.writeheader()
+
+    def write(self,record):
+        if self.csv is not None:
+            self.csv.writerow(record)
+        else:
+            self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+## Population of @size random genotypes, the same for a given @seed
+def corpus(size,seed):
+    np.random.seed(seed)
+    return [np.reshape(life.get_random_genotype(),-1) for i in range(size)]
+
+## Best and mean time of @repeats calls of @function
+#
+#  @setup is called before every call, out of the measure.
+#  @return the two times and the value returned by the last call
+def measure(function,repeats,setup=None):
+    times = []
+    for i in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        value = function()
+        times.append(time.perf_counter() - start)
+    return min(times),sum(times) / len(times),value
+
+## Short digest of the fitness tuples, equal for engines that agree
+def digest(results):
+    values = [(float(final_distance),float(min_distance),float(final_size),float(max_size),
+               float(avg_size),float(iterations))
+              for (final_distance,min_distance),(final_size,max_size,avg_size),iterations in results]
+    return hashlib.sha1(repr(values).encode()).hexdigest()[:12]
+
+## Forget the state the engines keep between simulations
+def reset_engine():
+    hashlife.clear()
+
+## Time the simulation of @genotypes with every engine
+def bench_fitness(engines,genotypes,max_it,target,repeats,single):
+    for engine in engines:
+        life.ENGINE = engine
+        best,mean,results = measure(lambda: life.compute_fitness_batch(genotypes,max_it,target),
+                                    repeats,reset_engine)
+        yield "compute_fitness_batch",engine,best,mean,len(genotypes),digest(results)
+        if single:
+            best,mean,results = measure(lambda: [life.compute_fitness(genotype,max_it,target)
+                                                 for genotype in genotypes],repeats,reset_engine)
+            yield "compute_fitness",engine,best,mean,len(genotypes),digest(results)
+
+## Time the genotype utilities of life.py and the variators of main.py
+def bench_operators(genotypes,seed,repeats):
+    import main
+    best,mean,value = measure(lambda: [life.lifeiteration(genotype) for genotype in genotypes],repeats)
+    yield "lifeiteration",best,mean,len(genotypes)
+    best,mean,value = measure(lambda: [life.count_alive_cells(genotype) for genotype in genotypes],repeats)
+    yield "count_alive_cells",best,mean,len(genotypes)
+    best,mean,value = measure(lambda: life.lifeiteration_batch(genotypes),repeats)
+    yield "lifeiteration_batch",best,mean,len(genotypes)
+    best,mean,value = measure(lambda: life.count_alive_cells_batch(genotypes),repeats)
+    yield "count_alive_cells_batch",best,mean,len(genotypes)
+
+    args = {"crossover_rate": 1.0,"mutation_rate": 1.0,"flip_bias": 0.2}
+    pairs = list(zip(genotypes[::2],genotypes[1::2]))
+    for crossover in (main.UNIONcrossover,main.INTERcrossover,main.XORcrossover,main.SUBcrossover):
+        random = Random(seed)
+        best,mean,value = measure(lambda: [crossover(random,mom,dad,args) for mom,dad in pairs],repeats)
+        yield crossover.__name__,best,mean,len(pairs)
+
+    # mutation rates as in a run of main.py, the lifeiteration mutation always applied
+    for mutation,rate in ((main.life_flip_mutation,0.1),(main.resetrandom_mutation,0.1),
+                          (main.lifeiteration_mutation,1.0)):
+        random = Random(seed)
+        args["mutation_rate"] = rate
+        best,mean,value = measure(lambda: [mutation(random,genotype,args) for genotype in genotypes],repeats)
+        yield mutation.__name__,best,mean,len(genotypes)
+
+    # batched variators, on the whole population at once
+    args["numpy_random"] = np.random.default_rng(seed)
+    for crossover in (main.UNIONcrossover_batch,main.INTERcrossover_batch,
+                      main.XORcrossover_batch,main.SUBcrossover_batch):
+        random = Random(seed)
+        best,mean,value = measure(lambda: crossover(random,genotypes,args),repeats)
+        yield crossover.__name__,best,mean,len(pairs)
+    for mutation,rate in ((main.life_flip_mutation_batch,0.1),(main.resetrandom_mutation_batch,0.1),
+                          (main.lifeiteration_mutation_batch,1.0)):
+        random = Random(seed)
+        args["mutation_rate"] = rate
+        best,mean,value = measure(lambda: mutation(random,genotypes,args),repeats)
+        yield mutation.__name__,best,mean,len(genotypes)
+
+## Time one generation of main.main() with engine @engine
+#
+#  Checkpoints and the trajectory are not written, and the settings of the
+#  main module are restored afterwards.
+def bench_generation(engine,population,n,max_it,seed,repeats):
+    import main
+    settings = dict(populationSize=population,selectionSize=population,
+                    numElites=min(main.numElites,population),numberOfGenerations=1,
+                    evaluationWorkers=1,N=n,MAX_ITERATIONS=max_it,TARGET=(n-4,n-4),
+                    checkpointInterval=0,trajectoryFile=None,asyncObservers=False)
+    saved = {name: getattr(main,name) for name in settings}
+    life.ENGINE = engine
+
+    def setup():
+        reset_engine()
+        np.random.seed(seed)
+
+    try:
+        for name,value in settings.items():
+            setattr(main,name,value)
+        best,mean,value = measure(lambda: main.main(Random(seed),seed,False),repeats,setup)
+    finally:
+        for name,value in saved.items():
+            setattr(main,name,value)
+    return best,mean
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the evaluation pipeline")
+    parser.add_argument("--engines",nargs="+",default=["numpy","bitpacked","hashlife","sparse","worker"],
+                        help="simulation engines to compare (values of life.ENGINE)")
+    parser.add_argument("--populations",nargs="+",type=int,default=[50])
+    parser.add_argument("--sizes",nargs="+",type=int,default=[40],help="grid sizes N")
+    parser.add_argument("--iterations",nargs="+",type=int,default=[1000],help="MAX_ITERATIONS")
+    parser.add_argument("--seed",type=int,default=1)
+    parser.add_argument("--repeats",type=int,default=3)
+    parser.add_argument("--single",action="store_true",
+                        help="also time life.compute_fitness one candidate at a time")
+    parser.add_argument("--no-generation",action="store_true",help="skip the main() generation")
+    parser.add_argument("--output",default="bench.jsonl",help=".jsonl or .csv file, appended")
+    options = parser.parse_args(argv)
+
+    writer = ResultWriter(options.output)
+    environment = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "python": platform.python_version(),"numpy": np.__version__,
+                   "cpus": os.cpu_count()}
+
+    def report(benchmark,engine,population,n,max_it,best,mean,items,result_digest=""):
+        record = dict(benchmark=benchmark,engine=engine,population=population,N=n,
+                      iterations=max_it,seed=options.seed,repeats=options.repeats,
+                      best=best,mean=mean,per_item=best / max(items,1),digest=result_digest,
+                      **environment)
+        writer.write(record)
+        print("{0:28} {1:10} pop {2:5} N {3:4} it {4:6}  best {5:9.4f}s  mean {6:9.4f}s {7}".format(
+              benchmark,engine,population,n,max_it,best,mean,result_digest))
+
+    engine = life.ENGINE
+    try:
+        for population in options.populations:
+            genotypes = corpus(population,options.seed)
+            for n in options.sizes:
+                life.set_grid_size(n)
+                for benchmark,best,mean,items in bench_operators(genotypes,options.seed,options.repeats):
+                    report(benchmark,"",population,n,0,best,mean,items)
+                for max_it in options.iterations:
+                    target = (n-4,n-4)
+                    for benchmark,name,best,mean,items,result_digest in bench_fitness(
+                            options.engines,genotypes,max_it,target,options.repeats,options.single):
+                        report(benchmark,name,population,n,max_it,best,mean,items,result_digest)
+                    if not options.no_generation:
+                        for name in options.engines:
+                            best,mean = bench_generation(name,population,n,max_it,options.seed,options.repeats)
+                            report("main_generation",name,population,n,max_it,best,mean,population)
+    finally:
+        life.ENGINE = engine
+        writer.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,181 @@
+## @package checkpoint
+#  Snapshots of a running evolution, to resume it or to warm-start new runs.
+#
+#  A snapshot is a NumPy .npz archive holding the population (genotypes in
+#  population order, bit-packed unless they hold other values than 0 and 1
+#  as cartesian ones do, and their fitness), the generation and
+#  evaluation counters, AutomatonEvaluator.genCount, the state of the random
+#  generators and the fitness cache. It is written to a temporary file that
+#  replaces the previous snapshot only once complete, so a process killed
+#  while saving leaves the last snapshot intact.
+#
+#  Nothing is pickled, so loading a snapshot runs no code: the Mersenne
+#  Twister state of the random module is stored as its words, the other
+#  settings and the numpy generator state as JSON text, and the fitness cache
+#  keys and values as arrays of their integers and bytes. A value holds six
+#  integers per target, which the target in its key (life.target_key) tells.
+#
+#  Resuming restores everything, so that the run goes on as if it had never
+#  stopped: same random choices, same populations, same final result.
+
+import json
+import os
+
+import numpy as np
+
+""" Kinds of life.FitnessCache keys """
+KEY_DIES,KEY_MATRIX,KEY_CARTESIAN = 0,1,2
+
+## Kind, integers and bytes of the fitness cache @key
+def _split_key(key):
+    if key[0] == "dies":
+        n,max_it,target,bounds = key[1:]
+        return KEY_DIES,(n,max_it) + tuple(target) + tuple(bounds),b""
+    if len(key) == 5:
+        n,placement,max_it,target,data = key
+        return KEY_MATRIX,(n,) + tuple(placement) + (max_it,) + tuple(target),data
+    n,max_it,target,data = key
+    return KEY_CARTESIAN,(n,max_it) + tuple(target),data
+
+## Fitness cache key of the _split_key values
+def _join_key(kind,values,data):
+    values = tuple(int(value) for value in values)
+    if kind == KEY_DIES:
+        return ("dies",) + values[:2] + (values[2:-4],values[-4:])
+    if kind == KEY_MATRIX:
+        return (values[0],values[1:3],values[3],values[4:],data)
+    return (values[0],values[1],values[2:],data)
+
+## Arrays of the fitness cache @keys: kinds, concatenated integers and bytes,
+#  and the end of every key in both
+def _key_arrays(keys):
+    kinds,values,data = zip(*[_split_key(key) for key in keys]) if keys else ((),(),())
+    return dict(cache_kinds=np.array(kinds,dtype=np.uint8),
+                cache_ints=np.array([value for group in values for value in group],dtype=np.int64),
+                cache_ints_end=np.cumsum([len(group) for group in values],dtype=np.int64),
+                cache_bytes=np.frombuffer(b"".join(data),dtype=np.uint8),
+                cache_bytes_end=np.cumsum([len(chunk) for chunk in data],dtype=np.int64))
+
+## Fitness cache keys of the _key_arrays of @data
+def _keys(data):
+    ints,ints_end = data["cache_ints"],data["cache_ints_end"]
+    raw,bytes_end = data["cache_bytes"].tobytes(),data["cache_bytes_end"]
+    keys = []
+    for k,kind in enumerate(data["cache_kinds"]):
+        ints_start = ints_end[k-1] if k > 0 else 0
+        bytes_start = bytes_end[k-1] if k > 0 else 0
+        keys.append(_join_key(kind,ints[ints_start:ints_end[k]],raw[bytes_start:bytes_end[k]]))
+    return keys
+
+## Write the state of the evolution @ec, with problem @problem, to @path
+def save(path,ec,problem,seed):
+    candidates = np.array([np.reshape(individual.candidate,-1) for individual in ec.population])
+    binary = bool(np.isin(candidates,(0,1)).all())
+    cache = problem.cache
+    values = [np.ravel([distances[0],distances[1],sizes[0],sizes[1],sizes[2],iterations]).astype(np.int64)
+              for distances,sizes,iterations in cache.entries.values()]
+    version,words,gauss = ec._random.getstate()
+    state = {"seed": seed,
+             "random_version": version,
+             "random_gauss": gauss,
+             "numpy_random": ec._kwargs["numpy_random"].bit_generator.state,
+             "dtype": candidates.dtype.str,
+             "maximize": ec.maximize}
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory,exist_ok=True)
+    # per process, so that runs sharing a folder never write the same temporary file
+    temporary = "{0}.{1}.tmp".format(path,os.getpid())
+    with open(temporary,"wb") as f:
+        np.savez(f,
+                 candidates=np.packbits(candidates != 0,axis=1) if binary else candidates,
+                 binary=np.array(binary),
+                 length=np.array(candidates.shape[1]),
+                 fitness=np.array([individual.fitness for individual in ec.population],dtype=float),
+                 counters=np.array([ec.num_generations,ec.num_evaluations,problem.genCount,
+                                    cache.hits,cache.misses],dtype=np.int64),
+                 state=np.array(json.dumps(state)),
+                 random_words=np.array(words,dtype=np.uint32),
+                 cache_values=np.concatenate(values) if values else np.zeros(0,dtype=np.int64),
+                 cache_values_end=np.cumsum([len(value) for value in values],dtype=np.int64),
+                 **_key_arrays(list(cache.entries.keys())))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary,path)
+
+## Snapshot written by save()
+class Snapshot():
+    def __init__(self,path):
+        with np.load(path) as data:
+            state = json.loads(str(data["state"]))
+            length = int(data["length"])
+            candidates = data["candidates"]
+            if "binary" not in data or data["binary"]:
+                candidates = np.unpackbits(candidates,axis=1,count=length)
+            self.candidates = list(candidates.astype(np.dtype(state["dtype"])))
+            self.fitness = data["fitness"]
+            (self.num_generations,self.num_evaluations,self.genCount,
+             self.cache_hits,self.cache_misses) = (int(value) for value in data["counters"])
+            self.cache_keys = _keys(data)
+            values = data["cache_values"]
+            if "cache_values_end" in data:
+                self.cache_values = np.split(values,data["cache_values_end"][:-1])
+            else:
+                self.cache_values = list(values)
+            self.random_state = (state["random_version"],tuple(int(word) for word in data["random_words"]),
+                                 state["random_gauss"])
+        self.seed = state["seed"]
+        self.numpy_random_state = state["numpy_random"]
+        self.maximize = state["maximize"]
+
+    ## New numpy Generator, in the saved state
+    def numpy_random(self):
+        generator = np.random.default_rng()
+        generator.bit_generator.state = self.numpy_random_state
+        return generator
+
+    ## Put the saved entries in the fitness cache @cache
+    def restore_cache(self,cache):
+        for key,value in zip(self.cache_keys,self.cache_values):
+            # the target of the key: a single cell (ndim 1) or a list of cells
+            target = key[3] if len(key) == 5 else key[2]
+            if target[0] == 2:
+                value = np.reshape(value,(6,-1))
+            else:
+                value = value.tolist()
+            final_distance,min_distance,final_size,max_size,avg_size,iterations = value
+            cache.entries[key] = ((final_distance,min_distance),(final_size,max_size,avg_size),iterations)
+        while len(cache.entries) > cache.maxsize:
+            cache.entries.popitem(last=False)
+
+## Observer saving a snapshot every @interval generations
+#
+#  When resuming from @snapshot it must be the first observer: ea.evolve
+#  starts counting from 0 and evaluates the saved population again (from the
+#  fitness cache), the first call puts back the saved counters before the
+#  other observers and the terminator see them.
+class Checkpointer():
+    __name__ = "Checkpointer"    # inspyred logs the observers by name
+
+    def __init__(self,path,problem,seed,interval,snapshot=None):
+        self.path = path
+        self.problem = problem
+        self.seed = seed
+        self.interval = interval
+        self.snapshot = snapshot
+
+    def __call__(self,population,num_generations,num_evaluations,args):
+        ec = args["_ec"]
+        if self.snapshot is not None:
+            snapshot,self.snapshot = self.snapshot,None
+            ec.num_generations = snapshot.num_generations
+            ec.num_evaluations = snapshot.num_evaluations
+            self.problem.genCount = snapshot.genCount
+            self.problem.cache.hits = snapshot.cache_hits
+            self.problem.cache.misses = snapshot.cache_misses
+            return
+        if self.interval > 0 and num_generations > 0 and num_generations % self.interval == 0:
+            self.save(ec)
+
+    def save(self,ec):
+        save(self.path,ec,self.problem,self.seed)
@@ -0,0 +1,145 @@
+#! /usr/bin/python3
+
+## @package experiments
+#  Batch runner of main.main() over a grid of seeds and parameters.
+#
+#  Every combination of the given values is a run. The runs are scheduled on
+#  a process pool, each one in a fresh process with its own working directory
+#  (the scratch and output files of life.py and main.py are relative paths),
+#  where its parameters, best individual and fitness are saved. One row per
+#  run, with best fitness, best genotype and time, is added to results.csv in
+#  the output folder as soon as the run ends.
+#
+#  The parameters are the module globals of main.py (populationSize, N,
+#  TARGET, genotypeSize, placement, ...) or, if main.py has none with that name, of life.py (ENGINE,
+#  CYCLE_HISTORY, ...). Values are Python literals.
+#
+#  Usage: python experiments.py --seeds 1 2 3 --set populationSize 50 100
+#                               --set TARGET "(36,36)" "(30,36)" --workers 4
+
+import argparse
+import ast
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from random import Random
+
+import numpy as np
+
+import life
+import main
+import pareto
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+FIELDS = ["run","seed","parameters","best_fitness","seconds","error","genotype"]
+
+## Module (main or life) holding the parameter @name
+def parameter_module(name):
+    if hasattr(main,name):
+        return main
+    if hasattr(life,name):
+        return life
+    raise ValueError("unknown parameter " + name)
+
+## Every combination of @seeds and of the values in @grid, a {name: values} dict
+def combinations(seeds,grid):
+    names = sorted(grid)
+    for values in itertools.product(seeds,*(grid[name] for name in names)):
+        yield values[0],dict(zip(names,values[1:]))
+
+## Set the parameters of a run, with the defaults of main.py following N and
+#  populationSize as in its source
+def configure(parameters):
+    for name,value in parameters.items():
+        setattr(parameter_module(name),name,value)
+    if "TARGET" not in parameters:
+        main.TARGET = (main.N-4,main.N-4)
+    if "selectionSize" not in parameters:
+        main.selectionSize = main.populationSize
+    main.numElites = min(main.numElites,main.populationSize)
+    # runs are already spread over the cores, and pool processes cannot have children
+    main.evaluationWorkers = 1
+    if "LIFECORE_WORKERS" not in parameters:
+        life.LIFECORE_WORKERS = 1
+    life.set_geometry(main.N,main.genotypeSize,main.placement)
+    # the c++ core executables stay in the repository folder
+    life.LIFECORE = os.path.join(ROOT,"lifecore")
+    life.LIBLIFECORE = os.path.join(ROOT,"liblifecore.so")
+
+## Run @job=(run,seed,parameters,folder) in its own working directory
+#
+#  @return the row of the results table
+def run_experiment(job):
+    run,seed,parameters,folder = job
+    row = {"run": run,"seed": seed,"parameters": json.dumps(parameters,sort_keys=True),"error": ""}
+    directory = os.path.join(folder,run)
+    os.makedirs(directory,exist_ok=True)
+    os.chdir(directory)
+    with open("parameters.json","w") as f:
+        json.dump(dict(parameters,seed=seed),f,indent=2,sort_keys=True)
+
+    start = time.perf_counter()
+    try:
+        configure(parameters)
+        np.random.seed(seed)
+        final_pop = main.main(Random(seed),seed,False)
+        # with Pareto fitness (main.multiObjective) the front member main.py shows
+        # first, its fitness as the list of its values
+        best = pareto.best_individual(final_pop)
+        row["best_fitness"] = best.fitness if np.isscalar(best.fitness) else list(best.fitness)
+        row["genotype"] = life.genotype_string(best.candidate)
+        life.savegrid(life.genotype_to_grid(best.candidate),"./bestindividual.txt")
+    except Exception:
+        row["error"] = traceback.format_exc().strip().splitlines()[-1]
+        with open("error.txt","w") as f:
+            f.write(traceback.format_exc())
+    finally:
+        # pool processes end without running atexit
+        life.close_lifecore_clients()
+    row["seconds"] = time.perf_counter() - start
+    with open("result.json","w") as f:
+        json.dump(row,f,indent=2)
+    return row
+
+def main_runner(argv=None):
+    parser = argparse.ArgumentParser(description="Run main.py over a grid of seeds and parameters")
+    parser.add_argument("--seeds",nargs="+",type=int,default=[1])
+    parser.add_argument("--set",nargs="+",action="append",default=[],metavar=("NAME","VALUE"),
+                        help="parameter of main.py or life.py and its values, eg. --set N 40 60")
+    parser.add_argument("--workers",type=int,default=os.cpu_count() or 1)
+    parser.add_argument("--output",default=os.path.join("results","sweep-" + time.strftime("%Y%m%d-%H%M%S")))
+    options = parser.parse_args(argv)
+
+    grid = {}
+    for values in options.set:
+        if len(values) < 2:
+            parser.error("--set needs a name and at least one value")
+        name = values[0]
+        parameter_module(name)
+        grid[name] = [ast.literal_eval(value) for value in values[1:]]
+
+    folder = os.path.abspath(options.output)
+    os.makedirs(folder,exist_ok=True)
+    jobs = [("run-{0:04d}".format(i),seed,parameters,folder)
+            for i,(seed,parameters) in enumerate(combinations(options.seeds,grid))]
+    print("{0} runs on {1} processes, results in {2}".format(len(jobs),options.workers,folder))
+
+    with open(os.path.join(folder,"results.csv"),"w",newline="") as f:
+        writer = csv.DictWriter(f,fieldnames=FIELDS)
+        writer.writeheader()
+        # a fresh process for every run: each one starts from the defaults of main.py
+        with multiprocessing.Pool(options.workers,maxtasksperchild=1) as pool:
+            for row in pool.imap_unordered(run_experiment,jobs):
+                writer.writerow(row)
+                f.flush()
+                print("{0} seed {1} {2}: best {3} in {4:.1f}s {5}".format(
+                      row["run"],row["seed"],row["parameters"],row.get("best_fitness"),
+                      row["seconds"],row["error"]))
+
+if __name__ == "__main__":
+    main_runner(sys.argv[1:])
@@ -0,0 +1,158 @@
+## @package gifwriter
+#  In-memory GIF animation encoder.
+#
+#  Frames are 2D arrays of palette indices, added one at a time as they are
+#  produced. Each frame is LZW-compressed as soon as it is added, and only the
+#  rectangle that differs from the previous frame is stored: the frames are
+#  drawn over each other (disposal "do not dispose"), so the unchanged pixels
+#  are kept by the viewer. A frame equal to the previous one is not stored at
+#  all, the previous one is shown longer instead.
+#
+#  Usage: writer = GifWriter(width,height,[(43,43,43),(190,190,190)])
+#         writer.add_frame(frame)    # for every frame
+#         writer.save("anim.gif",loop=True)
+
+import numpy as np
+
+MAX_CODES = 4096
+MAX_DELAY = 0xFFFF
+
+## LZW compression of the palette indices @pixels, as in the GIF image data
+#
+#  @return the code stream, packed least significant bit first
+def lzw_encode(pixels,min_code_size):
+    clear = 1 << min_code_size
+    end = clear + 1
+    output = bytearray()
+
+    code_size = min_code_size + 1
+    next_code = end + 1
+    table = {}
+    buffer = clear    # every stream starts with a clear code
+    count = code_size
+
+    data = bytes(pixels)
+    prefix = data[0]
+    for pixel in data[1:]:
+        key = prefix << 8 | pixel
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        buffer |= prefix << count
+        count += code_size
+        while count >= 8:
+            output.append(buffer & 0xFF)
+            buffer >>= 8
+            count -= 8
+        if next_code < MAX_CODES:
+            table[key] = next_code
+            if next_code == 1 << code_size:
+                code_size += 1
+            next_code += 1
+        else:
+            # table full: start over
+            buffer |= clear << count
+            count += code_size
+            table.clear()
+            code_size = min_code_size + 1
+            next_code = end + 1
+        prefix = pixel
+
+    for code in (prefix,end):
+        buffer |= code << count
+        count += code_size
+        if code == prefix and next_code < MAX_CODES and next_code == 1 << code_size:
+            # the decoder adds one more entry before reading the end code
+            code_size += 1
+    while count > 0:
+        output.append(buffer & 0xFF)
+        buffer >>= 8
+        count -= 8
+    return bytes(output)
+
+## Split @data in the length-prefixed sub-blocks of a GIF stream
+def sub_blocks(data):
+    blocks = bytearray()
+    for start in range(0,len(data),255):
+        chunk = data[start:start+255]
+        blocks.append(len(chunk))
+        blocks += chunk
+    blocks.append(0)
+    return bytes(blocks)
+
+def _word(value):
+    return int(value).to_bytes(2,"little")
+
+## Animated GIF built one frame at a time
+#
+#  @palette is a list of (r,g,b) colors, the frames hold indices into it.
+#  @delay is the time each frame is shown, in hundredths of a second.
+class GifWriter():
+    def __init__(self,width,height,palette,delay=40):
+        if not 0 < len(palette) <= 256:
+            raise ValueError("a GIF palette holds from 1 to 256 colors")
+        self.width = width
+        self.height = height
+        self.delay = delay
+        # the color table holds a power of 2 of colors, at least 4
+        self.table_bits = max(2,int(len(palette)-1).bit_length())
+        colors = list(palette) + [(0,0,0)] * ((1 << self.table_bits) - len(palette))
+        self.palette = bytes(channel for color in colors for channel in color)
+        self.frames = []      # [delay,encoded frame]
+        self.canvas = None
+        self.added = 0
+
+    ## Add @frame, a (height,width) array of palette indices
+    def add_frame(self,frame):
+        frame = np.asarray(frame,dtype=np.uint8)
+        if frame.shape != (self.height,self.width):
+            raise ValueError("frame of shape {0}, expected {1}".format(frame.shape,(self.height,self.width)))
+        self.added += 1
+
+        if self.canvas is None:
+            top,bottom,left,right = 0,self.height-1,0,self.width-1
+        else:
+            changed = frame != self.canvas
+            rows = np.flatnonzero(changed.any(axis=1))
+            if rows.size == 0 and self.frames[-1][0] + self.delay <= MAX_DELAY:
+                # unchanged frame: show the previous one longer
+                self.frames[-1][0] += self.delay
+                return
+            if rows.size == 0:
+                rows = np.zeros(1,dtype=int)
+                columns = rows
+            else:
+                columns = np.flatnonzero(changed[rows[0]:rows[-1]+1].any(axis=0))
+            top,bottom,left,right = rows[0],rows[-1],columns[0],columns[-1]
+
+        self.canvas = frame.copy()
+        rectangle = frame[top:bottom+1,left:right+1]
+        descriptor = (b"\x2c" + _word(left) + _word(top) + _word(right-left+1) + _word(bottom-top+1) + b"\x00")
+        data = bytes([self.table_bits]) + sub_blocks(lzw_encode(rectangle.tobytes(),self.table_bits))
+        self.frames.append([self.delay,descriptor + data])
+
+    ## Number of frames stored, after removal of the unchanged ones
+    def __len__(self):
+        return len(self.frames)
+
+    ## Whole GIF file
+    #
+    #  @loop makes viewers play the animation forever
+    def getvalue(self,loop=False):
+        header = (b"GIF89a" + _word(self.width) + _word(self.height) +
+                  bytes([0x80 | (self.table_bits-1) << 4 | (self.table_bits-1),0,0]) + self.palette)
+        chunks = [header]
+        if loop:
+            chunks.append(b"\x21\xff\x0bNETSCAPE2.0\x03\x01" + _word(0) + b"\x00")
+        for delay,frame in self.frames:
+            # graphic control extension: do not dispose, no transparency
+            chunks.append(b"\x21\xf9\x04\x04" + _word(delay) + b"\x00\x00")
+            chunks.append(frame)
+        chunks.append(b"\x3b")
+        return b"".join(chunks)
+
+    ## Write the GIF file @filename
+    def save(self,filename,loop=False):
+        with open(filename,"wb") as file:
+            file.write(self.getvalue(loop))
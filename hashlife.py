@@ -0,0 +1,434 @@
+#! /usr/bin/python3
+
+## @package hashlife
+#  Hashlife engine for the LIFE simulator, meant for large grids and long
+#  horizons (ENGINE = "hashlife" in the life.py module).
+#
+#  Grids are stored as quadtrees of canonical nodes: equal subtrees are the
+#  same object, so two configurations are equal if and only if their roots
+#  are the same node. The future of every node is memoized, so recurring
+#  local patterns (still lifes, oscillators, the phases of a spaceship) are
+#  only ever computed once, whatever their position and the size of the grid.
+#
+#  With MAX_STEP = 0, the default, the simulation follows the c++ core
+#  (LIFEcore/main.cpp) exactly: the outermost rows and columns of the
+#  effective grid are cleared before every update, the metrics are computed on
+#  every generation and the run stops on the same rules, plus the repetitions
+#  of the batched simulator of life.py. MAX_STEP > 0 is an opt-in macro-step
+#  mode whose metrics are approximate (see MAX_STEP).
+
+import collections
+
+import numpy as np
+import profiling
+
+"""--Quadtree nodes-----------------------------------------------------------"""
+
+## Node of the quadtree
+#
+#  A node of level k is a square of 2^k x 2^k cells, made of four nodes of
+#  level k-1 (level 0 nodes are single cells). Nodes are never modified and
+#  come from _leaves or _join only.
+class Node():
+    __slots__ = ("nw","ne","sw","se","level","population","bbox","code","results")
+
+    def __init__(self,nw=None,ne=None,sw=None,se=None,alive=False):
+        self.nw,self.ne,self.sw,self.se = nw,ne,sw,se
+        self.results = {}          # log2 of the generations -> future centre
+        if nw is None:
+            self.level = 0
+            self.population = int(alive)
+            self.bbox = (0,0,0,0) if alive else None
+            self.code = int(alive)
+            return
+
+        self.level = nw.level + 1
+        self.population = nw.population + ne.population + sw.population + se.population
+        # tight bounding box (top,bottom,left,right) of the alive cells, None if empty
+        half = 1 << nw.level
+        self.bbox = None
+        for child,row,col in ((nw,0,0),(ne,0,half),(sw,half,0),(se,half,half)):
+            if child.bbox is not None:
+                top,bottom,left,right = child.bbox
+                box = (top+row,bottom+row,left+col,right+col)
+                if self.bbox is None:
+                    self.bbox = box
+                else:
+                    self.bbox = (min(self.bbox[0],box[0]),max(self.bbox[1],box[1]),
+                                 min(self.bbox[2],box[2]),max(self.bbox[3],box[3]))
+        # cells of small nodes as bits, row by row
+        if self.level == 1:
+            self.code = nw.code | ne.code << 1 | sw.code << 2 | se.code << 3
+        elif self.level == 2:
+            self.code = (_SPREAD[nw.code] | _SPREAD[ne.code] << 2 |
+                         _SPREAD[sw.code] << 8 | _SPREAD[se.code] << 10)
+        else:
+            self.code = None
+
+# bits of a level 1 node in the 4x4 bits of a level 2 node
+_SPREAD = [(code & 1) | (code & 2) | (code & 4) << 2 | (code & 8) << 2 for code in range(16)]
+
+## Centre (level 1 code) of every level 2 node after one generation
+def _base_table():
+    codes = np.arange(1 << 16)
+    cells = ((codes[:,np.newaxis] >> np.arange(16)) & 1).reshape(-1,4,4)
+    result = np.zeros(len(codes),dtype=int)
+    for bit,(i,j) in enumerate(((1,1),(1,2),(2,1),(2,2))):
+        total = cells[:,i-1:i+2,j-1:j+2].sum(axis=(1,2)) - cells[:,i,j]
+        alive = (total == 3) | ((cells[:,i,j] == 1) & (total == 2))
+        result |= alive.astype(int) << bit
+    return result.tolist()
+
+_BASE = _base_table()
+
+# canonical nodes, indexed by their children
+_nodes = {}
+_leaves = (Node(alive=False),Node(alive=True))
+_empty = []
+_level1 = []
+
+## Canonical node with the given children
+def _join(nw,ne,sw,se):
+    key = (nw,ne,sw,se)
+    node = _nodes.get(key)
+    if node is None:
+        node = _nodes[key] = Node(nw,ne,sw,se)
+    return node
+
+## Canonical empty node of level @level
+def _empty_node(level):
+    while len(_empty) <= level:
+        child = _empty[-1]
+        _empty.append(_join(child,child,child,child))
+    return _empty[level]
+
+## Forget every memoized node and future
+#
+#  Nodes created before are no longer canonical, so this must not be called
+#  in the middle of a simulation.
+def clear():
+    _nodes.clear()
+    _empty[:] = [_leaves[0]]
+    _level1[:] = [_join(*[_leaves[(code >> bit) & 1] for bit in range(4)]) for code in range(16)]
+
+clear()
+
+## Largest number of canonical nodes kept between two simulations
+MAX_NODES = 1 << 21
+
+"""--Grids and queries---------------------------------------------------------"""
+
+## Quadtree of level @level of the boolean matrix @cells (at its top left corner)
+def build(cells,level):
+    size = 1 << level
+    square = np.zeros((size,size),dtype=bool)
+    square[:cells.shape[0],:cells.shape[1]] = cells
+    return _build(square,level)
+
+def _build(square,level):
+    if not square.any():
+        return _empty_node(level)
+    if level == 0:
+        return _leaves[1]
+    half = 1 << (level-1)
+    return _join(_build(square[:half,:half],level-1),_build(square[:half,half:],level-1),
+                 _build(square[half:,:half],level-1),_build(square[half:,half:],level-1))
+
+## Alive cells of @node as a list of (row,col), the node being at (@row,@col)
+def cells(node,row=0,col=0,out=None):
+    if out is None:
+        out = []
+    if node.population == 0:
+        return out
+    if node.level == 0:
+        out.append((row,col))
+        return out
+    half = 1 << (node.level-1)
+    cells(node.nw,row,col,out)
+    cells(node.ne,row,col+half,out)
+    cells(node.sw,row+half,col,out)
+    cells(node.se,row+half,col+half,out)
+    return out
+
+## Alive state of cell (@row,@col) of @node
+def alive(node,row,col):
+    size = 1 << node.level
+    if row < 0 or col < 0 or row >= size or col >= size:
+        return False
+    while node.level > 0 and node.population > 0:
+        half = 1 << (node.level-1)
+        if row < half:
+            node = node.nw if col < half else node.ne
+        else:
+            node = node.sw if col < half else node.se
+        row,col = row % half,col % half
+    return node.population == 1
+
+## Column of the leftmost alive cell of row @row of @node, None if none
+def _leftmost(node,row):
+    if node.bbox is None or row < node.bbox[0] or row > node.bbox[1]:
+        return None
+    if node.level == 0:
+        return 0
+    half = 1 << (node.level-1)
+    first,second = (node.nw,node.ne) if row < half else (node.sw,node.se)
+    col = _leftmost(first,row % half)
+    if col is not None:
+        return col
+    col = _leftmost(second,row % half)
+    return None if col is None else col + half
+
+## Row of the lowest alive cell of column @col of @node, None if none
+def _lowest(node,col):
+    if node.bbox is None or col < node.bbox[2] or col > node.bbox[3]:
+        return None
+    if node.level == 0:
+        return 0
+    half = 1 << (node.level-1)
+    first,second = (node.se,node.ne) if col >= half else (node.sw,node.nw)
+    row = _lowest(first,col % half)
+    if row is not None:
+        return row + half
+    return _lowest(second,col % half)
+
+## @node with every cell outside the rectangle @box=(top,bottom,left,right)
+#  cleared, the node being at (@row,@col)
+def _clip(node,box,row=0,col=0):
+    if node.bbox is None:
+        return node
+    top,bottom,left,right = node.bbox
+    top,bottom,left,right = top+row,bottom+row,left+col,right+col
+    if top >= box[0] and bottom <= box[1] and left >= box[2] and right <= box[3]:
+        return node
+    if bottom < box[0] or top > box[1] or right < box[2] or left > box[3]:
+        return _empty_node(node.level)
+    half = 1 << (node.level-1)
+    return _join(_clip(node.nw,box,row,col),_clip(node.ne,box,row,col+half),
+                 _clip(node.sw,box,row+half,col),_clip(node.se,box,row+half,col+half))
+
+"""--Evolution-----------------------------------------------------------------"""
+
+## Centre of @node (level k-1) after 2^@j generations, with 0 <= j <= k-2
+#
+#  Standard Hashlife recursion. For j = k-2 both halves of the time are
+#  spent in the two rounds of recursive calls; for smaller steps the first
+#  round only takes the centres of the nine overlapping subnodes.
+def step(node,j):
+    result = node.results.get(j)
+    if result is not None:
+        return result
+
+    if node.population == 0:
+        result = _empty_node(node.level-1)
+    elif node.level == 2:
+        result = _level1[_BASE[node.code]]
+    else:
+        nw,ne,sw,se = node.nw,node.ne,node.sw,node.se
+        n00 = nw
+        n01 = _join(nw.ne,ne.nw,nw.se,ne.sw)
+        n02 = ne
+        n10 = _join(nw.sw,nw.se,sw.nw,sw.ne)
+        n11 = _join(nw.se,ne.sw,sw.ne,se.nw)
+        n12 = _join(ne.sw,ne.se,se.nw,se.ne)
+        n20 = sw
+        n21 = _join(sw.ne,se.nw,sw.se,se.sw)
+        n22 = se
+        if j == node.level-2:
+            advance = lambda n: step(n,j-1)
+        else:
+            advance = _centre
+        r00,r01,r02 = advance(n00),advance(n01),advance(n02)
+        r10,r11,r12 = advance(n10),advance(n11),advance(n12)
+        r20,r21,r22 = advance(n20),advance(n21),advance(n22)
+        inner = j-1 if j == node.level-2 else j
+        result = _join(step(_join(r00,r01,r10,r11),inner),step(_join(r01,r02,r11,r12),inner),
+                       step(_join(r10,r11,r20,r21),inner),step(_join(r11,r12,r21,r22),inner))
+
+    node.results[j] = result
+    return result
+
+## Centre of @node, one level below
+def _centre(node):
+    return _join(node.nw.se,node.ne.sw,node.sw.ne,node.se.nw)
+
+## @node (level k) in the centre of an empty node of level k+1
+def _expand(node):
+    empty = _empty_node(node.level-1)
+    return _join(_join(empty,empty,empty,node.nw),_join(empty,empty,node.ne,empty),
+                 _join(empty,node.sw,empty,empty),_join(node.se,empty,empty,empty))
+
+"""--Simulation----------------------------------------------------------------"""
+
+## Log2 of the largest number of generations advanced at once
+#
+#  0 steps one generation at a time and gives the same results as the other
+#  engines. With MAX_STEP > 0, while the automaton is far enough from the
+#  target and from the border, up to 2^MAX_STEP generations are computed in a
+#  single step. Whether and when the target is reached stay exact, but the
+#  other metrics are approximate:
+#   - the sizes of the skipped generations are taken from the last one, so the
+#     average and maximum sizes are sampled;
+#   - the minimum distance is only taken on the computed generations;
+#   - the static and period-2 rules compare computed generations, so a
+#     configuration whose period divides the step stops as static, and the
+#     iterations of the runs that do not reach the target may be larger.
+MAX_STEP = 0
+
+## Boundaries (min_i,max_i,min_j,max_j) of the grid @node
+#
+#  Same as compute_bounds() of the c++ core: scanning the cells row by row, a
+#  cell only raises the maximum if it did not lower the minimum.
+def compute_bounds(node,min_bound,max_bound):
+    if node.population == 0:
+        return max_bound,min_bound,max_bound,min_bound
+    top,bottom,left,right = node.bbox
+    max_i = bottom if node.population > 1 else min_bound
+    # only the first cell of the scan can miss raising the maximum column
+    if _leftmost(node,top) < right or _lowest(node,right) > top:
+        return top,max_i,left,right
+
+    minimum,max_j = max_bound,min_bound
+    for i,j in sorted(cells(node)):
+        if j >= minimum:
+            max_j = max(max_j,j)
+        minimum = min(minimum,j)
+    return top,max_i,left,max_j
+
+## Chebyshev distance between the center of the bounds and the target
+def chebyshev_distance(bounds,target):
+    min_i,max_i,min_j,max_j = bounds
+    return max(abs((max_j + min_j) // 2 - target[0]),abs((max_i + min_i) // 2 - target[1]))
+
+## Surface of the bounding box
+def automatonsize(bounds):
+    min_i,max_i,min_j,max_j = bounds
+    return (max_i - min_i + 1) * (max_j - min_j + 1)
+
+## Log2 of the number of generations to compute in the next step
+#
+#  The next 2^j generations of @node stay within 2^j cells of its alive
+#  cells: the @targets not reached yet can not be reached before the last of
+#  them and, if they are clear of the border, the border clearing has no
+#  effect on them.
+def _step_size(node,targets,inner,remaining):
+    if MAX_STEP <= 0 or node.bbox is None:
+        return 0
+    top,bottom,left,right = node.bbox
+    reach = min(max(y - bottom,top - y,x - right,left - x) for x,y in targets) - 1
+    margin = min(top - inner[0],inner[1] - bottom,left - inner[2],inner[3] - right)
+    limit = min(reach,margin,remaining)
+    j = 0
+    while j < MAX_STEP and (2 << j) <= limit:
+        j += 1
+    return j
+
+## Run the simulation of @grid
+#
+#  @grid is the (N,N) boolean matrix of the life.py module, @history the
+#  longest period of the repetitions that stop the run (0 for the static and
+#  period-2 rules of the c++ core only).
+#  @target is a cell (x,y) or a list of K cells, simulated once as in
+#  life.simulate_batch: the run goes on until every target is reached and the
+#  metrics of each target are frozen when it is reached.
+#  @return final distance, final size, iterations, maximum size, average size,
+#          minimum distance, detected period and stop reason, as life.simulate_batch,
+#          one such list per target with a list of targets
+def simulate(grid,max_it,target,history=0):
+    if len(_nodes) > MAX_NODES:
+        clear()
+    n = len(grid)
+    min_bound,max_bound = 1,n-1
+    level = 1
+    while (1 << level) < n:
+        level += 1
+    level = max(level,2)
+    effective = (min_bound,max_bound-1,min_bound,max_bound-1)
+    inner = (min_bound+1,max_bound-2,min_bound+1,max_bound-2)   # not cleared by the update
+    targets = [(int(x),int(y)) for x,y in np.reshape(target,(-1,2))]
+
+    state = _clip(build(grid,level),effective)
+
+    bounds = compute_bounds(state,min_bound,max_bound)
+    max_size = sizeaccumulator = automatonsize(bounds)
+    min_distance = [chebyshev_distance(bounds,cell) for cell in targets]
+
+    iterations = 0
+    # every target reached: its iterations, size, maximum size and size sum then
+    reached = {}
+    period = 0
+    reason = profiling.STOP_TIMEOUT
+    previous_state = previous_previous_state = None
+    previous_time = previous_previous_time = 0
+    # the last @history generations (state,size), oldest first, all of them
+    # computed one at a time
+    seen = {state:0}
+    recent = collections.deque([(state,max_size)])
+    while iterations < max_it:
+        cleared = _clip(state,inner)
+        pending = [cell for k,cell in enumerate(targets) if k not in reached]
+        j = _step_size(cleared,pending,inner,max_it - iterations)
+        previous_previous_state,previous_state = previous_state,state
+        previous_previous_time,previous_time = previous_time,iterations
+        state = _clip(step(_expand(cleared),j),effective)
+        iterations += 1 << j
+
+        bounds = compute_bounds(state,min_bound,max_bound)
+        partial_size = automatonsize(bounds)
+        sizeaccumulator += partial_size << j
+        max_size = max(max_size,partial_size)
+        for k,(x,y) in enumerate(targets):
+            if k not in reached:
+                min_distance[k] = min(min_distance[k],chebyshev_distance(bounds,(x,y)))
+                if alive(state,y,x):
+                    reached[k] = (iterations,partial_size,max_size,sizeaccumulator)
+
+        """ Stopping """
+        if len(reached) == len(targets):                            # 1. Target(s) reached
+            reason = profiling.STOP_REACHED
+            break
+        if state.population == 0:                                   # 2. Death
+            reason = profiling.STOP_DIED
+            break
+        if state is previous_state:                                 # 3. Static behaviour
+            period = iterations - previous_time
+            reason = profiling.STOP_STATIC if period == 1 else profiling.STOP_PERIODIC
+            break
+        if state is previous_previous_state:                        # 4. Repetitive behaviour
+            period = iterations - previous_previous_time
+            reason = profiling.STOP_PERIODIC
+            break
+        if history > 0:
+            if j > 0:
+                # a cycle is only followed through generations computed one by one
+                seen.clear()
+                recent.clear()
+            last = seen.get(state)
+            if last is not None:                                    # 5. Any repeated configuration
+                period = iterations - last
+                reason = profiling.STOP_PERIODIC
+                # the cycle runs up to max_it, as life._repeat_cycle
+                phases = list(recent)[-period:]
+                sizes = [size for phase,size in phases]
+                full,rest = divmod(max_it - iterations,period)
+                sizeaccumulator += full * sum(sizes) + sum((sizes[1:] + sizes[:1])[:rest])
+                state = phases[(max_it - last) % period][0]
+                iterations = max_it
+                break
+            seen[state] = iterations
+            recent.append((state,partial_size))
+            while len(recent) > history:
+                del seen[recent.popleft()[0]]
+
+    bounds = compute_bounds(state,min_bound,max_bound)
+    results = []
+    for k,cell in enumerate(targets):
+        if k in reached:
+            hit_iterations,final_size,hit_max_size,accumulator = reached[k]
+            row = [0,final_size,hit_iterations,hit_max_size,accumulator,min_distance[k],0,profiling.STOP_REACHED]
+        else:
+            row = [chebyshev_distance(bounds,cell),automatonsize(bounds),iterations,max_size,sizeaccumulator,
+                   min_distance[k],period,reason]
+        # integer division truncating towards zero, as in c++
+        row[4] = abs(row[4]) // (row[2]+1) * (1 if row[4] >= 0 else -1)
+        results.append(row)
+    return results if np.ndim(target) == 2 else results[0]
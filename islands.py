@@ -0,0 +1,222 @@
+#! /usr/bin/python3
+
+## @package islands
+#  Island model: several main.main() populations evolving in parallel and
+#  exchanging their elites.
+#
+#  Every island is a process with its own AutomatonEvaluator and seed
+#  (seed + island index). Islands are connected in a ring: every
+#  MIGRATION_INTERVAL generations an island sends copies of its best
+#  MIGRANTS individuals to the next one, which replaces its worst individuals
+#  with them as soon as they arrive.
+#
+#  The islands only share queues. By default they are local processes and
+#  multiprocessing queues; with --serve one process holds the queues and
+#  islands on other nodes reach them over TCP with --connect.
+#
+#  Usage: python islands.py --islands 4 --seed 1 --set numberOfGenerations 200
+#         python islands.py --serve 0.0.0.0:50000 --islands 4 --authkey secret
+#         python islands.py --connect host:50000 --island 0 --islands 4 --authkey secret
+
+import argparse
+import ast
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from multiprocessing.managers import BaseManager
+from random import Random
+
+import inspyred
+import numpy as np
+
+import experiments
+import life
+import main
+import pareto
+
+""" Generations between two migrations, individuals sent each time """
+MIGRATION_INTERVAL = 10
+MIGRANTS = 2
+
+## Migration operator sending the elites to @outbox and receiving from @inbox
+#
+#  Migrants keep the fitness computed on the island they come from, unless
+#  @evaluate is set (islands with different fitness functions).
+class EliteMigrator():
+    __name__ = "EliteMigrator"    # inspyred logs the operators by name
+
+    def __init__(self,inbox,outbox,interval=MIGRATION_INTERVAL,migrants=MIGRANTS,evaluate=False):
+        self.inbox = inbox
+        self.outbox = outbox
+        self.interval = interval
+        self.migrants = migrants
+        self.evaluate = evaluate
+        self.sent = 0
+        self.received = 0
+
+    def __call__(self,random,population,args):
+        ec = args["_ec"]
+        arrived = []
+        while True:
+            try:
+                arrived.extend(self.inbox.get_nowait())
+            except queue.Empty:
+                break
+
+        population.sort(reverse=True)
+        if arrived:
+            arrived = arrived[:len(population)]
+            maximize = population[0].maximize
+            immigrants = []
+            for candidate,fitness in arrived:
+                individual = inspyred.ec.Individual(candidate,maximize)
+                individual.fitness = fitness
+                immigrants.append(individual)
+            if self.evaluate:
+                for individual,fitness in zip(immigrants,ec.evaluator([i.candidate for i in immigrants],args)):
+                    individual.fitness = fitness
+                ec.num_evaluations += len(immigrants)
+            population[len(population)-len(immigrants):] = immigrants
+            population.sort(reverse=True)
+            self.received += len(immigrants)
+
+        # the generation counter is increased after the migration
+        if (ec.num_generations + 1) % self.interval == 0:
+            elites = [(np.array(individual.candidate),individual.fitness)
+                      for individual in population[:self.migrants]]
+            self.outbox.put(elites)
+            self.sent += len(elites)
+        return population
+
+""" Files of main.py written by every island, named after the island """
+ISLAND_FILES = ("checkpointFile","trajectoryFile")
+
+## @path with the index of island @index before the extension
+def island_file(path,index):
+    root,extension = os.path.splitext(path)
+    return "{0}-island{1}{2}".format(root,index,extension)
+
+## Evolve island @index with main.main(), seed @seed + @index
+#
+#  The islands run in the same folder: their checkpoint and trajectory files
+#  get the index of the island, unless they are set in @parameters.
+#  @return (index,best fitness,best genotype,seconds,sent,received), the fitness
+#          of a Pareto front as the list of its objectives
+def run_island(index,seed,parameters,inbox,outbox,interval=MIGRATION_INTERVAL,migrants=MIGRANTS):
+    experiments.configure(parameters)
+    for name in ISLAND_FILES:
+        if name not in parameters and getattr(main,name):
+            setattr(main,name,island_file(getattr(main,name),index))
+    migrator = EliteMigrator(inbox,outbox,interval,migrants)
+    island_seed = seed + index
+    np.random.seed(island_seed)
+    start = time.perf_counter()
+    try:
+        final_pop = main.main(Random(island_seed),island_seed,False,migrator)
+    finally:
+        life.close_lifecore_clients()
+    # with Pareto fitness (main.multiObjective) the front member main.py shows first
+    best = pareto.best_individual(final_pop)
+    fitness = best.fitness if np.isscalar(best.fitness) else list(best.fitness)
+    genotype = life.genotype_string(best.candidate)
+    return index,fitness,genotype,time.perf_counter() - start,migrator.sent,migrator.received
+
+## Island process: run the island and post its result
+def island_process(index,seed,parameters,inbox,outbox,interval,migrants,results):
+    # a finished island does not wait for its last migrants to be read
+    outbox.cancel_join_thread()
+    results.put(run_island(index,seed,parameters,inbox,outbox,interval,migrants))
+
+## Evolve @islands local islands in parallel
+#
+#  @return the result of every island, by index
+def evolve_islands(islands,seed,parameters,interval=MIGRATION_INTERVAL,migrants=MIGRANTS):
+    queues = [multiprocessing.Queue() for i in range(islands)]
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=island_process,
+                                         args=(i,seed,parameters,queues[i],queues[(i+1) % islands],
+                                               interval,migrants,results))
+                 for i in range(islands)]
+    for process in processes:
+        process.start()
+    # read the results before joining, the processes wait for them to be read
+    collected = sorted(results.get() for i in range(islands))
+    for process in processes:
+        process.join()
+    return collected
+
+"""--Remote islands----------------------------------------------------------"""
+
+class IslandManager(BaseManager):
+    pass
+
+def _address(text):
+    host,port = text.rsplit(":",1)
+    return host,int(port)
+
+## Hold the queues of @islands islands at @address until all of them are done
+def serve(address,islands,authkey):
+    queues = [queue.Queue() for i in range(islands)]
+    results = queue.Queue()
+    IslandManager.register("get_queue",callable=lambda i: queues[i])
+    IslandManager.register("get_results",callable=lambda: results)
+    manager = IslandManager(address=address,authkey=authkey)
+    manager.start()
+    print("Serving {0} islands on {1}:{2}".format(islands,*address))
+    try:
+        collected = sorted(manager.get_results().get() for i in range(islands))
+    finally:
+        manager.shutdown()
+    return collected
+
+## Evolve island @index with the queues served at @address
+def connect(address,index,islands,seed,parameters,authkey,interval=MIGRATION_INTERVAL,migrants=MIGRANTS):
+    IslandManager.register("get_queue")
+    IslandManager.register("get_results")
+    manager = IslandManager(address=address,authkey=authkey)
+    manager.connect()
+    result = run_island(index,seed,parameters,manager.get_queue(index),manager.get_queue((index+1) % islands),
+                        interval,migrants)
+    manager.get_results().put(result)
+    return result
+
+def report(results):
+    for index,fitness,genotype,seconds,sent,received in results:
+        print("island {0}: best {1} in {2:.1f}s, {3} migrants sent, {4} received".format(
+              index,fitness,seconds,sent,received))
+    # the fitness of main.py is minimized
+    best = min(results,key=lambda result: pareto.weighted_fitness(result[1]))
+    print("best island {0}: {1}\n{2}".format(best[0],best[1],best[2]))
+
+def main_islands(argv=None):
+    parser = argparse.ArgumentParser(description="Island model evolution of main.py populations")
+    parser.add_argument("--islands",type=int,default=multiprocessing.cpu_count())
+    parser.add_argument("--seed",type=int,default=1)
+    parser.add_argument("--interval",type=int,default=MIGRATION_INTERVAL,help="generations between migrations")
+    parser.add_argument("--migrants",type=int,default=MIGRANTS,help="elites sent at every migration")
+    parser.add_argument("--set",nargs=2,action="append",default=[],metavar=("NAME","VALUE"),
+                        help="parameter of main.py or life.py, eg. --set populationSize 100")
+    parser.add_argument("--serve",metavar="HOST:PORT",help="hold the queues of remote islands")
+    parser.add_argument("--connect",metavar="HOST:PORT",help="run one island with remote queues")
+    parser.add_argument("--island",type=int,default=0,help="index of the island run with --connect")
+    parser.add_argument("--authkey",default="ecgol")
+    options = parser.parse_args(argv)
+
+    parameters = {}
+    for name,value in options.set:
+        experiments.parameter_module(name)
+        parameters[name] = ast.literal_eval(value)
+    authkey = options.authkey.encode()
+
+    if options.serve:
+        report(serve(_address(options.serve),options.islands,authkey))
+    elif options.connect:
+        report([connect(_address(options.connect),options.island,options.islands,
+                        options.seed,parameters,authkey,options.interval,options.migrants)])
+    else:
+        report(evolve_islands(options.islands,options.seed,parameters,options.interval,options.migrants))
+
+if __name__ == "__main__":
+    main_islands(sys.argv[1:])
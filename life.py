@@ -9,9 +9,18 @@
 #  Created: 04 nov 2019
 
 import numpy as np
-import math
 import os
-import copy
+import subprocess
+import threading
+import atexit
+import collections
+import functools
+import ctypes
+import concurrent.futures
+import hashlife
+import sparselife
+import profiling
+import gifwriter
 
 VERBOSE = False
 
@@ -19,19 +28,35 @@ VERBOSE = False
 # GENOTYPE = "cartesian" # vector of cell coordinates
 GENOTYPE = "matrix"   # boolean matrix representing a correct grid
 
-if GENOTYPE == "cartesian":
-    GENOTYPE_SIZE = 10
-elif GENOTYPE == "matrix":
-    GENOTYPExSIZE = 10
-    GENOTYPEySIZE = 10
-    PLACEMENT = (10,10)
+# cartesian: number of (row,column) pairs, (-1,-1) for none, anywhere in the
+# grid; random genotypes start with their cells in the matrix patch
+GENOTYPE_SIZE = 10
+# matrix: size of the patch and its placement in the grid
+GENOTYPExSIZE = 10
+GENOTYPEySIZE = 10
+PLACEMENT = (10,10)
+
+""" Simulation engine """
+# ENGINE = "lifecore"  # one ./lifecore subprocess per candidate
+# ENGINE = "shm"       # same, exchanging grids and metrics in shared memory
+# ENGINE = "library"   # c++ core loaded in-process from ./liblifecore.so
+# ENGINE = "bitpacked" # in-process, rows packed in uint64 words
+# ENGINE = "hashlife"  # in-process memoized quadtrees, for large grids and long runs
+# ENGINE = "sparse"    # in-process lists of the alive cells, for huge sparse grids
+# ENGINE = "numpy"     # in-process, whole populations stepped at once
+ENGINE = "worker"      # pool of persistent ./lifecore --worker processes
 
 """ Configuration files for c++ core """
+# each process and thread gets its own copy, see scratch_file()
 CONFIGFILE = "./config/config.txt"
 RESULTSFILE = "./result.txt"
-BESTRESULTSFILE = "./bestresult.txt"
 ANIMATION_FOLDER = "./animation/"
 
+## Animation colors, as in the displaycore images, and frame delay (1/100 s)
+ANIMATION_PALETTE = [(43,43,43),(190,190,190),(0,0,0),(255,255,255)]
+ANIMATION_DEAD,ANIMATION_ALIVE,ANIMATION_TARGET,ANIMATION_REACHED = range(4)
+ANIMATION_DELAY = 40
+
 # grid size
 N = -1
 min_bound = -1
@@ -46,6 +71,24 @@ def set_grid_size(n):
     min_bound = 1
     max_bound = N-1
 
+## Set grid size @n and, if given, the genotype patch size @genotype_size=(x,y)
+#  and its @placement=(x,y) in the grid
+#
+#  Every engine takes the grid size at runtime, so none has to be rebuilt.
+def set_geometry(n,genotype_size=None,placement=None):
+    global GENOTYPExSIZE
+    global GENOTYPEySIZE
+    global PLACEMENT
+    set_grid_size(n)
+    if genotype_size is not None:
+        GENOTYPExSIZE,GENOTYPEySIZE = genotype_size
+    if placement is not None:
+        PLACEMENT = tuple(placement)
+    if not (0 <= PLACEMENT[0] and PLACEMENT[0] + GENOTYPExSIZE < N-2 and
+            0 <= PLACEMENT[1] and PLACEMENT[1] + GENOTYPEySIZE < N-2):
+        raise ValueError("genotype of {0}x{1} cells at {2} does not fit in a grid of {3}".format(
+                         GENOTYPExSIZE,GENOTYPEySIZE,PLACEMENT,n))
+
 
 ## Print nicely the grid
 #
@@ -72,34 +115,54 @@ def display_genotype(genotype):
                 print("██", end = '')
         print("")
 
+## Private version of a scratch file for the calling process and thread
+#
+#  The c++ core exchanges grids and results through files, so concurrent
+#  evaluations need distinct paths: "./result.txt" -> "./result.<pid>.<tid>.txt"
+def scratch_file(filename):
+    root,extension = os.path.splitext(filename)
+    return "%s.%d.%d%s" % (root,os.getpid(),threading.get_ident(),extension)
+
 def savegrid(grid,filename):
     directory,_ = os.path.split(filename)
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+    if directory:
+        os.makedirs(directory,exist_ok=True)
 
-    f = open(filename,"w")
-    for i in range(min_bound,max_bound):
-        for j in range(min_bound,max_bound):
-            f.write(str(int(grid[i,j])))
-        f.write("\n")
-    f.close
+    rows = np.asarray(grid)[min_bound:max_bound,min_bound:max_bound] != 0
+    with open(filename,"w") as f:
+        f.write("".join("".join("1" if cell else "0" for cell in row) + "\n" for row in rows))
 
-def get_random_genotype():
+## Random genotype
+#
+#  @random is a NumPy Generator, the global NumPy random state if None
+def get_random_genotype(random=None):
+    if random is None:
+        random = np.random
     if GENOTYPE == "cartesian":
-        print("ERROR: Function not yet implemented!")
-        exit(-1)
+        # (row,column) of the cells, counted from the first cell of the effective grid
+        corner = np.array([PLACEMENT[1]-1,PLACEMENT[0]-1])
+        return (random.random((GENOTYPE_SIZE,2)) * (GENOTYPEySIZE,GENOTYPExSIZE)).astype(int) + corner
     elif GENOTYPE == "matrix":
-        return (np.random.rand(GENOTYPEySIZE,GENOTYPExSIZE) > 0.5)
+        return (random.random((GENOTYPEySIZE,GENOTYPExSIZE)) > 0.5)
 
+## Alive cells of the initial grid of @genotype
+#
+#  @return the (k,2) array of their (row,column) in the grid, sorted row by
+#          row and without duplicates, without building the grid
+def genotype_cells(genotype):
+    if GENOTYPE == "cartesian":
+        cells = np.reshape(genotype,(-1,2)).astype(np.int64)
+        return np.unique(cells[(cells != -1).all(axis=1)] + 1,axis=0).reshape(-1,2)
+    elif GENOTYPE == "matrix":
+        cells = np.argwhere(np.reshape(genotype,(GENOTYPEySIZE,GENOTYPExSIZE)) != 0)
+        return cells + (PLACEMENT[1],PLACEMENT[0])
 
 ## Traduce genotypic description into an initial configuration for the grid
 #
 def cartesian_genotype_to_grid(genotype):
     grid = np.zeros((N,N),dtype=bool)
-    for i in range(int(genotype.size / 2)):
-        gen = genotype.reshape((int(genotype.size / 2),2))[i]
-        if gen[0] != -1 and gen[1] != -1:
-            grid[gen[0]+1,gen[1]+1] = True
+    cells = genotype_cells(genotype)
+    grid[cells[:,0],cells[:,1]] = True
 
     return grid
 
@@ -127,6 +190,12 @@ def genotype_to_grid(genotype):
         automaton = matrix_genotype_to_grid(genotype)
     return automaton
 
+## @genotype as text: the cells of a matrix genotype, "0110...", the
+#  coordinates of a cartesian one separated by spaces
+def genotype_string(genotype):
+    separator = " " if GENOTYPE == "cartesian" else ""
+    return separator.join(str(int(value)) for value in np.reshape(genotype,-1))
+
 def readFileAsMatrix(file):
     with open(file) as f:
         lines = f.read().splitlines()
@@ -138,24 +207,69 @@ def readFileAsMatrix(file):
             matrix.append(row)
         return matrix
 
+## Pack the six metrics written by the c++ core into the fitness tuple
+#
+#  @results holds, in order: final distance, final size, iterations, maximum
+#  size, average size and minimum distance from target
+def fitness_tuple(results,max_it):
+    final_distance = results[0]
+    final_size = results[1]
+    if (final_distance == 0):
+        iterations = results[2]
+    else:
+        iterations = max_it
+    max_size = results[3]
+    avg_size = results[4]
+    min_distance = results[5]
+
+    if VERBOSE:
+        print("Final Distance: " + str(final_distance))
+        print("Minimum Distance: " + str(min_distance))
+        print("Final Size: " + str(final_size))
+        print("Max Size: " + str(max_size))
+        print("Avg Size: " + str(avg_size))
+        print("Iterations: " + str(iterations))
+        print("")
+
+    return (final_distance,min_distance),(final_size,max_size,avg_size),iterations
+
+## fitness_tuple of a list of targets: @results is (K,6), every element of
+#  the tuple an array with one value per target
+def fitness_tuple_targets(results,max_it):
+    results = np.asarray(results)
+    final_distance = results[:,0]
+    iterations = np.where(final_distance == 0,results[:,2],max_it)
+    return (final_distance,results[:,5]),(results[:,1],results[:,3],results[:,4]),iterations
+
+## Fitness of @genotype, see fitness_tuple
+#
+#  @target is a cell (x,y) or a list of cells, measured in the same
+#  simulation: with a list the fitness is that of fitness_tuple_targets
 def compute_fitness(genotype,max_it,target):
-    distance = math.inf # inverse of proximity
-    final_size = math.inf # inverse of compactness
-    max_size = math.inf
-    avg_size = math.inf
-    iterations = math.inf # inverse of speed
-    reached = False
+    return compute_fitness_batch([genotype],max_it,target)[0]
 
-    automaton = genotype_to_grid(genotype)
+## Run the c++ core executable on @grid, through a config and a results file
+#
+#  @target is a cell or a list of K cells, simulated at once
+#  @return the content of the results file, (K,7) with a list of targets
+def simulate_lifecore(grid,max_it,target):
+    configfile = scratch_file(CONFIGFILE)
+    resultsfile = scratch_file(RESULTSFILE)
+    targets = np.reshape(np.asarray(target,dtype=int),(-1,2))
 
-    savegrid(automaton,CONFIGFILE)
-    command = './lifecore ' + CONFIGFILE + ' ' + str(max_it) + ' ' +  str(target[0]) + ' ' + str(target[1]) + ' ' + RESULTSFILE
-    output = os.system(command)
+    with profiling.stage("lifecore.write_config"):
+        savegrid(grid,configfile)
+    with profiling.stage("lifecore.run"):
+        command = (LIFECORE + ' ' + configfile + ' ' + str(max_it) + ' ' +
+                   ' '.join(str(value) for value in targets.ravel()) + ' ' + resultsfile)
+        output = os.system(command)
+    os.remove(configfile)
 
-    if output is not 0:
+    if output != 0:
         print("ERROR: bad results from c++ core")
 
-    results = readFileAsMatrix(RESULTSFILE)
+    with profiling.stage("lifecore.parse"):
+        results = readFileAsMatrix(resultsfile)
     ## Content:
     # 0 - Final distance
     # 1 - Final size
@@ -163,49 +277,202 @@ def compute_fitness(genotype,max_it,target):
     # 3 - MAXIMUM size (across all iterations)
     # 4 - AVERAGE size (across all iterations)
     # 5 - MINIMUM distance from target (across all iterations)
+    # 6 - stop reason (profiling.STOP_REASONS)
+    # one such record per target
+    os.remove(resultsfile)
 
-    final_distance = results[0][0]
-    final_size = results[1][0]
-    if (final_distance == 0):
-        iterations = results[2][0]
+    records = np.array([row[0] for row in results]).reshape(len(targets),-1)
+    return records if np.ndim(target) == 2 else records[0]
+
+## Simulate @grids with the engine ENGINE
+#
+#  Every engine simulates a grid once, whatever the number of targets.
+#  @return the (pop,6+) records of the engine and the stop reasons, (pop,K,6+)
+#          and (pop,K) with a list of K targets
+def simulate_grids(grids,max_it,target):
+    if ENGINE in LIFECORE_CLIENTS:
+        results = get_lifecore_client(ENGINE).evaluate(grids,max_it,target)
+        return results,results[...,6]
+    if ENGINE in BATCH_KERNELS:
+        results = simulate_batch(grids,max_it,target,ENGINE)
+    elif ENGINE == "hashlife":
+        results = np.array([hashlife.simulate(grid,max_it,target,CYCLE_HISTORY) for grid in grids])
+    elif ENGINE == "sparse":
+        results = np.array([sparselife.simulate(grid,max_it,target,CYCLE_HISTORY) for grid in grids])
     else:
-        iterations = max_it
-    max_size = results[3][0]
-    avg_size = results[4][0]
-    min_distance = results[5][0]
-    os.remove(RESULTSFILE)
+        results = np.array([simulate_lifecore(grid,max_it,target) for grid in grids])
+        return results,results[...,6]
+    return results,results[...,7]
 
-    if VERBOSE:
-        print("Final Distance: " + str(final_distance))
-        print("Minimum Distance: " + str(min_distance))
-        print("Final Size: " + str(final_size))
-        print("Max Size: " + str(max_size))
-        print("Avg Size: " + str(avg_size))
-        print("Iterations: " + str(iterations))
-        print("")
+## Compute the fitness tuples of a whole population
+#
+#  Same output as calling compute_fitness on every genotype, in order.
+#  With the c++ engines the candidates that stop within PRESCREEN_STEPS
+#  iterations are settled by prescreen_batch, the others go to the engine.
+#  The in-process engines simulate the population in a single batch, whatever
+#  the number of targets, and go on from the first iterations themselves. The
+#  stops are counted once per candidate and target.
+#  The sparse engine takes the alive cells of the genotypes as they are: no
+#  grid is built and nothing is pre-screened, whatever the size of the grid.
+def compute_fitness_batch(genotypes,max_it,target):
+    targets = np.reshape(target,(-1,2))
+    if ENGINE == "sparse":
+        with profiling.stage("compute_fitness.simulate"):
+            rows = np.array([sparselife.simulate_cells(genotype_cells(genotype),N,max_it,targets,CYCLE_HISTORY)
+                             for genotype in genotypes]).reshape(len(genotypes),len(targets),8)
+        profiling.count_stops(rows[...,7].ravel(),rows[...,2].ravel())
+        return fitness_results(rows[...,:6].astype(float),max_it,target)
 
-    return (final_distance,min_distance),(final_size,max_size,avg_size),iterations
+    with profiling.stage("compute_fitness.grids"):
+        grids = np.array([genotype_to_grid(genotype) for genotype in genotypes])
+    results = np.zeros((len(grids),len(targets),6))
+    pending = np.arange(len(grids))
+
+    if PRESCREEN_STEPS > 0 and len(grids) > 0 and ENGINE not in BATCH_KERNELS:
+        with profiling.stage("compute_fitness.prescreen"):
+            screened,rows = prescreen_batch(grids,max_it,targets,PRESCREEN_STEPS)
+        profiling.count_stops(rows[screened,:,7].ravel(),rows[screened,:,2].ravel())
+        results[screened] = rows[screened,:,:6]
+        pending = np.flatnonzero(~screened)
+
+    if pending.size > 0:
+        with profiling.stage("compute_fitness.simulate"):
+            rows,reasons = simulate_grids(grids[pending],max_it,targets)
+        rows = np.asarray(rows)
+        profiling.count_stops(np.ravel(reasons),rows[...,2].ravel())
+        results[pending] = rows[...,:6]
+
+    return fitness_results(results,max_it,target)
 
-def create_animation(genotype,max_it,target):
-    os.system(ANIMATION_FOLDER + "clean.sh")
+## compute_fitness tuples of the (pop,K,6) @results of the K targets of @target
+def fitness_results(results,max_it,target):
+    with profiling.stage("compute_fitness.results"):
+        if np.ndim(target) == 2:
+            return [fitness_tuple_targets(row,max_it) for row in results]
+        return [fitness_tuple([float(value) for value in row[0]],max_it) for row in results]
 
+"""--Fitness cache------------------------------------------------------------"""
+
+## Hashable form of @target, a cell or a list of cells (tuples, lists or arrays):
+#  its number of dimensions followed by the coordinates of its cells
+def target_key(target):
+    return (int(np.ndim(target)),) + tuple(int(value) for value in np.ravel(target))
+
+## Bounded LRU cache of compute_fitness results
+#
+#  Entries are keyed on the bit-packed genotype (plus grid size, placement,
+#  max_it and target), cartesian genotypes on their sorted cells. Translated or
+#  mirrored patterns are NOT merged, since their distance to the target differs.
+#  The only other normalization applied is for genotypes with less than three
+#  alive cells: they die at the first iteration whatever their shape, so their
+#  metrics only depend on the boundaries of the initial configuration, which
+#  become the key, with max_it, the iterations reported for an unreached target.
+#  The target enters the keys as target_key: a cell and a list of cells give
+#  different fitness tuples, so they never share a key.
+class FitnessCache():
+    def __init__(self,maxsize=100000):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self,genotype,max_it,target):
+        genotype = np.asarray(genotype)
+        target = target_key(target)
+        if max_it > 0 and count_alive_cells(genotype) < 3:
+            state = sparselife.encode(genotype_cells(genotype))
+            return ("dies",N,max_it,target,sparselife.compute_bounds(state,min_bound,max_bound))
+        if GENOTYPE == "matrix":
+            return (N,PLACEMENT,max_it,target,np.packbits(genotype.astype(bool)).tobytes())
+        # cartesian genotypes listing the same cells, in any order, give the same grid
+        return (N,max_it,target,genotype_cells(genotype).tobytes())
+
+    ## compute_fitness tuples of the @genotypes, in order
+    #
+    #  Only the genotypes not in the cache are passed, once each, to @compute
+    #  (compute_fitness_batch by default)
+    def compute(self,genotypes,max_it,target,compute=None):
+        if compute is None:
+            compute = compute_fitness_batch
+        keys = [self.key(genotype,max_it,target) for genotype in genotypes]
+        missing = {}
+        for genotype,key in zip(genotypes,keys):
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            elif key in missing:
+                self.hits += 1
+            else:
+                missing[key] = genotype
+                self.misses += 1
+
+        computed = dict(zip(missing,compute(list(missing.values()),max_it,target))) if missing else {}
+        results = [computed[key] if key in computed else self.entries[key] for key in keys]
+        for key,result in computed.items():
+            self.entries[key] = result
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return results
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+## Generations of @grid, as simulated by the c++ core
+#
+#  Yields the initial grid and every following one, up to the first stopping
+#  rule of the c++ core (target reached, death, static or period-2 behaviour)
+#  or @max_it iterations.
+def generations(grid,max_it,target):
+    tx,ty = target
+    grids = np.array(grid,dtype=bool)[np.newaxis]
+    previous = np.zeros_like(grids)
+    yield grids[0]
+    for i in range(max_it):
+        previous_previous,previous = previous,grids
+        grids,countTrue = update_batch(grids)
+        yield grids[0]
+        if (grids[0,ty,tx] or countTrue[0] == 0 or (grids == previous).all() or
+                (grids == previous_previous).all()):
+            break
+
+## Frame of the animation: the effective grid, @magnification pixels per cell
+def animation_frame(grid,target,magnification):
+    tx,ty = target
+    cells = grid[min_bound:max_bound,min_bound:max_bound]
+    frame = np.where(cells,ANIMATION_ALIVE,ANIMATION_DEAD).astype(np.uint8)
+    if min_bound <= tx < max_bound and min_bound <= ty < max_bound:
+        frame[ty-min_bound,tx-min_bound] = ANIMATION_REACHED if grid[ty,tx] else ANIMATION_TARGET
+    return np.repeat(np.repeat(frame,magnification,axis=0),magnification,axis=1)
+
+## Animation of the simulation of @genotype
+#
+#  The generations are drawn as the simulation runs, with the colors of the
+#  displaycore images, into ANIMATION_FOLDER/out/anim.gif and animloop.gif.
+def create_animation(genotype,max_it,target,magnification=10):
     automaton = genotype_to_grid(genotype)
-    savegrid(automaton,CONFIGFILE)
-    command = './displaycore ' + CONFIGFILE + ' ' + str(max_it) + ' ' +  str(target[0]) + ' ' + str(target[1]) + ' ' + BESTRESULTSFILE + ' ' + ANIMATION_FOLDER
-    print(command)
-    output = os.system(command)
-
-    if output is not 0:
-        print("ERROR: bad results from DISPLAY core")
-
-    results = readFileAsMatrix(BESTRESULTSFILE)
-    final_distance = results[0][0]
-    final_size = results[1][0]
-    iterations = results[2][0]
+    size = (N-2) * magnification
+    writer = gifwriter.GifWriter(size,size,ANIMATION_PALETTE,ANIMATION_DELAY)
+
+    iterations = -1
+    for grid in generations(automaton,max_it,target):
+        writer.add_frame(animation_frame(grid,target,magnification))
+        iterations += 1
+
+    folder = os.path.join(ANIMATION_FOLDER,"out")
+    os.makedirs(folder,exist_ok=True)
+    writer.save(os.path.join(folder,"anim.gif"))
+    writer.save(os.path.join(folder,"animloop.gif"),loop=True)
+
+    bounds = compute_bounds_batch(grid[np.newaxis])
+    final_distance = 0 if grid[target[1],target[0]] else chebyshev_distance_batch(bounds,target)[0]
+    final_size = automatonsize_batch(bounds)[0]
     print("# Best individual Performance #")
     print("final_distance: " + str(final_distance))
     print("final_size: " + str(final_size))
     print("iterations: " + str(iterations))
+    print("animation: " + str(writer.added) + " frames (" + str(len(writer)) + " stored) in " + folder)
 
 
 ## Life-iteration for matrix genotype
@@ -213,37 +480,999 @@ def create_animation(genotype,max_it,target):
 #  Perform one update or iteration of LIFE on the sole genotype matrix
 #  This can be used as a custom mutation operator
 def lifeiteration(in_genotype):
-    in_genotype = np.reshape(in_genotype,(GENOTYPEySIZE,GENOTYPExSIZE))
-    genotype = copy.copy(in_genotype)
-
-    # Create 1 cell padding around the genotype
-    padded_genotype = np.zeros((GENOTYPEySIZE+2,GENOTYPEySIZE+2),dtype=bool)
-    padded_genotype[1:1+GENOTYPEySIZE,1:1+GENOTYPExSIZE] = genotype
-
-    for i in range(1, GENOTYPEySIZE+1):
-        for j in range(1, GENOTYPExSIZE+1):
-            total = int(padded_genotype[i,j-1]) + int(padded_genotype[i,j+1]) +                    int(padded_genotype[i-1,j]) + int(padded_genotype[i+1,j]) + int(padded_genotype[i-1,j-1]) + int(padded_genotype[i-1,j+1]) + int(padded_genotype[i+1,j-1]) + int(padded_genotype[i+1,j+1])
-
-            if(padded_genotype[i,j] == True):
-                if(total >= 2 and total <= 3):
-                    genotype[i-1,j-1] = True
-                    # using -1 because @genotype is not padded
-                else:
-                    genotype[i-1,j-1] = False
-                    # using -1 because @genotype is not padded
-            else:
-                if (total == 3):
-                    genotype[i-1,j-1] = True
-                    # using -1 because @genotype is not padded
-                else:
-                    genotype[i-1,j-1] = False
-                    # using -1 because @genotype is not padded
+    return lifeiteration_batch(np.reshape(in_genotype,(1,-1)))[0]
+
+## Life-iteration for a whole population of matrix genotypes
+#
+#  @genotypes is a (pop,GENOTYPEySIZE*GENOTYPExSIZE) matrix, or a list of
+#  genotypes. The cells outside the genotype are considered dead.
+#  @return the (pop,GENOTYPEySIZE*GENOTYPExSIZE) matrix of the updated genotypes
+def lifeiteration_batch(genotypes):
+    genotypes = np.asarray(genotypes)
+    pop = len(genotypes)
+    cells = np.reshape(genotypes,(pop,GENOTYPEySIZE,GENOTYPExSIZE)) != 0
 
-    return genotype.flatten()
+    # Create 1 cell padding around the genotypes
+    padded = np.zeros((pop,GENOTYPEySIZE+2,GENOTYPExSIZE+2),dtype=np.uint8)
+    padded[:,1:1+GENOTYPEySIZE,1:1+GENOTYPExSIZE] = cells
+
+    total = np.zeros((pop,GENOTYPEySIZE,GENOTYPExSIZE),dtype=np.uint8)
+    for di in range(3):
+        for dj in range(3):
+            if di != 1 or dj != 1:
+                total += padded[:,di:di+GENOTYPEySIZE,dj:dj+GENOTYPExSIZE]
+
+    alive = (total == 3) | (cells & (total == 2))
+    return alive.reshape(pop,-1).astype(genotypes.dtype)
 
 def count_alive_cells(genotype):
-    counter = 0
-    for cell in np.reshape(genotype,-1):
-        if cell == True :
-            counter += 1
-    return counter
+    if GENOTYPE == "cartesian":
+        return len(genotype_cells(genotype))
+    return int(np.count_nonzero(genotype))
+
+## Number of alive cells of every genotype of the population
+def count_alive_cells_batch(genotypes):
+    if GENOTYPE == "cartesian":
+        return np.array([count_alive_cells(genotype) for genotype in genotypes],dtype=int)
+    genotypes = np.asarray(genotypes)
+    return np.count_nonzero(np.reshape(genotypes,(len(genotypes),-1)),axis=1)
+
+
+"""--Batched simulator--------------------------------------------------------"""
+#  In-process port of the c++ core (LIFEcore/main.cpp). Grids are stacked in a
+#  (pop,N,N) boolean array and the whole population is advanced at once;
+#  candidates are dropped from the batch as soon as they meet a stopping rule.
+
+## Compute the boundaries of the alive cells along one axis
+#
+#  Reproduces compute_bounds() of the c++ core exactly: cells are scanned row
+#  by row and a cell only raises the maximum if it did not lower the minimum.
+#  @alive is (pop,cells) in scan order, @coord the coordinate of each cell.
+#  @floor is the maximum when no cell raises it (min_bound in the c++ core)
+def _scan_bounds(alive,coord,floor=min_bound):
+    value = np.where(alive,coord,max_bound)
+    running_min = np.minimum.accumulate(value,axis=1)
+    previous_min = np.empty_like(running_min)
+    previous_min[:,0] = max_bound
+    previous_min[:,1:] = running_min[:,:-1]
+    raising = alive & (value >= previous_min)
+    max_value = np.where(raising,coord,floor).max(axis=1)
+    return running_min[:,-1],max_value
+
+## Boundaries (min_i,max_i,min_j,max_j) of every grid in the batch
+#
+#  Same values as the scan of _scan_bounds, read from the tight bounding box:
+#  the first cell of the scan sets both minima and every other cell raises
+#  the maxima up to the bottom row and the rightmost column. Only the grids
+#  whose first cell is alone in the rightmost column (single cells included)
+#  are scanned.
+def compute_bounds_batch(grids,floor=None):
+    if floor is None:
+        floor = min_bound
+    effective = grids[:,min_bound:max_bound,min_bound:max_bound]
+    top,bottom = _first_last(effective.any(axis=2))
+    left,right = _first_last(effective.any(axis=1))
+    empty = top > bottom
+    index = np.arange(len(grids))
+    first = effective[index,np.where(empty,0,top)].argmax(axis=1)
+    alone = np.count_nonzero(effective[index,:,np.where(empty,0,right)],axis=1) == 1
+    scan = ~empty & (first == right) & alone
+
+    min_i = np.where(empty,max_bound,top + min_bound)
+    max_i = np.where(empty,floor,bottom + min_bound)
+    min_j = np.where(empty,max_bound,left + min_bound)
+    max_j = np.where(empty,floor,right + min_bound)
+    if scan.any():
+        side = max_bound - min_bound
+        alive = effective[scan].reshape(np.count_nonzero(scan),-1)
+        rows = np.repeat(np.arange(min_bound,max_bound),side)
+        columns = np.tile(np.arange(min_bound,max_bound),side)
+        min_i[scan],max_i[scan] = _scan_bounds(alive,rows,floor)
+        min_j[scan],max_j[scan] = _scan_bounds(alive,columns,floor)
+    return min_i,max_i,min_j,max_j
+
+## Tight bounding box (top,bottom,left,right) of every grid in the batch
+#
+#  Unlike compute_bounds_batch these are the true extremes of the alive
+#  cells; empty grids give (N,-1,N,-1).
+def tight_bounds_batch(grids):
+    return _first_last(grids.any(axis=2)) + _first_last(grids.any(axis=1))
+
+## Index of the first and last True of every row of @mask, (N,-1) if none
+def _first_last(mask):
+    any_set = mask.any(axis=1)
+    first = np.where(any_set,mask.argmax(axis=1),N)
+    last = np.where(any_set,mask.shape[1] - 1 - mask[:,::-1].argmax(axis=1),-1)
+    return first,last
+
+## Chebyshev distance between the center of the bounds and the target
+def chebyshev_distance_batch(bounds,target):
+    min_i,max_i,min_j,max_j = bounds
+    xc = (max_j + min_j) // 2
+    yc = (max_i + min_i) // 2
+    return np.maximum(np.abs(xc - target[0]),np.abs(yc - target[1]))
+
+## Surface of the bounding box
+def automatonsize_batch(bounds):
+    min_i,max_i,min_j,max_j = bounds
+    return (max_i - min_i + 1) * (max_j - min_j + 1)
+
+## Simulate one iteration of LIFE on every grid of the batch
+#
+#  As in the c++ core, the outermost rows and columns of the effective grid
+#  are cleared before the update.
+#  @return the updated grids and the number of alive cells in each
+def update_batch(grids):
+    grids = grids.copy()
+    grids[:,min_bound,:] = False
+    grids[:,max_bound-1,:] = False
+    grids[:,:,min_bound] = False
+    grids[:,:,max_bound-1] = False
+
+    # the 3x3 sums, cell included, as the sums of three rows of three cells
+    cells = grids.view(np.uint8)
+    rows = cells[:,:,:-2] + cells[:,:,1:-1] + cells[:,:,2:]
+    total = rows[:,:-2] + rows[:,1:-1] + rows[:,2:]
+
+    new_grids = np.zeros_like(grids)
+    new_grids[:,min_bound:max_bound,min_bound:max_bound] = (total == 3) | (grids[:,min_bound:max_bound,min_bound:max_bound] & (total == 4))
+    return new_grids,new_grids.view(np.uint8).reshape(len(grids),-1).sum(axis=1,dtype=np.int32)
+
+## Alive state of cell (@x,@y) in every grid of the batch
+def cell_batch(grids,x,y):
+    return grids[:,y,x]
+
+"""--Bit-packed kernel--------------------------------------------------------"""
+#  Each row of the grid is stored as uint64 words, column j being bit j%64 of
+#  word j//64. Neighbors are counted with bitwise full adders, so 64 cells are
+#  updated by every word operation.
+
+ONE = np.uint64(1)
+
+## Number of set bits of every word
+def popcount(words):
+    if hasattr(np,"bitwise_count"):
+        return np.bitwise_count(words).astype(int)
+    words = words - ((words >> ONE) & np.uint64(0x5555555555555555))
+    words = (words & np.uint64(0x3333333333333333)) + ((words >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    words = (words + (words >> np.uint64(4))) & np.uint64(0x0f0f0f0f0f0f0f0f)
+    return ((words * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(int)
+
+## Position of the lowest set bit of every word (64 for empty words)
+def _lowest_bit(words):
+    return np.where(words != 0,popcount((words & (~words + ONE)) - ONE),64)
+
+## Position of the highest set bit of every word (-1 for empty words)
+def _highest_bit(words):
+    smeared = words.copy()
+    for shift in (1,2,4,8,16,32):
+        smeared |= smeared >> np.uint64(shift)
+    return popcount(smeared) - 1
+
+## Pack a (pop,N,N) batch of boolean grids into (pop,N,words) uint64 rows
+def pack_grids(grids):
+    grids = np.asarray(grids,dtype=bool)
+    words = (grids.shape[-1] + 63) // 64
+    padded = np.zeros(grids.shape[:-1] + (words*64,),dtype=bool)
+    padded[...,:grids.shape[-1]] = grids
+    packed = np.packbits(padded,axis=-1,bitorder='little')
+    return packed.view('<u8').astype(np.uint64)
+
+## Unpack (pop,N,words) uint64 rows into a batch of boolean grids
+def unpack_grids(words):
+    packed = np.ascontiguousarray(words,dtype='<u8').view(np.uint8)
+    return np.unpackbits(packed,axis=-1,bitorder='little')[...,:N].astype(bool)
+
+## Row mask with the bits of columns [@first,@last) set, for grids of @n cells
+@functools.lru_cache(maxsize=None)
+def _packed_mask(first,last,n):
+    mask = np.zeros(n,dtype=bool)
+    mask[first:last] = True
+    return pack_grids(mask[np.newaxis,np.newaxis])[0,0]
+
+## Row mask with the bits of columns [@first,@last) set
+def _column_mask(first,last):
+    return _packed_mask(first,last,N)
+
+## Column j of the result holds column j-1 of @words
+def _shift_right(words):
+    shifted = words << ONE
+    shifted[...,1:] |= words[...,:-1] >> np.uint64(63)
+    return shifted
+
+## Column j of the result holds column j+1 of @words
+def _shift_left(words):
+    shifted = words >> ONE
+    shifted[...,:-1] |= words[...,1:] << np.uint64(63)
+    return shifted
+
+## Simulate one iteration of LIFE on every packed grid of the batch
+#
+#  Bit-packed counterpart of update_batch.
+def update_packed(words):
+    words = words.copy()
+    words[:,min_bound] = 0
+    words[:,max_bound-1] = 0
+    words &= _column_mask(min_bound+1,max_bound-1)
+
+    west = _shift_right(words)
+    east = _shift_left(words)
+    # two-bit horizontal sums: 3 cells for the rows above and below, 2 cells
+    # (center excluded) for the row itself
+    h0 = west ^ words ^ east
+    h1 = (west & words) | (east & (west | words))
+    m0 = (west ^ east)[:,1:-1]
+    m1 = (west & east)[:,1:-1]
+    a0,a1 = h0[:,:-2],h1[:,:-2]
+    b0,b1 = h0[:,2:],h1[:,2:]
+
+    # add the three sums, only the cases 2, 3 and >=4 matter
+    t0 = a0 ^ m0 ^ b0
+    c0 = (a0 & m0) | (b0 & (a0 | m0))
+    s1 = a1 ^ m1
+    s2 = b1 ^ c0
+    t1 = s1 ^ s2
+    four_or_more = (a1 & m1) | (b1 & c0) | (s1 & s2)
+
+    new_words = np.zeros_like(words)
+    new_words[:,min_bound:max_bound] = t1 & ~four_or_more & (t0 | words[:,1:-1])
+    new_words &= _column_mask(min_bound,max_bound)
+    return new_words,popcount(new_words).sum(axis=(1,2))
+
+## Tight bounding box (top,bottom,left,right) of the packed rows @words
+#
+#  Rows are counted from the first one of @words, columns are the bits of the
+#  words; empty grids give (N,-1,N,-1).
+def _box_packed(words):
+    top,bottom = _first_last((words != 0).any(axis=2))
+    columns = np.bitwise_or.reduce(words,axis=1)
+    offset = np.arange(columns.shape[-1]) * 64
+    nonempty = columns != 0
+    left = np.where(nonempty,_lowest_bit(columns) + offset,N).min(axis=-1)
+    right = np.where(nonempty,_highest_bit(columns) + offset,-1).max(axis=-1)
+    return top,bottom,left,right
+
+## Boundaries (min_i,max_i,min_j,max_j) of every packed grid in the batch
+#
+#  Same values as compute_bounds_batch, read from the bounding box of the
+#  words as it does; the grids whose first cell is alone in the rightmost
+#  column are unpacked and scanned.
+def compute_bounds_packed(words):
+    rows = words[:,min_bound:max_bound]
+    top,bottom,left,right = _box_packed(rows)
+    empty = top > bottom
+    index = np.arange(len(words))
+    first_row = rows[index,np.where(empty,0,top)]
+    offset = np.arange(first_row.shape[-1]) * 64
+    first = np.where(first_row != 0,_lowest_bit(first_row) + offset,N).min(axis=-1)
+    column = np.where(empty,0,right)
+    bits = rows[index,:,column // 64] >> (column % 64).astype(np.uint64)[:,np.newaxis]
+    alone = np.count_nonzero(bits & ONE,axis=1) == 1
+    scan = ~empty & (first == right) & alone
+
+    min_i = np.where(empty,max_bound,top + min_bound)
+    max_i = np.where(empty,min_bound,bottom + min_bound)
+    min_j = np.where(empty,max_bound,left)
+    max_j = np.where(empty,min_bound,right)
+    if scan.any():
+        min_i[scan],max_i[scan],min_j[scan],max_j[scan] = compute_bounds_batch(unpack_grids(words[scan]))
+    return min_i,max_i,min_j,max_j
+
+## Tight bounding box (top,bottom,left,right) of every packed grid
+def tight_bounds_packed(words):
+    return _box_packed(words)
+
+## Alive state of cell (@x,@y) in every packed grid of the batch
+def cell_packed(words,x,y):
+    return ((words[:,y,x // 64] >> np.uint64(x % 64)) & ONE).astype(bool)
+
+## Kernels of the in-process engines
+Kernel = collections.namedtuple("Kernel",["to_state","to_grids","update",
+                                          "compute_bounds","tight_bounds","cell"])
+BATCH_KERNELS = {
+    "numpy": Kernel(lambda grids: np.array(grids,dtype=bool),lambda grids: grids,
+                    update_batch,compute_bounds_batch,tight_bounds_batch,cell_batch),
+    "bitpacked": Kernel(pack_grids,unpack_grids,
+                        update_packed,compute_bounds_packed,tight_bounds_packed,cell_packed),
+}
+
+"""--Cycle detection----------------------------------------------------------"""
+#  The c++ core only stops on static and period-2 configurations. The batched
+#  simulator also keeps the last CYCLE_HISTORY generations of every candidate:
+#   - a configuration equal to a past one stops the simulation, whatever its
+#     period, and its cycle is repeated up to max_it (see _repeat_cycle);
+#   - a configuration equal to a past one translated by (dx,dy) is a spaceship,
+#     whose future is derived analytically (see _extrapolate) until it
+#     reaches the target, runs out of iterations or meets the border.
+#  All the metrics, the final configuration and whether and when the target is
+#  reached stay those of the c++ core, only the detected period is added.
+#  Past states are looked up by hash (see _hash_states). The lookup costs about
+#  40% more time per generation, which only pays off when many candidates
+#  settle into long cycles: CYCLE_HISTORY = 0, the default, keeps the rules of
+#  the c++ core only.
+CYCLE_HISTORY = 0
+
+## Weights of the state hash, one odd 64-bit word per packed word of a state
+@functools.lru_cache(maxsize=None)
+def _hash_weights(n):
+    return np.random.default_rng(n).integers(0,2**63,n,dtype=np.uint64) * np.uint64(2) + ONE
+
+## Hash of every state, a weighted sum of its packed words
+#
+#  Equal states have equal hashes: the full states are only compared when the
+#  hashes are equal.
+def _hash_states(states):
+    words = states.reshape(len(states),-1)
+    if words.dtype == bool:
+        words = np.packbits(words,axis=1)
+    return (words.astype(np.uint64) * _hash_weights(words.shape[1])).sum(axis=1,dtype=np.uint64)
+
+## Hash, alive cell count, tight bounding box size and position of every state
+#  and whether it is clear of the border cleared by the update
+def _describe(kernel,states,counts=None):
+    if counts is None:
+        counts = np.count_nonzero(kernel.to_grids(states).reshape(len(states),-1),axis=1)
+    top,bottom,left,right = kernel.tight_bounds(states)
+    shape = np.stack([counts,bottom - top + 1,right - left + 1],axis=1)
+    origin = np.stack([top,left],axis=1)
+    safe = (top > min_bound) & (bottom < max_bound-1) & (left > min_bound) & (right < max_bound-1)
+    return _hash_states(states),shape,origin,safe
+
+## Single integer for every (count,height,width) @shape or (top,left) origin
+def _shape_code(shape):
+    code = shape[...,0]
+    for column in range(1,shape.shape[-1]):
+        code = code * (N*N + 1) + shape[...,column]
+    return code
+
+## Past generations of the candidates of a batch
+#
+#  A ring buffer of CYCLE_HISTORY entries per candidate, holding the state,
+#  its generation (-1 for unused entries), its hash and its _describe values
+#  (shape and origin as codes). Candidates keep their row of the buffers while
+#  the batch shrinks: rows[c] is the row of the c-th running candidate.
+class _History():
+    def __init__(self,states,size):
+        pop = len(states)
+        self.size = size
+        self.rows = np.arange(pop)
+        self.states = np.zeros((pop,size) + states.shape[1:],dtype=states.dtype)
+        self.time = np.full((pop,size),-1)
+        self.hash = np.zeros((pop,size),dtype=np.uint64)
+        self.shape = np.zeros((pop,size),dtype=int)      # count,height,width
+        self.origin = np.zeros((pop,size),dtype=int)     # top,left
+        self.safe = np.zeros((pop,size),dtype=bool)
+
+    def record(self,index,states,times,hashes,shape,origin,safe):
+        rows = self.rows[index]
+        position = times % self.size
+        self.states[rows,position] = states
+        self.time[rows,position] = times
+        self.hash[rows,position] = hashes
+        self.shape[rows,position] = _shape_code(shape)
+        self.origin[rows,position] = _shape_code(origin)
+        self.safe[rows,position] = safe
+
+    def select(self,keep):
+        self.rows = self.rows[keep]
+
+    def reset(self,index):
+        self.time[self.rows[index]] = -1
+
+    ## States of candidate @index from generation @base to @base+@period-1
+    def window(self,index,base,period):
+        position = np.arange(base,base+period) % self.size
+        return self.states[self.rows[index],position]
+
+    ## Look for past configurations equal to the current ones
+    #
+    #  @return the period of exact repetitions (0 if none) and, for the other
+    #          candidates, a list of (index,base generation,period,(dx,dy)) for
+    #          spaceships whose whole period was clear of the border
+    def match(self,states,times,hashes,shape,origin,safe,to_grids):
+        rows = self.rows
+        time = self.time[rows]
+        used = (time >= 0) & (shape[:,0] > 0)[:,np.newaxis]
+
+        period = np.zeros(len(states),dtype=int)
+        candidate,entry = np.nonzero(used & (self.hash[rows] == hashes[:,np.newaxis]))
+        if candidate.size > 0:
+            equal = (self.states[rows[candidate],entry] == states[candidate]).reshape(candidate.size,-1).all(axis=1)
+            candidate,entry = candidate[equal],entry[equal]
+            found = times[candidate] - time[candidate,entry]
+            for c,p in zip(candidate,found):
+                if period[c] == 0 or p < period[c]:
+                    period[c] = p
+
+        # spaceships: same shape at another place, whole period clear of the border
+        same_shape = used & (self.shape[rows] == _shape_code(shape)[:,np.newaxis])
+        moved = same_shape & (self.origin[rows] != _shape_code(origin)[:,np.newaxis])
+        spaceships = {}
+        candidate,entry = np.nonzero(moved & safe[:,np.newaxis] & (period == 0)[:,np.newaxis])
+        for c,e in zip(candidate,entry):
+            base = time[c,e]
+            p = times[c] - base
+            if c in spaceships and spaceships[c][1] <= p:
+                continue
+            window = (time[c] >= base) & (time[c] < times[c])
+            if np.count_nonzero(window) != p or not self.safe[rows[c]][window].all():
+                continue
+            count,height,width = shape[c]
+            top,left = origin[c]
+            past_top,past_left = divmod(self.origin[rows[c],e],N*N + 1)
+            now_grid,past_grid = to_grids(np.stack([states[c],self.states[rows[c],e]]))
+            if (now_grid[top:top+height,left:left+width] ==
+                past_grid[past_top:past_top+height,past_left:past_left+width]).all():
+                spaceships[c] = (base,p,(left - past_left,top - past_top))
+        return period,[(c,) + ship for c,ship in spaceships.items()]
+
+## Grid of the spaceship with @phases (generations @base onwards) at generation @time
+def _spaceship_grid(phases,base,shift,time):
+    k,j = divmod(time - base,len(phases))
+    return np.roll(phases[j],(k*shift[1],k*shift[0]),axis=(0,1))
+
+## Follow a spaceship analytically
+#
+#  @phases are the grids of one period, from generation @base, and every
+#  period the configuration moves by @shift=(dx,dy). Generations from @now+1
+#  are derived without simulation as long as the previous one is clear of the
+#  border cleared by the update (so that the update behaves as unbounded LIFE),
+#  up to every one of the (K,2) @targets being reached or @max_it.
+#  @return sizes and (steps,K) distances of the derived generations and, for
+#          every target, the index of the generation reaching it (-1 if none)
+def _extrapolate(phases,base,shift,now,max_it,targets):
+    dx,dy = shift
+    k,j = np.divmod(np.arange(now+1,max_it+1) - base,len(phases))
+
+    min_i,max_i,min_j,max_j = compute_bounds_batch(phases,floor=-2*N)
+    bounds = (min_i[j] + k*dy,np.maximum(min_bound,max_i[j] + k*dy),
+              min_j[j] + k*dx,np.maximum(min_bound,max_j[j] + k*dx))
+    top,bottom,left,right = tight_bounds_batch(phases)
+    safe = ((top[j] + k*dy > min_bound) & (bottom[j] + k*dy < max_bound-1) &
+            (left[j] + k*dx > min_bound) & (right[j] + k*dx < max_bound-1))
+    exact = np.concatenate(([True],safe[:-1]))
+
+    x = targets[:,0] - (k*dx)[:,np.newaxis]
+    y = targets[:,1] - (k*dy)[:,np.newaxis]
+    inside = (x >= 0) & (x < N) & (y >= 0) & (y < N)
+    hit = inside & phases[j[:,np.newaxis],np.clip(y,0,N-1),np.clip(x,0,N-1)]
+
+    # a target counts as reached only at a generation derived exactly
+    inexact = np.flatnonzero(~exact)
+    limit = inexact[0] if inexact.size > 0 else len(k)
+    first_hit = np.where(hit.any(axis=0),hit.argmax(axis=0),len(k))
+    reached = first_hit < limit
+    steps = first_hit.max() + 1 if reached.all() else limit
+    bounds = tuple(b[:steps,np.newaxis] for b in bounds)
+    distances = chebyshev_distance_batch(bounds,targets.T)
+    return automatonsize_batch(bounds)[:,0],distances,np.where(reached,first_hit,-1)
+
+## Run a cycle to the end of the simulation
+#
+#  @phases are the states of one period, from generation @base, and the
+#  configuration of generation @now is back to the first one. Since every phase
+#  was simulated, no target is reached and the maximum size and minimum distance
+#  stay the same: only the sizes of generations @now+1 to @max_it add up.
+#  @return the sum of these sizes, @max_it and the state at @max_it
+def _repeat_cycle(kernel,phases,base,now,max_it):
+    sizes = automatonsize_batch(kernel.compute_bounds(phases))
+    full,rest = divmod(max_it - now,len(phases))
+    # generation @now+1 is the second phase
+    total = full * sizes.sum() + np.roll(sizes,-1)[:rest].sum()
+    return total,max_it,phases[(max_it - base) % len(phases)]
+
+## Which candidates of the mask @candidates have equal @states and @others
+#
+#  Only these are compared, eg. the ones whose alive cell counts are equal.
+def _equal_states(candidates,states,others):
+    equal = np.zeros(len(states),dtype=bool)
+    index = np.flatnonzero(candidates)
+    if index.size > 0:
+        equal[index] = (states[index] == others[index]).reshape(index.size,-1).all(axis=1)
+    return equal
+
+## Simulate a whole population of grids
+#
+#  Same simulation, stopping rules and metrics as the c++ core, plus the
+#  cycle detection described above.
+#  @target is a cell (x,y) or a list of K cells. With K targets the grids are
+#  simulated once, until every target is reached or another rule stops them,
+#  and the metrics of each target are frozen when it is reached: they are
+#  those of a separate simulation with that target only.
+#  @engine selects the kernel in BATCH_KERNELS
+#  @return (pop,8) integer array, one row per grid with the same content as
+#          the results file of the c++ core followed by the detected period
+#          (0 if none, 1 for static configurations) and the stop reason
+#          (profiling.STOP_REASONS); (pop,K,8) with a list of targets
+def simulate_batch(grids,max_it,target,engine="numpy"):
+    kernel = BATCH_KERNELS[engine]
+    states = kernel.to_state(grids)
+    pop = len(states)
+    targets = np.reshape(np.asarray(target,dtype=int),(-1,2))
+
+    # Size and distance of the initial configuration
+    bounds = kernel.compute_bounds(states)
+    max_size = automatonsize_batch(bounds)
+    sizeaccumulator = max_size.copy()
+    min_distance = chebyshev_distance_batch(tuple(b[:,np.newaxis] for b in bounds),targets.T)
+
+    iterations = np.zeros(pop,dtype=int)
+    period = np.zeros(pop,dtype=int)
+    reason = np.full(pop,profiling.STOP_TIMEOUT)
+    final_states = states.copy()
+
+    # every target: whether and when it was reached, with the metrics at that time
+    reached = np.zeros((pop,len(targets)),dtype=bool)
+    hit_iteration = np.zeros((pop,len(targets)),dtype=int)
+    hit_size = np.zeros((pop,len(targets)),dtype=int)
+    hit_max_size = np.zeros((pop,len(targets)),dtype=int)
+    hit_accumulator = np.zeros((pop,len(targets)),dtype=int)
+
+    active = np.arange(pop)    # candidates still running, index in the batch
+    state = states
+    count = np.count_nonzero(kernel.to_grids(states).reshape(pop,-1),axis=1)
+    previous_state = np.zeros_like(states)
+    previous_count = np.zeros(pop,dtype=int)
+    history = None
+    if CYCLE_HISTORY > 0:
+        history = _History(states,CYCLE_HISTORY)
+        history.record(active,states,iterations,*_describe(kernel,states))
+    if max_it <= 0:
+        active = active[:0]
+
+    while active.size > 0:
+        previous_previous_state,previous_previous_count = previous_state,previous_count
+        previous_state,previous_count = state,count
+        state,count = kernel.update(state)
+        iterations[active] += 1
+
+        bounds = kernel.compute_bounds(state)
+        partial_size = automatonsize_batch(bounds)
+        sizeaccumulator[active] += partial_size
+        max_size[active] = np.maximum(max_size[active],partial_size)
+        partial_distance = chebyshev_distance_batch(tuple(b[:,np.newaxis] for b in bounds),targets.T)
+        pending = ~reached[active]
+        min_distance[active] = np.where(pending,np.minimum(min_distance[active],partial_distance),min_distance[active])
+
+        """ Stopping """
+        hit = pending & np.stack([kernel.cell(state,x,y) for x,y in targets],axis=1)
+        rows,columns = np.nonzero(hit)
+        a = active[rows]
+        reached[a,columns] = True
+        hit_iteration[a,columns] = iterations[a]
+        hit_size[a,columns] = partial_size[rows]
+        hit_max_size[a,columns] = max_size[a]
+        hit_accumulator[a,columns] = sizeaccumulator[a]
+        hit = reached[active].all(axis=1)                                   # 1. Target(s) reached
+        reason[active[hit]] = profiling.STOP_REACHED
+        died = ~hit & (count == 0)                                          # 2. Death
+        reason[active[died]] = profiling.STOP_DIED
+        stop = hit | died
+        static = _equal_states(~stop & (count == previous_count),previous_state,state) # 3. Static behaviour
+        period[active[static]] = 1
+        reason[active[static]] = profiling.STOP_STATIC
+        stop |= static
+        repetitive = _equal_states(~stop & (count == previous_previous_count),     # 4. Repetitive behaviour
+                                   previous_previous_state,state)
+        period[active[repetitive]] = 2
+        reason[active[repetitive]] = profiling.STOP_PERIODIC
+        stop |= repetitive
+
+        if history is not None:
+            described = _describe(kernel,state,count)
+            found,spaceships = history.match(state,iterations[active],*described,kernel.to_grids)
+            repeated = ~stop & (found > 0)                                  # 5. Any repeated configuration
+            period[active[repeated]] = found[repeated]
+            reason[active[repeated]] = profiling.STOP_PERIODIC
+            stop |= repeated
+            for c in np.flatnonzero(repeated):
+                a = active[c]
+                base = iterations[a] - found[c]
+                phases = history.window(c,base,found[c])
+                added,iterations[a],state[c] = _repeat_cycle(kernel,phases,base,iterations[a],max_it)
+                sizeaccumulator[a] += added
+            history.record(np.arange(active.size),state,iterations[active],*described)
+
+            for c,base,p,shift in spaceships:                               # 6. Spaceships
+                a = active[c]
+                if stop[c] or iterations[a] >= max_it:
+                    continue
+                phases = kernel.to_grids(history.window(c,base,p))
+                pending = np.flatnonzero(~reached[a])
+                sizes,distances,first_hit = _extrapolate(phases,base,shift,iterations[a],max_it,targets[pending])
+                for t,h,d in zip(pending,first_hit,distances.T):
+                    if h >= 0:
+                        reached[a,t] = True
+                        hit_iteration[a,t] = iterations[a] + h + 1
+                        hit_size[a,t] = sizes[h]
+                        hit_max_size[a,t] = max(max_size[a],sizes[:h+1].max())
+                        hit_accumulator[a,t] = sizeaccumulator[a] + sizes[:h+1].sum()
+                        d = d[:h+1]
+                    min_distance[a,t] = min(min_distance[a,t],d.min())
+                sizeaccumulator[a] += sizes.sum()
+                max_size[a] = max(max_size[a],sizes.max())
+                iterations[a] += len(sizes)
+                period[a] = p
+                grid = _spaceship_grid(phases,base,shift,iterations[a])
+                state[c],count[c] = kernel.to_state(grid[np.newaxis])[0],np.count_nonzero(grid)
+                if reached[a].all():
+                    reason[a] = profiling.STOP_REACHED
+                    stop[c] = True
+                elif iterations[a] < max_it:
+                    # back to simulation, the spaceship is about to meet the border
+                    grid = _spaceship_grid(phases,base,shift,iterations[a]-1)
+                    previous_state[c],previous_count[c] = kernel.to_state(grid[np.newaxis])[0],np.count_nonzero(grid)
+                    history.reset(c)
+                    history.record(np.array([c]),state[c:c+1],iterations[a:a+1],*_describe(kernel,state[c:c+1]))
+
+        stop |= iterations[active] >= max_it
+        if stop.any():
+            final_states[active[stop]] = state[stop]
+            running = ~stop
+            active = active[running]
+            state,count = state[running],count[running]
+            previous_state,previous_count = previous_state[running],previous_count[running]
+            if history is not None:
+                history.select(running)
+
+    bounds = kernel.compute_bounds(final_states)
+    distance = np.where(reached,0,chebyshev_distance_batch(tuple(b[:,np.newaxis] for b in bounds),targets.T))
+    final_size = np.where(reached,hit_size,automatonsize_batch(bounds)[:,np.newaxis])
+    iterations = np.where(reached,hit_iteration,iterations[:,np.newaxis])
+    max_size = np.where(reached,hit_max_size,max_size[:,np.newaxis])
+    sizeaccumulator = np.where(reached,hit_accumulator,sizeaccumulator[:,np.newaxis])
+    # integer division truncating towards zero, as in c++
+    avg_size = np.sign(sizeaccumulator) * (np.abs(sizeaccumulator) // (iterations+1))
+    period = np.where(reached,0,period[:,np.newaxis])
+    reason = np.where(reached,profiling.STOP_REACHED,reason[:,np.newaxis])
+
+    results = np.stack([distance,final_size,iterations,max_size,avg_size,min_distance,period,reason],axis=2)
+    return results if np.ndim(target) == 2 else results[:,0]
+
+"""--Pre-screening------------------------------------------------------------"""
+#  Most random and crossed-over candidates die, freeze or blink within a couple
+#  of iterations: every still life and period-2 oscillator is caught by the
+#  static and repetitive rules at the first or second iteration. Simulating
+#  PRESCREEN_STEPS iterations of the whole population with the same rules as
+#  the c++ core gives their exact results, so they never reach the c++ engines
+#  (no config file, process or request). The in-process engines skip it:
+#  simulate_batch drops every candidate at the iteration it stops, so the
+#  first iterations are the same pre-screen and the other candidates go on
+#  from the state they reached.
+#  PRESCREEN_STEPS = 0 sends every candidate to the engine.
+PRESCREEN_STEPS = 2
+
+## Results of the grids that stop within @steps iterations
+#
+#  @target is a cell or a list of K cells, as in simulate_batch: a grid stops
+#  when it reaches every target, or by the other rules.
+#  @return a boolean mask of the settled grids and their (pop,8) rows, as
+#          returned by simulate_batch (the other rows are meaningless)
+def prescreen_batch(grids,max_it,target,steps=PRESCREEN_STEPS):
+    targets = np.reshape(np.asarray(target,dtype=int),(-1,2))
+    tx,ty = targets.T
+    pop = len(grids)
+    cell_axes = (1,2)
+
+    bounds = compute_bounds_batch(grids)
+    max_size = automatonsize_batch(bounds)[:,np.newaxis].repeat(len(targets),axis=1)
+    sizeaccumulator = max_size.copy()
+    min_distance = chebyshev_distance_batch(tuple(b[:,np.newaxis] for b in bounds),targets.T)
+    final_bounds = np.stack(bounds,axis=1)[:,np.newaxis].repeat(len(targets),axis=1)
+
+    iterations = np.zeros((pop,len(targets)),dtype=int)
+    period = np.zeros(pop,dtype=int)
+    reason = np.full(pop,-1)
+    reached = np.zeros((pop,len(targets)),dtype=bool)
+    running = np.ones(pop,dtype=bool)
+
+    previous_previous,previous = None,np.asarray(grids,dtype=bool)
+    state = previous
+    for i in range(1,min(steps,max_it)+1):
+        state,countTrue = update_batch(state)
+        bounds = compute_bounds_batch(state)
+        partial_size = automatonsize_batch(bounds)[:,np.newaxis]
+        # the metrics of a target stop when it is reached
+        pending = running[:,np.newaxis] & ~reached
+        sizeaccumulator += np.where(pending,partial_size,0)
+        max_size = np.where(pending,np.maximum(max_size,partial_size),max_size)
+        partial_distance = chebyshev_distance_batch(tuple(b[:,np.newaxis] for b in bounds),targets.T)
+        min_distance = np.where(pending,np.minimum(min_distance,partial_distance),min_distance)
+        iterations[pending] = i
+        final_bounds[pending] = np.stack(bounds,axis=1)[np.nonzero(pending)[0]]
+
+        reached |= pending & state[:,ty,tx]
+        hit = running & reached.all(axis=1)                                 # 1. Target(s) reached
+        died = running & ~hit & (countTrue == 0)                            # 2. Death
+        stop = hit | died
+        static = running & ~stop & (state == previous).all(axis=cell_axes)  # 3. Static behaviour
+        stop |= static
+        repetitive = np.zeros(pop,dtype=bool)
+        if previous_previous is not None:                                   # 4. Repetitive behaviour
+            repetitive = running & ~stop & (state == previous_previous).all(axis=cell_axes)
+        stop |= repetitive
+        timeout = running & ~stop & (i >= max_it)
+        stop |= timeout
+
+        reason[hit] = profiling.STOP_REACHED
+        reason[died] = profiling.STOP_DIED
+        reason[static] = profiling.STOP_STATIC
+        reason[repetitive] = profiling.STOP_PERIODIC
+        reason[timeout] = profiling.STOP_TIMEOUT
+        period[static] = 1
+        period[repetitive] = 2
+        running &= ~stop
+        if not running.any():
+            break
+        previous_previous,previous = previous,state
+
+    bounds = tuple(np.moveaxis(final_bounds,2,0))
+    distance = np.where(reached,0,chebyshev_distance_batch(bounds,targets.T))
+    # integer division truncating towards zero, as in c++
+    avg_size = np.sign(sizeaccumulator) * (np.abs(sizeaccumulator) // (iterations+1))
+    period = np.where(reached,0,period[:,np.newaxis])
+    reason = np.where(reached,profiling.STOP_REACHED,reason[:,np.newaxis])
+    rows = np.stack([distance,automatonsize_batch(bounds),iterations,max_size,avg_size,min_distance,period,reason],axis=2)
+    return ~running,(rows if np.ndim(target) == 2 else rows[:,0])
+
+"""--Persistent c++ workers--------------------------------------------------"""
+
+LIFECORE = "./lifecore"
+
+## Pool of persistent c++ core processes
+#
+#  Every worker is a `lifecore --worker` process that reads bit-packed grids
+#  from its stdin and writes back fixed-size records of metrics (see the
+#  protocol in LIFEcore/main.cpp). A population is split among the workers and
+#  all the requests of a worker are written in one go, while its results are
+#  read back, so the pool is kept busy for the whole generation.
+class LifecoreClient():
+    RECORD = np.dtype('=i4')
+    METRICS = 7
+
+    def __init__(self,workers=None,executable=None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if executable is None:
+            executable = LIFECORE
+        self.processes = [subprocess.Popen([executable,"--worker"],
+                                           stdin=subprocess.PIPE,
+                                           stdout=subprocess.PIPE)
+                          for _ in range(workers)]
+
+    ## Serialize the simulation requests for a batch of grids and (K,2) @targets
+    def _requests(self,grids,max_it,targets):
+        words = pack_grids(grids).astype('=u8')
+        header = np.concatenate(([max_it,grids.shape[1],len(targets)],targets.ravel())).astype(self.RECORD)
+        length = np.array([header.nbytes + words[0].nbytes],dtype='=u4')
+        prefix = length.tobytes() + header.tobytes()
+        return b"".join(prefix + grid.tobytes() for grid in words)
+
+    def _write(self,process,data):
+        process.stdin.write(data)
+        process.stdin.flush()
+
+    def _read(self,process,count,targets):
+        size = count * targets * self.METRICS * self.RECORD.itemsize
+        data = b""
+        while len(data) < size:
+            chunk = process.stdout.read(size - len(data))
+            if not chunk:
+                raise RuntimeError("ERROR: lifecore worker terminated")
+            data += chunk
+        return np.frombuffer(data,dtype=self.RECORD).reshape(count,targets,self.METRICS)
+
+    ## Simulate a batch of grids
+    #
+    #  @target is a cell or a list of K cells, all measured in one simulation
+    #  @return (pop,7) integer array, the six metrics of simulate_batch and the
+    #          stop reason (profiling.STOP_REASONS); (pop,K,7) with a list of targets
+    def evaluate(self,grids,max_it,target):
+        grids = np.asarray(grids,dtype=bool)
+        targets = np.reshape(np.asarray(target,dtype=int),(-1,2))
+        chunks = np.array_split(np.arange(len(grids)),len(self.processes))
+        jobs = [(process,chunk) for process,chunk in zip(self.processes,chunks) if chunk.size > 0]
+        writers = [threading.Thread(target=self._write,
+                                    args=(process,self._requests(grids[chunk],max_it,targets)))
+                   for process,chunk in jobs]
+        for writer in writers:
+            writer.start()
+        results = np.concatenate([self._read(process,chunk.size,len(targets)) for process,chunk in jobs])
+        for writer in writers:
+            writer.join()
+        results = results.astype(int)
+        return results if np.ndim(target) == 2 else results[:,0]
+
+    def close(self):
+        for process in self.processes:
+            process.stdin.close()
+        for process in self.processes:
+            process.wait()
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
+
+## Pool of persistent c++ core processes sharing memory with Python
+#
+#  Every worker is a `lifecore --shm <name> <capacity>` process attached to its
+#  own POSIX shared memory block (see the layout in LIFEcore/main.cpp): grids
+#  are packed straight into the block and the metrics read back from it, the
+#  pipes only carry the number of grids of each request and its completion.
+#  Batches larger than @capacity grids per worker are simulated in rounds.
+#  The blocks are sized for the grids of the first batch, and the workers
+#  started again with larger blocks if a batch of larger grids comes.
+class SharedLifecoreClient(LifecoreClient):
+    HEADER = 3
+
+    def __init__(self,workers=None,executable=None,capacity=1024):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if executable is None:
+            executable = LIFECORE
+        self.workers = workers
+        self.executable = executable
+        self.capacity = capacity
+        self.size = 0
+        self.targets = 0
+        self.blocks = []
+        self.processes = []
+        self.views = []
+
+    ## Bytes of the header for @targets targets, padded to the 8 bytes of the grid words
+    def _header_size(self,targets):
+        return (self.HEADER + 2*targets + 1) // 2 * 2 * 4
+
+    ## Start the workers, with blocks holding @capacity grids of @size cells
+    #  measured on @targets targets
+    def _start(self,size,targets):
+        from multiprocessing import shared_memory
+        words = (size + 63) // 64
+        grids_size = self.capacity * size * words * 8
+        records_size = self.capacity * targets * self.METRICS * self.RECORD.itemsize
+        for _ in range(self.workers):
+            block = shared_memory.SharedMemory(create=True,size=self._header_size(targets) + grids_size + records_size)
+            self.blocks.append(block)
+            self.processes.append(subprocess.Popen([self.executable,"--shm","/" + block.name,str(self.capacity)],
+                                                   stdin=subprocess.PIPE,
+                                                   stdout=subprocess.PIPE))
+        self.size = size
+        self.targets = targets
+
+    ## Views of the header, grids and records of @block for grids of @size cells
+    #  and @targets targets
+    def _views(self,block,size,targets):
+        words = (size + 63) // 64
+        grids_size = self.capacity * size * words * 8
+        offset = self._header_size(targets)
+        header = np.ndarray((self.HEADER + 2*targets,),dtype=self.RECORD,buffer=block.buf)
+        grids = np.ndarray((self.capacity,size,words),dtype='=u8',buffer=block.buf,offset=offset)
+        records = np.ndarray((self.capacity,targets,self.METRICS),dtype=self.RECORD,buffer=block.buf,
+                             offset=offset + grids_size)
+        return header,grids,records
+
+    ## Simulate a batch of grids
+    #
+    #  @target is a cell or a list of K cells, all measured in one simulation
+    #  @return (pop,7) integer array, the six metrics of simulate_batch and the
+    #          stop reason (profiling.STOP_REASONS); (pop,K,7) with a list of targets
+    def evaluate(self,grids,max_it,target):
+        grids = np.asarray(grids,dtype=bool)
+        targets = np.reshape(np.asarray(target,dtype=int),(-1,2))
+        size = grids.shape[1]
+        if size > self.size or len(targets) > self.targets:
+            self.close()
+            self._start(max(size,self.size),max(len(targets),self.targets))
+        self.views = [self._views(block,size,len(targets)) for block in self.blocks]
+        words = pack_grids(grids)
+        results = np.empty((len(words),len(targets),self.METRICS),dtype=int)
+        chunks = np.array_split(np.arange(len(words)),len(self.processes))
+        for start in range(0,max(len(chunk) for chunk in chunks),self.capacity):
+            jobs = []
+            for process,(header,grids_view,records),chunk in zip(self.processes,self.views,chunks):
+                chunk = chunk[start:start+self.capacity]
+                if chunk.size == 0:
+                    continue
+                header[:] = np.concatenate(([max_it,size,len(targets)],targets.ravel()))
+                grids_view[:chunk.size] = words[chunk]
+                process.stdin.write(np.array([chunk.size],dtype='=u4').tobytes())
+                process.stdin.flush()
+                jobs.append((process,records,chunk))
+            for process,records,chunk in jobs:
+                if len(process.stdout.read(4)) != 4:
+                    raise RuntimeError("ERROR: lifecore worker terminated")
+                results[chunk] = records[:chunk.size]
+        return results if np.ndim(target) == 2 else results[:,0]
+
+    def close(self):
+        LifecoreClient.close(self)
+        self.views = []
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+        self.size = 0
+        self.targets = 0
+
+"""--Native library-----------------------------------------------------------"""
+
+LIBLIFECORE = "./liblifecore.so"
+
+## The c++ core loaded as a shared library (built with the LIBRARY flag)
+#
+#  evaluate_batch is called through ctypes, which releases the GIL for the
+#  whole call: batches are split among @threads threads simulating at once.
+#  The grid size is passed with every call.
+class LifecoreLibrary():
+    METRICS = 7
+
+    def __init__(self,threads=None,path=None):
+        if threads is None:
+            threads = os.cpu_count() or 1
+        if path is None:
+            path = LIBLIFECORE
+        self.library = ctypes.CDLL(os.path.abspath(path))
+        self.library.evaluate_batch.argtypes = [ctypes.c_void_p,ctypes.c_int,ctypes.c_int,
+                                                ctypes.c_int,ctypes.c_void_p,ctypes.c_int,
+                                                ctypes.c_void_p]
+        self.library.evaluate_batch.restype = ctypes.c_int
+        self.executor = concurrent.futures.ThreadPoolExecutor(threads)
+        self.threads = threads
+
+    ## Simulate contiguous @grids into the int32 @results rows, for the int32 (K,2) @targets
+    def _evaluate(self,grids,max_it,targets,results):
+        status = self.library.evaluate_batch(grids.ctypes.data,len(grids),grids.shape[1],max_it,
+                                             targets.ctypes.data,len(targets),results.ctypes.data)
+        if status != 0:
+            raise ValueError("ERROR: bad arguments for the c++ core library")
+
+    ## Simulate a batch of grids
+    #
+    #  @target is a cell or a list of K cells, all measured in one simulation
+    #  @return (pop,7) integer array, the six metrics of simulate_batch and the
+    #          stop reason (profiling.STOP_REASONS); (pop,K,7) with a list of targets
+    def evaluate(self,grids,max_it,target):
+        grids = np.ascontiguousarray(grids,dtype=bool).view(np.uint8)
+        targets = np.ascontiguousarray(np.reshape(target,(-1,2)),dtype=np.int32)
+        results = np.zeros((len(grids),len(targets),self.METRICS),dtype=np.int32)
+        chunks = [chunk for chunk in np.array_split(np.arange(len(grids)),self.threads) if chunk.size > 0]
+        jobs = [self.executor.submit(self._evaluate,grids[chunk[0]:chunk[-1]+1],max_it,targets,
+                                     results[chunk[0]:chunk[-1]+1])
+                for chunk in chunks]
+        for job in jobs:
+            job.result()
+        results = results.astype(int)
+        return results if np.ndim(target) == 2 else results[:,0]
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
+
+""" Processes (threads for the library) of the engines backed by the c++ core,
+    one per core if None """
+LIFECORE_WORKERS = None
+
+## Clients of the engines backed by the c++ core
+LIFECORE_CLIENTS = {"worker": LifecoreClient,"shm": SharedLifecoreClient,"library": LifecoreLibrary}
+
+_lifecore_clients = {}
+## Shared client of the @engine engine, started on first use
+def get_lifecore_client(engine="worker"):
+    if engine not in _lifecore_clients:
+        if not _lifecore_clients:
+            atexit.register(close_lifecore_clients)
+        _lifecore_clients[engine] = LIFECORE_CLIENTS[engine](LIFECORE_WORKERS)
+    return _lifecore_clients[engine]
+
+## Stop the shared clients, eg. before a process ends without running atexit
+def close_lifecore_clients():
+    while _lifecore_clients:
+        _lifecore_clients.popitem()[1].close()
@@ -22,6 +22,13 @@ import os
 import life
 from inspyred import ec
 import copy
+import multiprocessing
+import functools
+import observers
+import checkpoint
+import profiling
+import trajectory
+import pareto
 
 """--Parameters for LIFE..---------------------------------------------------"""
 
@@ -31,6 +38,9 @@ MAX_ITERATIONS = 1000
 N = 40
 """ Life target cell      """
 TARGET = (N-4,N-4)
+""" Genotype patch size and its position in the grid, (x,y) """
+genotypeSize = (10,10)
+placement = (10,10)
 
 """--Parameters for the EC---------------------------------------------------"""
 
@@ -45,9 +55,18 @@ crossoverRate = 0.10
 numCrossoverPoints =  5
 selectionSize = populationSize
 numElites = 10
+evaluationWorkers = 1                         # >1 evaluates generations in a process pool (the c++ engines already use every core)
+fitnessCacheSize = 100000                     # compute_fitness results kept in the LRU cache
+multiObjective = False                        # NSGA-II on (min_distance, iterations, max_size) instead of their weighted sum, see pareto.py
+checkpointFile = "./checkpoint.npz"           # snapshot of the evolution, see checkpoint.py
+checkpointInterval = 0                        # generations between snapshots, 0 to disable
+profileFile = None                            # per-generation stage times and stop reasons (JSON lines), see profiling.py
+traceFile = None                              # every timed stage, Chrome trace format
 
 """--Visualization-----------------------------------------------------------"""
 display = True
+asyncObservers = True                         # statistics, files and plot off the evolution loop
+trajectoryFile = "./bestindividual.trj"       # generations of the best individual, see trajectory.py (None to skip)
 SHOW_BEFOREAFTER_LIFEFLIP = False
 SHOW_BEFOREAFTER_RESETRANDOM = False
 SHOW_BEFOREAFTER_LIFEITERATION = False
@@ -59,56 +78,121 @@ class AutomatonEvaluator():
         self.seed = seed                # seed for random generator
         # self.bounder = ec.Bounder(0, 1) # Discrete bounder to boolean values
         self.bounder = ec.DiscreteBounder([0,1]) # Discrete bounder to boolean values
+        if life.GENOTYPE == "cartesian":
+            self.bounder = ec.DiscreteBounder(list(range(-1,N))) # cell coordinates, -1 for none
         self.maximize = False           # Flag to define the problem nature
         self.genCount = 0               # generation count
+        self.cache = life.FitnessCache(fitnessCacheSize) # already evaluated genotypes
 
     ## Generator method
     #  This generates new individuals
     def generator(self, random, args):
-        newgen = life.get_random_genotype()
+        newgen = life.get_random_genotype(numpy_random(random, args))
         return np.reshape(newgen,-1)
 
     ## Evaluator method
     #  This evaluates the fitness of the given individual/s (@candidates)
     def evaluator(self, candidates, args):
         fitness = []
-        for candidate in candidates:
-
-            distances,sizes,iterations = life.compute_fitness(candidate,
-                                                              MAX_ITERATIONS,
-                                                              TARGET)
-
-            (final_distance,min_distance) = distances
-            (final_size,max_size,avg_size) = sizes
-
-            initial_alive_cell_count = life.count_alive_cells(candidate)
-
-            """-----------Fitness formulation--------------------------------"""
-            """
-               Metrics that can be used
-                - final_distance
-                - min_distance
-                - final_size
-                - max_size
-                - avg_size
-                - iterations
-                - initial_alive_cell_count
-            """
-            if(final_distance != 0):
-                iterations = MAX_ITERATIONS
-                max_size = N * N
-                initial_alive_cell_count = life.GENOTYPExSIZE * life.GENOTYPEySIZE
-            # else:
-            #     print("iterations: " + str(iterations))
-            #     print("max_size  : " + str(max_size))
-
-            fitness_c  = (1 * min_distance) + (3 * iterations) + (10 * max_size)
-            """--------------------------------------------------------------"""
-
-            fitness.append(fitness_c)
+        with profiling.stage('evaluate.lookup'):
+            results = self.cache.compute(candidates,MAX_ITERATIONS,TARGET,self.simulate)
+        with profiling.stage('evaluate.fitness'):
+            alive_cell_counts = life.count_alive_cells_batch(candidates)
+            for initial_alive_cell_count,(distances,sizes,iterations) in zip(alive_cell_counts,results):
+
+                (final_distance,min_distance) = distances
+                (final_size,max_size,avg_size) = sizes
+
+                """-----------Fitness formulation--------------------------------"""
+                """
+                   Metrics that can be used
+                    - final_distance
+                    - min_distance
+                    - final_size
+                    - max_size
+                    - avg_size
+                    - iterations
+                    - initial_alive_cell_count
+                """
+                if(final_distance != 0):
+                    iterations = MAX_ITERATIONS
+                    max_size = N * N
+                    initial_alive_cell_count = (life.GENOTYPE_SIZE if life.GENOTYPE == "cartesian"
+                                                else life.GENOTYPExSIZE * life.GENOTYPEySIZE)
+                # else:
+                #     print("iterations: " + str(iterations))
+                #     print("max_size  : " + str(max_size))
+
+                if multiObjective:
+                    fitness_c = inspyred.ec.emo.Pareto([min_distance, iterations, max_size])
+                else:
+                    fitness_c = (1 * min_distance) + (3 * iterations) + (10 * max_size)
+                """--------------------------------------------------------------"""
+
+                fitness.append(fitness_c)
         self.genCount += 1
         return fitness
 
+    ## Simulation method
+    #  This returns the compute_fitness tuples of the @candidates, in order
+    def simulate(self, candidates, max_it, target):
+        with profiling.stage('evaluate.simulate'):
+            return life.compute_fitness_batch(candidates,max_it,target)
+
+    ## Observer method
+    #  This reports the hits and misses of the fitness cache
+    def cache_observer(self, population, num_generations, num_evaluations, args):
+        lookups = self.cache.hits + self.cache.misses
+        rate = 100.0 * self.cache.hits / lookups if lookups else 0.0
+        print('Fitness cache: {0} hits, {1} misses ({2:.1f}% hit rate), {3} entries'.format(
+              self.cache.hits, self.cache.misses, rate, len(self.cache.entries)))
+
+    ## Fitness cache counters, as extra columns of observers.AsyncObserver
+    def cache_statistics(self):
+        return {'cache_hits': self.cache.hits, 'cache_misses': self.cache.misses,
+                'cache_entries': len(self.cache.entries)}
+
+## Initialize the LIFE module in the evaluation processes
+def init_evaluation_worker(n, genotype_size, genotype_placement, genotype, cells, engine, profile, trace):
+    life.GENOTYPE = genotype
+    life.GENOTYPE_SIZE = cells
+    life.set_geometry(n, genotype_size, genotype_placement)
+    life.ENGINE = engine
+    # the pool already spreads the population over the cores
+    life.LIFECORE_WORKERS = 1
+    profiling.ENABLED = profile
+    profiling.TRACE = trace
+
+## Simulate a slice of the population in an evaluation process
+#  This returns the results and the profiling counters of the process
+def simulate_chunk(job):
+    candidates,max_it,target = job
+    return life.compute_fitness_batch(candidates,max_it,target),profiling.take()
+
+# this object spreads each generation over a pool of processes, one per core by
+# default. Every process simulates a contiguous slice of the candidates and the
+# slices are joined back in candidate order.
+class ParallelAutomatonEvaluator(AutomatonEvaluator):
+    def __init__(self,seed,workers=None):
+        AutomatonEvaluator.__init__(self,seed)
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = multiprocessing.Pool(self.workers,
+                                         initializer=init_evaluation_worker,
+                                         initargs=(N,genotypeSize,placement,life.GENOTYPE,life.GENOTYPE_SIZE,
+                                                   life.ENGINE,profiling.ENABLED,profiling.TRACE))
+
+    def simulate(self, candidates, max_it, target):
+        with profiling.stage('evaluate.simulate'):
+            chunks = np.array_split(np.arange(len(candidates)),self.workers)
+            parts = self.pool.map(simulate_chunk,[([candidates[i] for i in chunk],max_it,target) for chunk in chunks if chunk.size > 0])
+            for part,counters in parts:
+                profiling.merge(counters)
+            return [result for part,counters in parts for result in part]
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
 
 '''
             custom CROSSOVER operators
@@ -255,6 +339,80 @@ def SUBcrossover(random, mom, dad, args):
         children.append(dad)
     return children
 
+'''
+            batched CROSSOVER operators
+    The same set operators applied at once to all the pairs of parents, the
+    random choices being drawn from the NumPy generator in args (see
+    numpy_random).
+'''
+def numpy_random(random, args):
+    """Return the NumPy Generator of the run.
+
+    main() passes one seeded from the run seed as *numpy_random*; if it is
+    missing, one is seeded from ``random`` so that runs stay reproducible.
+    """
+    if 'numpy_random' not in args:
+        args['numpy_random'] = np.random.default_rng(random.getrandbits(64))
+    return args['numpy_random']
+
+def batch_crossover(cross):
+    """Return a variator applying the set operator ``cross`` to all the
+    pairs of parents at once.
+
+    Parents are paired as by inspyred.ec.variators.crossover (moms and dads
+    alternate, the last candidate is discarded if they are odd). Each pair is
+    crossed with probability *crossover_rate* (default 1.0), producing the
+    children returned by ``cross``, otherwise mom and dad are kept.
+
+    The given function ``cross`` must have the following signature::
+
+        offspring = cross(moms, dads)
+
+    where moms and dads are boolean (pairs,genotype size) matrices and
+    offspring a list of matrices of the same shape, one per child.
+    """
+    @functools.wraps(cross)
+    def batch_crossover_variator(random, candidates, args):
+        crossover_rate = args.setdefault('crossover_rate', 1.0)
+        pairs = len(candidates) // 2
+        if pairs == 0:
+            return []
+        parents = np.array(candidates[:2*pairs]) != 0
+        moms,dads = parents[::2],parents[1::2]
+        crossing = numpy_random(random, args).random(pairs) < crossover_rate
+        offspring = cross(moms, dads)
+
+        children = []
+        for i in range(pairs):
+            if crossing[i]:
+                children.extend(child[i] for child in offspring)
+            else:
+                children.append(candidates[2*i])
+                children.append(candidates[2*i+1])
+        return children
+    return batch_crossover_variator
+
+@batch_crossover
+def UNIONcrossover_batch(moms, dads):
+    """Return the union of every pair, as UNIONcrossover."""
+    return [np.logical_or(dads,moms)]
+
+@batch_crossover
+def INTERcrossover_batch(moms, dads):
+    """Return the intersection of every pair, as INTERcrossover."""
+    return [np.logical_and(dads,moms)]
+
+@batch_crossover
+def XORcrossover_batch(moms, dads):
+    """Return the boolean XOR of every pair, as XORcrossover."""
+    return [np.logical_xor(dads,moms)]
+
+@batch_crossover
+def SUBcrossover_batch(moms, dads):
+    """Return the two set subtractions of every pair, as SUBcrossover."""
+    return [np.logical_and(dads,np.logical_not(moms)),
+            np.logical_and(moms,np.logical_not(dads))]
+
 '''
             custom MUTATION operators
     Following functions implements custom mutation operators.
@@ -322,6 +480,69 @@ def resetrandom_mutation(random, candidate, args):
 
     return mutant
 
+def life_flip_mutation_batch(random, candidates, args):
+    """Return the mutants produced by bit-flip mutation on all the candidates
+       at once, drawing from the NumPy generator of the run
+
+    .. Arguments:
+       random -- the random number generator object
+       candidates -- the candidate solutions
+       args -- a dictionary of keyword arguments
+
+    Optional keyword arguments in args:
+    - *mutation_rate* -- the rate at which mutation is performed (default 0.1)
+                         The mutation rate is applied on a bit by bit basis.
+    """
+    rate = args.setdefault('mutation_rate', 0.1)
+    if len(candidates) == 0:
+        return []
+
+    genotypes = np.array(candidates)
+    flip = numpy_random(random, args).random(genotypes.shape) < rate
+    mutants = np.where(flip, genotypes == 0, genotypes != 0).astype(genotypes.dtype)
+
+    if(SHOW_BEFOREAFTER_LIFEFLIP):
+        for candidate, mutant in zip(candidates, mutants):
+            print("\nBefore")
+            life.display_genotype(candidate)
+            print("\nAfter")
+            life.display_genotype(mutant)
+    return list(mutants)
+
+def resetrandom_mutation_batch(random, candidates, args):
+    """Reset cells of all the candidates at once and randomly flip them on,
+       with certain bias, drawing from the NumPy generator of the run
+
+    .. Arguments:
+       random -- the random number generator object
+       candidates -- the candidate solutions
+       args -- a dictionary of keyword arguments
+
+    Optional keyword arguments in args:
+    - *mutation_rate* -- the rate at which mutation is performed (default 0.1)
+                         The mutation rate is applied on a bit by bit basis.
+    - *flip_bias*     -- The bias towards the TRUE value
+    """
+    rate = args.setdefault('mutation_rate', 0.1)
+    bias = args.setdefault('flip_bias', 0.5)
+    if len(candidates) == 0:
+        return []
+
+    genotypes = np.array(candidates)
+    generator = numpy_random(random, args)
+    reset = generator.random(genotypes.shape) < rate
+    value = generator.random(genotypes.shape) < bias
+    mutants = np.where(reset, value, genotypes != 0).astype(genotypes.dtype)
+
+    if(SHOW_BEFOREAFTER_RESETRANDOM):
+        for candidate, mutant in zip(candidates, mutants):
+            print("\nBefore")
+            life.display_genotype(candidate)
+            print("\nAfter")
+            life.display_genotype(mutant)
+
+    return list(mutants)
+
 def lifeiteration_mutation(random, candidate, args):
     """Perform one iteration of LIFE as a mutation
        Applied globally to the genotype, not on an element base
@@ -348,109 +569,243 @@ def lifeiteration_mutation(random, candidate, args):
 
     return mutant
 
-def main(rng, seed, display=False):
-    problem = AutomatonEvaluator(seed)
+def lifeiteration_mutation_batch(random, candidates, args):
+    """Perform one iteration of LIFE as a mutation on the whole population
+       Same mutants as lifeiteration_mutation applied to every candidate,
+       with the selected candidates updated at once
+
+    .. Arguments:
+       random -- the random number generator object
+       candidates -- the candidate solutions
+       args -- a dictionary of keyword arguments
+
+    Optional keyword arguments in args:
+    - *mutation_rate* -- the rate at which mutation is performed (default 0.1)
+    """
+    rate = args.setdefault('mutation_rate', 0.1)
+
+    mutants = [copy.copy(candidate) for candidate in candidates]
+    selected = [i for i in range(len(candidates)) if random.random() < rate]
+    if selected:
+        iterated = life.lifeiteration_batch([candidates[i] for i in selected])
+        for i, mutant in zip(selected, iterated):
+            mutants[i] = mutant
 
-    # --------------------------------------------------------------------------- #
-    # EA configuration
+            if(SHOW_BEFOREAFTER_LIFEITERATION):
+                print("\nBefore")
+                life.display_genotype(candidates[i])
+                print("\nAfter")
+                life.display_genotype(mutant)
 
-    # the evolutionary algorithm (EvolutionaryComputation is a fully configurable evolutionary algorithm)
-    # standard GA, ES, SA, DE, EDA, PAES, NSGA2, PSO and ACO are also available
-    ea = inspyred.ec.EvolutionaryComputation(rng)
+    return mutants
 
-    # observers: provide various logging features
-    if display:
-        ea.observer = [inspyred.ec.observers.stats_observer,
-                       inspyred.ec.observers.file_observer,
-                       inspyred.ec.observers.plot_observer] #,
-                       #inspyred.ec.observers.best_observer,
-                       #inspyred.ec.observers.population_observer,
-
-    # selection operator
-    #ea.selector = inspyred.ec.selectors.truncation_selection
-    #ea.selector = inspyred.ec.selectors.uniform_selection
-    #ea.selector = inspyred.ec.selectors.fitness_proportionate_selection
-    #ea.selector = inspyred.ec.selectors.rank_selection
-    ea.selector = inspyred.ec.selectors.tournament_selection
-
-    # variation operators (mutation/crossover)
-    ea.variator = [
-                    # inspyred.ec.variators.gaussian_mutation,
-                    # inspyred.ec.variators.n_point_crossover,
-                    # inspyred.ec.variators.random_reset_mutation,
-                    # # inspyred.ec.variators.inversion_mutation,
-                    # inspyred.ec.variators.uniform_crossover,
-                    # inspyred.ec.variators.partially_matched_crossover,
-                    inspyred.ec.variators.crossover(UNIONcrossover),
-                    inspyred.ec.variators.crossover(INTERcrossover),
-                    inspyred.ec.variators.crossover(XORcrossover),
-                    inspyred.ec.variators.crossover(SUBcrossover),
-                    inspyred.ec.variators.mutator(life_flip_mutation),
-                    inspyred.ec.variators.mutator(resetrandom_mutation),
-                    inspyred.ec.variators.mutator(lifeiteration_mutation)
-                    ]
-
-    # replacement operator
-    #ea.replacer = inspyred.ec.replacers.truncation_replacement
-    #ea.replacer = inspyred.ec.replacers.steady_state_replacement
-    #ea.replacer = inspyred.ec.replacers.random_replacement
-    # ea.replacer = inspyred.ec.replacers.plus_replacement
-    # ea.replacer = inspyred.ec.replacers.comma_replacement     #No elitism, bad in this case
-    #ea.replacer = inspyred.ec.replacers.crowding_replacement
-    #ea.replacer = inspyred.ec.replacers.simulated_annealing_replacement
-    #ea.replacer = inspyred.ec.replacers.nsga_replacement
-    #ea.replacer = inspyred.ec.replacers.paes_replacement
-    ea.replacer = inspyred.ec.replacers.generational_replacement
-
-    # termination condition
-    #ea.terminator = inspyred.ec.terminators.evaluation_termination
-    #ea.terminator = inspyred.ec.terminators.no_improvement_termination
-    #ea.terminator = inspyred.ec.terminators.diversity_termination
-    #ea.terminator = inspyred.ec.terminators.time_termination
-    ea.terminator = inspyred.ec.terminators.generation_termination
-
-    # --------------------------------------------------------------------------- #
-
-    # run the EA
-    final_pop = ea.evolve(evaluator=problem.evaluator,
-                          generator=problem.generator,
-                          bounder=problem.bounder,
-                          maximize=problem.maximize,
-                          pop_size=populationSize,
-                          max_generations=numberOfGenerations,
-                          max_evaluations=numberOfEvaluations,
-                          tournament_size=tournamentSize,
-                          mutation_rate=mutationRate,
-                          gaussian_mean=gaussianMean,
-                          gaussian_stdev=gaussianStdev,
-                          crossover_rate=crossoverRate,
-                          num_crossover_points=numCrossoverPoints,
-                          num_selected=selectionSize,
-                          num_elites=numElites,
-                          flip_bias = 0.2)
+## Run the evolution
+#
+#  @resume is a checkpoint.Snapshot to go on with, @rng and @seed are then
+#  replaced by the saved ones. @warmstart is a Snapshot whose population is
+#  the initial population of this run.
+def main(rng, seed, display=False, migrator=None, resume=None, warmstart=None):
+    numpy_rng = np.random.default_rng(seed)
+    initial_population = None
+    if resume is not None:
+        seed = resume.seed
+        rng.setstate(resume.random_state)
+        numpy_rng = resume.numpy_random()
+        initial_population = resume.candidates
+    elif warmstart is not None:
+        initial_population = warmstart.candidates[:populationSize]
+
+    # the evaluation processes take the trace setting when the pool starts
+    profiling.TRACE = bool(traceFile)
+    if evaluationWorkers > 1:
+        problem = ParallelAutomatonEvaluator(seed,evaluationWorkers)
+    else:
+        problem = AutomatonEvaluator(seed)
+
+    # the pool, the observer process and the profile file are released even if the run fails
+    observer = None
+    profiler = None
+    try:
+        # --------------------------------------------------------------------------- #
+        # EA configuration
+
+        # the evolutionary algorithm (EvolutionaryComputation is a fully configurable evolutionary algorithm)
+        # standard GA, ES, SA, DE, EDA, PAES, NSGA2, PSO and ACO are also available
+        ea = inspyred.ec.EvolutionaryComputation(rng)
+
+        # observers: provide various logging features
+        if display and asyncObservers:
+            observer = observers.AsyncObserver(extra=problem.cache_statistics)
+            ea.observer = observer
+        elif display:
+            ea.observer = [inspyred.ec.observers.stats_observer,
+                           inspyred.ec.observers.file_observer,
+                           inspyred.ec.observers.plot_observer,
+                           problem.cache_observer] #,
+                           #inspyred.ec.observers.best_observer,
+                           #inspyred.ec.observers.population_observer,
+
+        # selection operator
+        #ea.selector = inspyred.ec.selectors.truncation_selection
+        #ea.selector = inspyred.ec.selectors.uniform_selection
+        #ea.selector = inspyred.ec.selectors.fitness_proportionate_selection
+        #ea.selector = inspyred.ec.selectors.rank_selection
+        ea.selector = inspyred.ec.selectors.tournament_selection
+        if multiObjective:
+            ea.selector = pareto.crowded_tournament_selection
+
+        # variation operators (mutation/crossover)
+        ea.variator = [
+                        # inspyred.ec.variators.gaussian_mutation,
+                        # inspyred.ec.variators.n_point_crossover,
+                        # inspyred.ec.variators.random_reset_mutation,
+                        # # inspyred.ec.variators.inversion_mutation,
+                        # inspyred.ec.variators.uniform_crossover,
+                        # inspyred.ec.variators.partially_matched_crossover,
+                        # inspyred.ec.variators.crossover(UNIONcrossover),
+                        # inspyred.ec.variators.crossover(INTERcrossover),
+                        # inspyred.ec.variators.crossover(XORcrossover),
+                        # inspyred.ec.variators.crossover(SUBcrossover),
+                        # inspyred.ec.variators.mutator(life_flip_mutation),
+                        # inspyred.ec.variators.mutator(resetrandom_mutation),
+                        UNIONcrossover_batch,
+                        INTERcrossover_batch,
+                        XORcrossover_batch,
+                        SUBcrossover_batch,
+                        life_flip_mutation_batch,
+                        resetrandom_mutation_batch,
+                        lifeiteration_mutation_batch
+                        ]
+        if life.GENOTYPE == "cartesian":
+            # the set and life operators need matrix genotypes
+            ea.variator = [inspyred.ec.variators.n_point_crossover,
+                           inspyred.ec.variators.random_reset_mutation]
+
+        # replacement operator
+        #ea.replacer = inspyred.ec.replacers.truncation_replacement
+        #ea.replacer = inspyred.ec.replacers.steady_state_replacement
+        #ea.replacer = inspyred.ec.replacers.random_replacement
+        # ea.replacer = inspyred.ec.replacers.plus_replacement
+        # ea.replacer = inspyred.ec.replacers.comma_replacement     #No elitism, bad in this case
+        #ea.replacer = inspyred.ec.replacers.crowding_replacement
+        #ea.replacer = inspyred.ec.replacers.simulated_annealing_replacement
+        #ea.replacer = inspyred.ec.replacers.nsga_replacement
+        #ea.replacer = inspyred.ec.replacers.paes_replacement
+        ea.replacer = inspyred.ec.replacers.generational_replacement
+        if multiObjective:
+            ea.replacer = pareto.nsga_replacement     # vectorized inspyred.ec.replacers.nsga_replacement
+
+        # termination condition
+        #ea.terminator = inspyred.ec.terminators.evaluation_termination
+        #ea.terminator = inspyred.ec.terminators.no_improvement_termination
+        #ea.terminator = inspyred.ec.terminators.diversity_termination
+        #ea.terminator = inspyred.ec.terminators.time_termination
+        ea.terminator = inspyred.ec.terminators.generation_termination
+
+        # profiling: stage times of the operators, one record per generation
+        if profiling.ENABLED:
+            ea.selector = profiling.timed(ea.selector,'select')
+            ea.variator = [profiling.timed(op,'variate.' + op.__name__) for op in ea.variator]
+            ea.replacer = profiling.timed(ea.replacer,'replace')
+        if profileFile or traceFile:
+            profiler = profiling.ProfileObserver(profileFile)
+            ea.observer = (ea.observer if isinstance(ea.observer,list) else [ea.observer]) + [profiler]
+
+        # fitness cache of the snapshot, whether or not new snapshots are written
+        if resume is not None:
+            resume.restore_cache(problem.cache)
+        elif warmstart is not None:
+            warmstart.restore_cache(problem.cache)
+
+        # checkpoints: must be the first observer when resuming
+        checkpointer = None
+        if checkpointInterval > 0 or resume is not None:
+            checkpointer = checkpoint.Checkpointer(checkpointFile,problem,seed,checkpointInterval,resume)
+            others = ea.observer if isinstance(ea.observer,list) else [ea.observer]
+            ea.observer = [checkpointer] + others
+
+        # migration operator, eg. islands.EliteMigrator when running as an island
+        if migrator is not None:
+            ea.migrator = migrator
+
+        # --------------------------------------------------------------------------- #
+
+        # run the EA
+        final_pop = ea.evolve(evaluator=problem.evaluator,
+                              generator=problem.generator,
+                              seeds=initial_population,
+                              bounder=problem.bounder,
+                              maximize=problem.maximize,
+                              # the saved population, so that no new individual draws random numbers
+                              pop_size=len(resume.candidates) if resume is not None else populationSize,
+                              max_generations=numberOfGenerations,
+                              max_evaluations=numberOfEvaluations,
+                              tournament_size=tournamentSize,
+                              mutation_rate=mutationRate,
+                              gaussian_mean=gaussianMean,
+                              gaussian_stdev=gaussianStdev,
+                              crossover_rate=crossoverRate,
+                              num_crossover_points=numCrossoverPoints,
+                              num_selected=selectionSize,
+                              num_elites=numElites,
+                              flip_bias = 0.2,
+                              numpy_random = numpy_rng)
+
+        if checkpointer is not None:
+            checkpointer.save(ea)
+    finally:
+        if evaluationWorkers > 1:
+            problem.close()
+        if observer is not None:
+            observer.close()
+        if profiler is not None:
+            if traceFile:
+                profiler.dump_trace(traceFile)
+            profiler.close()
 
     if display:
         final_pop.sort(reverse=True)
+        if multiObjective:
+            # the Pareto front, best by the weighted sum first
+            front = pareto.pareto_front(final_pop)
+            front.sort(key=lambda individual: pareto.weighted_fitness(individual.fitness))
+            print("Pareto front: " + ", ".join(str(individual.fitness) for individual in front))
+            final_pop[:] = front[:1] + [individual for individual in final_pop if individual is not front[0]]
         print(final_pop[0])
         candidate = final_pop[0].candidate
         grid = life.genotype_to_grid(candidate)
         life.display(grid)
         life.savegrid(grid,"./bestindividual.txt")
         life.create_animation(candidate,MAX_ITERATIONS,TARGET)
+        if trajectoryFile:
+            trajectory.record(candidate,MAX_ITERATIONS,TARGET,trajectoryFile)
+
+    return final_pop
 
 
 if __name__ == "__main__":
-    # Initialize LIFE grid
-    life.set_grid_size(N)
+    # Initialize LIFE grid and genotype geometry
+    life.set_geometry(N,genotypeSize,placement)
+    # Resume or warm-start from a checkpoint: main.py --resume|--warmstart file [seed]
+    resume = warmstart = None
+    arguments = sys.argv[1:]
+    if len(arguments) > 1 and arguments[0] in ("--resume","--warmstart"):
+        snapshot = checkpoint.Snapshot(arguments[1])
+        if arguments[0] == "--resume":
+            resume = snapshot
+            arguments = [str(snapshot.seed)]
+        else:
+            warmstart = snapshot
+            arguments = arguments[2:]
     # Initialize the random generator
-    if len(sys.argv) > 1 :
-        seed = int(sys.argv[1])
+    if len(arguments) > 0 :
+        seed = int(arguments[0])
     else:
         seed = int(time.time())
 
     rng = Random(int(seed))
 
-    main(rng,seed,display)
+    main(rng,seed,display,resume=resume,warmstart=warmstart)
 
     if display:
         ioff()
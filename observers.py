@@ -0,0 +1,199 @@
+## @package observers
+#  Non-blocking observers for the inspyred evolution loop.
+#
+#  AsyncObserver replaces stats_observer, file_observer and plot_observer of
+#  inspyred.ec.observers. When called by ea.evolve it only copies the fitness
+#  values (and the candidates, if they are saved) into a queue and returns: a
+#  background thread computes the statistics, prints them and writes them to
+#  the output files in batches. The plot is redrawn in the calling thread, as
+#  matplotlib requires, but at most once every PLOT_SECONDS.
+#
+#  Usage: observer = AsyncObserver()
+#         ea.observer = observer
+#         ea.evolve(...)
+#         observer.close()
+
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+""" Generations written together, and longest wait before a write (s) """
+FLUSH_GENERATIONS = 25
+FLUSH_SECONDS = 5.0
+""" Shortest time between two plot refreshes (s) """
+PLOT_SECONDS = 2.0
+
+STATISTICS = ["generation","evaluations","population","worst","best","median","average","std"]
+
+## Fitness statistics of a generation, as inspyred.ec.analysis.fitness_statistics
+#
+#  With Pareto fitness, @fitness is (pop,objectives) and every statistic is
+#  an array with one value per objective.
+def fitness_statistics(fitness,maximize):
+    ordered = np.sort(fitness,axis=0)
+    if maximize:
+        ordered = ordered[::-1]
+    std = np.std(fitness,axis=0,ddof=1) if len(fitness) > 1 else np.zeros_like(ordered[0])
+    return ordered[-1],ordered[0],np.median(fitness,axis=0),np.mean(fitness,axis=0),std
+
+## Candidates of a generation as text
+#
+#  Binary candidates are written as a string of 0 and 1, the others (eg.
+#  cartesian genotypes) as their values separated by spaces.
+#  @candidates is (pop,genes), one flattened candidate per row
+def candidate_strings(candidates):
+    if candidates.dtype == bool or np.isin(candidates,(0,1)).all():
+        digits = candidates.astype(np.uint8) + ord("0")
+        return [g.decode() for g in digits.view("S{0}".format(candidates.shape[1]))[:,0]]
+    return [" ".join(map(str,candidate)) for candidate in candidates.tolist()]
+
+## Observer that moves the statistics, files and plot off the evolution loop
+#
+#  @statistics_file and @individuals_file are file names, None for the
+#  default names, stamped with the time and process id, and False to skip the
+#  file. The statistics file has one column per statistic (and per value
+#  returned by @extra), the individuals file one row per individual with its
+#  candidate as written by candidate_strings.
+#  @extra is called in the evolution thread and returns a dict of further
+#  columns, eg. the fitness cache counters. With Pareto fitness there is one
+#  column per statistic and objective, and the plot shows the first objective.
+class AsyncObserver():
+    __name__ = "AsyncObserver"    # inspyred logs the observers by name
+
+    def __init__(self,statistics_file=None,individuals_file=None,display=True,plot=True,extra=None):
+        # processes started in the same second (islands, experiments) get their own files
+        stamp = "{0}-{1}".format(time.strftime("%m%d%Y-%H%M%S"),os.getpid())
+        if statistics_file is None:
+            statistics_file = "ecgol-statistics-{0}.csv".format(stamp)
+        if individuals_file is None:
+            individuals_file = "ecgol-individuals-{0}.csv".format(stamp)
+        self.statistics_file = open(statistics_file,"w") if statistics_file else None
+        self.individuals_file = open(individuals_file,"w") if individuals_file else None
+        self.display = display
+        self.plot = plot
+        self.extra = extra
+        self.columns = None
+
+        self.history = {name: [] for name in ("evaluations","average","median","best","worst")}
+        self.lock = threading.Lock()
+        self.last_plot = None
+        self.lines = None
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run,name="AsyncObserver",daemon=True)
+        self.thread.start()
+
+    ## Observer called by ea.evolve after every generation
+    def __call__(self,population,num_generations,num_evaluations,args):
+        fitness = np.array([p.fitness for p in population],dtype=float)
+        maximize = population[0].maximize if population else True
+        candidates = None
+        if self.individuals_file is not None:
+            candidates = np.array([np.ravel(p.candidate) for p in population])
+        extra = self.extra() if self.extra is not None else {}
+        self.queue.put((num_generations,num_evaluations,fitness,maximize,candidates,extra))
+
+        if self.plot:
+            now = time.monotonic()
+            if self.last_plot is None or now - self.last_plot >= PLOT_SECONDS:
+                self.last_plot = now
+                self.refresh_plot()
+
+    ## Background thread: statistics, console output and batched file writes
+    def run(self):
+        statistics = []
+        individuals = []
+        last_flush = time.monotonic()
+        while True:
+            item = self.queue.get()
+            if item is not None:
+                num_generations,num_evaluations,fitness,maximize,candidates,extra = item
+                statistics_values = fitness_statistics(fitness,maximize)
+                if fitness.ndim > 1:
+                    # one column per objective, the plot follows the first one
+                    row = [num_generations,num_evaluations,len(fitness)] + [value for values in statistics_values for value in values]
+                    worst,best,median,average,std = (values[0] for values in statistics_values)
+                else:
+                    row = [num_generations,num_evaluations,len(fitness)] + list(statistics_values)
+                    worst,best,median,average,std = statistics_values
+                if self.columns is None:
+                    names = STATISTICS[3:]
+                    if fitness.ndim > 1:
+                        names = ["{0}_{1}".format(name,k) for name in names for k in range(fitness.shape[1])]
+                    self.columns = STATISTICS[:3] + names + list(extra)
+                    if self.statistics_file is not None:
+                        self.statistics_file.write(",".join(self.columns) + "\n")
+                statistics.append(row + list(extra.values()))
+                if candidates is not None:
+                    individuals.extend("{0},{1},{2},{3}\n".format(num_generations,i," ".join(str(v) for v in np.atleast_1d(f)),g)
+                                       for i,(f,g) in enumerate(zip(fitness,candidate_strings(candidates))))
+                with self.lock:
+                    for name,value in zip(("evaluations","average","median","best","worst"),
+                                          (num_evaluations,average,median,best,worst)):
+                        self.history[name].append(value)
+                if self.display:
+                    self.print_statistics(row,extra,fitness.shape[1] if fitness.ndim > 1 else 1)
+
+            now = time.monotonic()
+            if item is None or len(statistics) >= FLUSH_GENERATIONS or now - last_flush >= FLUSH_SECONDS:
+                self.write(statistics,individuals)
+                statistics,individuals = [],[]
+                last_flush = now
+            self.queue.task_done()
+            if item is None:
+                return
+
+    def write(self,statistics,individuals):
+        if self.statistics_file is not None and statistics:
+            self.statistics_file.write("".join(",".join(str(value) for value in row) + "\n" for row in statistics))
+            self.statistics_file.flush()
+        if self.individuals_file is not None and individuals:
+            self.individuals_file.write("".join(individuals))
+            self.individuals_file.flush()
+
+    def print_statistics(self,row,extra,objectives=1):
+        print('Generation Evaluation      Worst       Best     Median    Average    Std Dev')
+        print('---------- ---------- ---------- ---------- ---------- ---------- ----------')
+        for k in range(objectives):
+            values = ['{0:>10}'.format(value)[:10] for value in row[3+k::objectives][:5]]
+            print('{0:>10} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10} {6:>10}'.format(row[0],row[1],*values))
+        print(" ".join("{0}: {1}".format(name,value) for name,value in extra.items()) + "\n")
+
+    ## Redraw the fitness plot with the statistics computed so far
+    def refresh_plot(self):
+        import matplotlib.pyplot as plt
+        with self.lock:
+            data = [list(self.history[name]) for name in ("evaluations","average","median","best","worst")]
+        if not data[0]:
+            return
+        if self.lines is None:
+            plt.ion()
+            colors = ['black','blue','green','red']
+            labels = ['average','median','best','worst']
+            self.lines = [plt.plot(data[0],data[i+1],color=colors[i],label=labels[i])[0] for i in range(4)]
+            plt.legend(loc='lower right')
+            plt.xlabel('Evaluations')
+            plt.ylabel('Fitness')
+        else:
+            for line,values in zip(self.lines,data[1:]):
+                line.set_data(data[0],values)
+        ymin = min(min(values) for values in data[1:])
+        ymax = max(max(values) for values in data[1:])
+        yrange = ymax - ymin
+        plt.xlim((0,max(data[0][-1],1)))
+        plt.ylim((ymin - 0.1*yrange - 1e-9,ymax + 0.1*yrange + 1e-9))
+        plt.draw()
+
+    ## Wait for the pending generations, write them and draw the last plot
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        for file in (self.statistics_file,self.individuals_file):
+            if file is not None:
+                file.close()
+        if self.plot:
+            self.refresh_plot()
@@ -0,0 +1,136 @@
+## @package pareto
+#  NSGA-II operators for inspyred, with the Pareto ranking done in NumPy.
+#
+#  inspyred.ec.replacers.nsga_replacement compares the individuals pair by
+#  pair in Python, O(M N^2) comparisons of Pareto objects per generation, and
+#  its archiver compares candidates with ==, which fails on NumPy candidates.
+#  Here the objective values of the whole population are stacked in a (N,M)
+#  array: the domination matrix is computed at once and the fronts are peeled
+#  off it, one vectorized step per front; the crowding distances of all the
+#  fronts are computed together, one sort per objective.
+#
+#  Usage: ea.selector = pareto.crowded_tournament_selection
+#         ea.replacer = pareto.nsga_replacement
+#  with inspyred.ec.emo.Pareto fitness values.
+
+import numpy as np
+
+""" Rows of the domination matrix computed at once, bounds its memory """
+CHUNK = 1024
+
+""" Weights of min_distance, iterations and max_size in the scalar fitness of main.py """
+WEIGHTS = (1,3,10)
+
+## Objective values of @individuals as a (N,M) array, every objective minimized
+#
+#  Follows the inspyred conventions: an objective is maximized if it is in
+#  the Pareto maximize list, the other way round if the individuals minimize.
+def objectives(individuals):
+    values = np.array([list(individual.fitness) for individual in individuals],dtype=float)
+    if len(individuals) == 0:
+        return values.reshape(0,0)
+    fitness = individuals[0].fitness
+    maximize = np.array(fitness.maximize,dtype=bool) == individuals[0].maximize
+    return np.where(maximize,-values,values)
+
+## Domination matrix of @values (N,M): [i,j] is True if i dominates j
+def domination(values):
+    dominates = np.empty((len(values),len(values)),dtype=bool)
+    for start in range(0,len(values),CHUNK):
+        rows = values[start:start+CHUNK,np.newaxis,:]
+        dominates[start:start+CHUNK] = ((rows <= values).all(axis=2) &
+                                        (rows < values).any(axis=2))
+    return dominates
+
+## Non-dominated sorting of @values (N,M), minimized
+#
+#  @return the front of every row, 0 for the non-dominated ones
+def non_dominated_sort(values):
+    dominates = domination(values)
+    dominated_by = dominates.sum(axis=0)
+    ranks = np.full(len(values),-1)
+    front = np.flatnonzero(dominated_by == 0)
+    rank = 0
+    while front.size > 0:
+        ranks[front] = rank
+        dominated_by -= dominates[front].sum(axis=0)
+        dominated_by[front] = -1
+        front = np.flatnonzero(dominated_by == 0)
+        rank += 1
+    return ranks
+
+## Crowding distance of every row of @values inside its front (@ranks)
+#
+#  The extremes of a front along each objective get an infinite distance,
+#  the others the sum over the objectives of the gap between their
+#  neighbours, divided by the extent of the front along that objective.
+def crowding_distance(values,ranks):
+    count,objectives_count = values.shape
+    distance = np.zeros(count)
+    if count == 0:
+        return distance
+    for k in range(objectives_count):
+        order = np.lexsort((values[:,k],ranks))
+        value = values[order,k]
+        rank = ranks[order]
+        first = np.concatenate(([True],rank[1:] != rank[:-1]))
+        last = np.concatenate((rank[1:] != rank[:-1],[True]))
+        starts,ends = np.flatnonzero(first),np.flatnonzero(last)
+        extent = np.repeat(value[ends] - value[starts],ends - starts + 1)
+        gap = np.zeros(count)
+        gap[1:-1] = value[2:] - value[:-2]
+        gap = np.where(extent > 0,gap / np.where(extent > 0,extent,1),0.0)
+        gap[first | last] = np.inf
+        distance[order] += gap
+    return distance
+
+## Front and crowding distance of every one of @individuals
+def rank(individuals):
+    values = objectives(individuals)
+    ranks = non_dominated_sort(values)
+    return ranks,crowding_distance(values,ranks)
+
+## Individuals of the first front of @individuals
+def pareto_front(individuals):
+    ranks = non_dominated_sort(objectives(individuals))
+    return [individual for individual,r in zip(individuals,ranks) if r == 0]
+
+## Fitness of main.py to minimize, Pareto fitness ranked by the weighted sum
+#  of its objectives (main.py's scalar fitness)
+def weighted_fitness(fitness):
+    return fitness if np.isscalar(fitness) else float(np.dot(WEIGHTS,list(fitness)))
+
+## Best of @individuals: the best scalar fitness, or with Pareto fitness the
+#  member of the first front with the smallest weighted_fitness
+def best_individual(individuals):
+    best = max(individuals)
+    if np.isscalar(best.fitness):
+        return best
+    return min(pareto_front(individuals),key=lambda individual: weighted_fitness(individual.fitness))
+
+## Replaces population using the non-dominated sorting of NSGA-II
+#
+#  Same replacement as inspyred.ec.replacers.nsga_replacement: the population
+#  and the offspring are ranked together and the best len(population) are
+#  kept, by front and then by decreasing crowding distance.
+def nsga_replacement(random,population,parents,offspring,args):
+    combined = list(population) + list(offspring)
+    ranks,distance = rank(combined)
+    order = np.lexsort((-distance,ranks))
+    return [combined[i] for i in order[:len(population)]]
+
+## Binary tournament on front, then crowding distance, as in NSGA-II
+#
+#  Optional keyword arguments in args:
+#  - *num_selected* -- the number of individuals to be selected (default 1)
+#  - *tournament_size* -- the tournament size (default 2)
+def crowded_tournament_selection(random,population,args):
+    num_selected = args.setdefault('num_selected',1)
+    tournament_size = min(args.setdefault('tournament_size',2),len(population))
+    ranks,distance = rank(population)
+    selected = []
+    for _ in range(num_selected):
+        tournament = random.sample(range(len(population)),tournament_size)
+        winner = min(tournament,key=lambda i: (ranks[i],-distance[i]))
+        selected.append(population[winner])
+    return selected
@@ -0,0 +1,137 @@
+## @package profiling
+#  Stage timers and simulator counters of the evaluation loop.
+#
+#  stage(name) times a block of code, timed(function) every call of a
+#  function: the total time and number of calls of every stage are summed
+#  until take() returns and resets them. The simulators count the candidates
+#  they stop, and the iterations spent on them, per stop reason.
+#  ProfileObserver turns the counters into one record per generation. With
+#  TRACE set, every timed call is also kept as an event, written by
+#  dump_trace() in the Chrome trace format (chrome://tracing, Perfetto).
+
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+""" Time the stages, and keep every call as a trace event """
+ENABLED = True
+TRACE = False
+
+""" Stop reasons, in the order of the codes of the simulators (the c++ core
+    included, see StopReason in LIFEcore/main.cpp) """
+STOP_REASONS = ["reached","died","static","periodic","timeout"]
+STOP_REACHED,STOP_DIED,STOP_STATIC,STOP_PERIODIC,STOP_TIMEOUT = range(len(STOP_REASONS))
+
+_lock = threading.Lock()
+_seconds = collections.defaultdict(float)
+_calls = collections.defaultdict(int)
+_stops = np.zeros((len(STOP_REASONS),2),dtype=np.int64)    # candidates, iterations
+_events = []
+
+## Time the block of code under @name
+@contextlib.contextmanager
+def stage(name):
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _seconds[name] += elapsed
+            _calls[name] += 1
+            if TRACE:
+                _events.append((name,start,elapsed,os.getpid(),threading.get_ident()))
+
+## @function timed as stage @name (default: its own name)
+def timed(function,name=None):
+    name = name or function.__name__
+    @functools.wraps(function)
+    def timed_function(*args,**kwargs):
+        with stage(name):
+            return function(*args,**kwargs)
+    return timed_function
+
+## Count the stopped candidates, @reasons and @iterations are arrays
+def count_stops(reasons,iterations):
+    if not ENABLED:
+        return
+    reasons = np.asarray(reasons,dtype=int)
+    counts = np.bincount(reasons,minlength=len(STOP_REASONS))
+    spent = np.bincount(reasons,weights=np.asarray(iterations,dtype=float),minlength=len(STOP_REASONS))
+    with _lock:
+        _stops[:,0] += counts
+        _stops[:,1] += spent.astype(np.int64)
+
+## Counters since the last call, which resets them
+#
+#  @return {"seconds": {stage: s},"calls": {stage: n},
+#           "stops": {reason: {"candidates": n,"iterations": n}},"events": [...]}
+def take():
+    global _events
+    with _lock:
+        counters = {"seconds": dict(_seconds),"calls": dict(_calls),
+                    "stops": {reason: {"candidates": int(_stops[i,0]),"iterations": int(_stops[i,1])}
+                              for i,reason in enumerate(STOP_REASONS)},
+                    "events": _events}
+        _seconds.clear()
+        _calls.clear()
+        _stops[:] = 0
+        _events = []
+    return counters
+
+## Add @counters taken in another process
+def merge(counters):
+    with _lock:
+        for name,seconds in counters["seconds"].items():
+            _seconds[name] += seconds
+        for name,calls in counters["calls"].items():
+            _calls[name] += calls
+        for i,reason in enumerate(STOP_REASONS):
+            _stops[i,0] += counters["stops"][reason]["candidates"]
+            _stops[i,1] += counters["stops"][reason]["iterations"]
+        _events.extend(counters["events"])
+
+## Observer taking the counters at every generation
+#
+#  The records are kept in @records and, if @path is given, written to it
+#  one JSON object per line. The trace events are kept for dump_trace().
+class ProfileObserver():
+    __name__ = "ProfileObserver"    # inspyred logs the observers by name
+
+    def __init__(self,path=None):
+        self.records = []
+        self.events = []
+        self.file = open(path,"w") if path else None
+
+    def __call__(self,population,num_generations,num_evaluations,args):
+        counters = take()
+        self.events.extend(counters.pop("events"))
+        record = dict(generation=num_generations,evaluations=num_evaluations,**counters)
+        self.records.append(record)
+        if self.file is not None:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+
+    ## Write the trace events to @path, Chrome trace format
+    def dump_trace(self,path):
+        dump_trace(path,self.events + take()["events"])
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+## Write @events (name,start,duration,pid,tid) to @path, Chrome trace format
+def dump_trace(path,events):
+    trace = [{"name": name,"ph": "X","ts": start * 1e6,"dur": duration * 1e6,"pid": pid,"tid": tid}
+             for name,start,duration,pid,tid in events]
+    with open(path,"w") as f:
+        json.dump({"traceEvents": trace,"displayTimeUnit": "ms"},f)
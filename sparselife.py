@@ -0,0 +1,213 @@
+#! /usr/bin/python3
+
+## @package sparselife
+#  Live-cell-list engine for the LIFE simulator, meant for huge and sparse
+#  grids (ENGINE = "sparse" in the life.py module).
+#
+#  A configuration is the sorted array of the codes of its alive cells,
+#  row * STRIDE + column, which is also the order in which the c++ core scans
+#  the grid. An update only looks at the neighbours of the alive cells: every
+#  alive cell adds its eight neighbour codes and a single np.unique counts
+#  them. Time and memory grow with the number of alive cells, not with the
+#  size of the grid, which is never allocated.
+#
+#  The simulation follows the c++ core (LIFEcore/main.cpp) exactly: the
+#  outermost rows and columns of the effective grid are cleared before every
+#  update, the metrics are computed on every generation and the run stops on
+#  the same rules, plus the repeated configurations of the batched simulator of
+#  life.py, whose cycle is followed up to max_it with the same results.
+#  With UNBOUNDED set nothing is cleared and the cells leave the grid freely,
+#  the grid size only matters to the metrics while they stay in it.
+
+import collections
+
+import numpy as np
+import profiling
+
+""" Cells cross the border of the grid instead of being cleared """
+UNBOUNDED = False
+
+""" Cell codes: (row + OFFSET) * STRIDE + column + OFFSET, cells out of the
+    grid keep their scan order as long as they are within OFFSET of it """
+STRIDE = 1 << 31
+OFFSET = 1 << 30
+_NEIGHBOURS = np.array([di * STRIDE + dj for di in (-1,0,1) for dj in (-1,0,1) if di or dj],
+                       dtype=np.int64)
+
+"""--Cell lists----------------------------------------------------------------"""
+
+## Sorted codes, without duplicates, of the @cells (k,2) of (row,column)
+def encode(cells):
+    cells = np.asarray(cells,dtype=np.int64).reshape(-1,2)
+    return np.unique((cells[:,0] + OFFSET) * STRIDE + cells[:,1] + OFFSET)
+
+## (k,2) array of the (row,column) of the cells of @state
+def decode(state):
+    return np.stack((state // STRIDE - OFFSET,state % STRIDE - OFFSET),axis=1)
+
+## Whether each of @codes is alive in @state
+def contains(state,codes):
+    if len(state) == 0:
+        return np.zeros(len(codes),dtype=bool)
+    index = np.minimum(np.searchsorted(state,codes),len(state) - 1)
+    return state[index] == codes
+
+## Cells of @state with both coordinates within [@low,@high]
+def clip(state,low,high):
+    rows,columns = state // STRIDE - OFFSET,state % STRIDE - OFFSET
+    return state[(rows >= low) & (rows <= high) & (columns >= low) & (columns <= high)]
+
+## Next generation of @state
+def update(state):
+    if len(state) == 0:
+        return state
+    neighbours,counts = np.unique((state[:,np.newaxis] + _NEIGHBOURS).ravel(),return_counts=True)
+    return neighbours[(counts == 3) | ((counts == 2) & contains(state,neighbours))]
+
+"""--Metrics-------------------------------------------------------------------"""
+
+## Minimum and maximum of @values, in scan order, as compute_bounds() of the
+#  c++ core: a value only raises the maximum if it did not lower the minimum
+def _scan(values,min_bound,max_bound):
+    minimum = np.minimum.accumulate(np.concatenate(([max_bound],values)))
+    raising = values[values >= minimum[:-1]]
+    maximum = max(min_bound,int(raising.max())) if raising.size > 0 else min_bound
+    return int(minimum[-1]),maximum
+
+## Boundaries (min_i,max_i,min_j,max_j) of @state
+#
+#  With UNBOUNDED set the grid grows to hold every cell: inside the grid the
+#  bounds are the same, outside they follow the cells.
+def compute_bounds(state,min_bound,max_bound):
+    cells = decode(state)
+    if UNBOUNDED and len(cells) > 0:
+        min_bound = min(min_bound,int(cells.min()))
+        max_bound = max(max_bound,int(cells.max()) + 1)
+    min_i,max_i = _scan(cells[:,0],min_bound,max_bound)
+    min_j,max_j = _scan(cells[:,1],min_bound,max_bound)
+    return min_i,max_i,min_j,max_j
+
+## Integer division by two truncating towards zero, as in c++
+def _half(value):
+    return value // 2 if value >= 0 else -(-value // 2)
+
+## Chebyshev distance between the center of the bounds and the target
+def chebyshev_distance(bounds,target):
+    min_i,max_i,min_j,max_j = bounds
+    return max(abs(_half(max_j + min_j) - target[0]),abs(_half(max_i + min_i) - target[1]))
+
+## Surface of the bounding box
+def automatonsize(bounds):
+    min_i,max_i,min_j,max_j = bounds
+    return (max_i - min_i + 1) * (max_j - min_j + 1)
+
+"""--Simulation----------------------------------------------------------------"""
+
+## Run the simulation of @grid
+#
+#  @grid is the (N,N) boolean matrix of the life.py module, @history the
+#  longest period of the repetitions that stop the run (0 for the static and
+#  period-2 rules of the c++ core only).
+#  @target is a cell (x,y) or a list of K cells, simulated once as in
+#  life.simulate_batch: the run goes on until every target is reached and the
+#  metrics of each target are frozen when it is reached.
+#  @return final distance, final size, iterations, maximum size, average size,
+#          minimum distance, detected period and stop reason, as life.simulate_batch,
+#          one such list per target with a list of targets
+def simulate(grid,max_it,target,history=0):
+    n = len(grid)
+    cells = np.argwhere(np.asarray(grid)[1:n-1,1:n-1]) + 1
+    return simulate_cells(cells,n,max_it,target,history)
+
+## Run the simulation of the alive @cells (k,2) of (row,column), in a grid of
+#  @n x @n cells (life.N, border included)
+#
+#  @return same as simulate
+def simulate_cells(cells,n,max_it,target,history=0):
+    min_bound,max_bound = 1,n-1
+    targets = np.reshape(np.asarray(target,dtype=np.int64),(-1,2))
+    goals = (targets[:,1] + OFFSET) * STRIDE + targets[:,0] + OFFSET
+
+    state = encode(cells)
+    if not UNBOUNDED:
+        state = clip(state,min_bound,max_bound-1)
+
+    bounds = compute_bounds(state,min_bound,max_bound)
+    max_size = sizeaccumulator = automatonsize(bounds)
+    min_distance = [chebyshev_distance(bounds,cell) for cell in targets]
+
+    iterations = 0
+    # every target reached: its iterations, size, maximum size and size sum then
+    reached = {}
+    period = 0
+    reason = profiling.STOP_TIMEOUT
+    previous_state = previous_previous_state = None
+    # the last @history configurations (code,state,size), oldest first
+    seen = {state.tobytes(): 0}
+    recent = collections.deque([(state.tobytes(),state,max_size)])
+    while iterations < max_it:
+        previous_previous_state,previous_state = previous_state,state
+        if not UNBOUNDED:
+            # the cells born from the inner ones stay in the effective grid
+            state = clip(state,min_bound+1,max_bound-2)
+        state = update(state)
+        iterations += 1
+
+        bounds = compute_bounds(state,min_bound,max_bound)
+        partial_size = automatonsize(bounds)
+        sizeaccumulator += partial_size
+        max_size = max(max_size,partial_size)
+        hit = contains(state,goals)
+        for k,cell in enumerate(targets):
+            if k not in reached:
+                min_distance[k] = min(min_distance[k],chebyshev_distance(bounds,cell))
+                if hit[k]:
+                    reached[k] = (iterations,partial_size,max_size,sizeaccumulator)
+
+        """ Stopping """
+        if len(reached) == len(targets):                            # 1. Target(s) reached
+            reason = profiling.STOP_REACHED
+            break
+        if len(state) == 0:                                         # 2. Death
+            reason = profiling.STOP_DIED
+            break
+        if np.array_equal(state,previous_state):                    # 3. Static behaviour
+            period = 1
+            reason = profiling.STOP_STATIC
+            break
+        if previous_previous_state is not None and np.array_equal(state,previous_previous_state):
+            period = 2                                              # 4. Repetitive behaviour
+            reason = profiling.STOP_PERIODIC
+            break
+        if history > 0:
+            key = state.tobytes()
+            last = seen.get(key)
+            if last is not None:                                    # 5. Any repeated configuration
+                period = iterations - last
+                reason = profiling.STOP_PERIODIC
+                # the cycle runs up to max_it, as life._repeat_cycle
+                phases = list(recent)[-period:]
+                sizes = [size for code,phase,size in phases]
+                full,rest = divmod(max_it - iterations,period)
+                sizeaccumulator += full * sum(sizes) + sum((sizes[1:] + sizes[:1])[:rest])
+                state = phases[(max_it - last) % period][1]
+                iterations = max_it
+                break
+            seen[key] = iterations
+            recent.append((key,state,partial_size))
+            while len(recent) > history:
+                del seen[recent.popleft()[0]]
+
+    bounds = compute_bounds(state,min_bound,max_bound)
+    results = []
+    for k,cell in enumerate(targets):
+        if k in reached:
+            hit_iterations,final_size,hit_max_size,accumulator = reached[k]
+            row = [0,final_size,hit_iterations,hit_max_size,accumulator,min_distance[k],0,profiling.STOP_REACHED]
+        else:
+            row = [chebyshev_distance(bounds,cell),automatonsize(bounds),iterations,max_size,sizeaccumulator,
+                   min_distance[k],period,reason]
+        # integer division truncating towards zero, as in c++
+        row[4] = abs(row[4]) // (row[2]+1) * (1 if row[4] >= 0 else -1)
+        results.append(row)
+    return results if np.ndim(target) == 2 else results[0]
@@ -0,0 +1,85 @@
+#! /usr/bin/python3
+
+## @package test_cache
+#  Keys and lookups of life.FitnessCache.
+#
+#  Usage: python -m pytest test_cache.py
+
+import numpy as np
+import pytest
+
+import life
+
+@pytest.fixture
+def geometry(monkeypatch):
+    for name in ("N","min_bound","max_bound","GENOTYPE","GENOTYPExSIZE","GENOTYPEySIZE","PLACEMENT"):
+        monkeypatch.setattr(life,name,getattr(life,name))
+    monkeypatch.setattr(life,"ENGINE","numpy")
+    monkeypatch.setattr(life,"GENOTYPE","matrix")
+    life.set_geometry(40,(6,6),(17,17))
+
+## Random matrix genotypes, with a few alive cells at least
+def genotypes(count,seed):
+    rng = np.random.default_rng(seed)
+    return [rng.random(36) < 0.4 for _ in range(count)]
+
+def test_targets_of_any_type_share_keys(geometry):
+    cache = life.FitnessCache()
+    genotype = genotypes(1,1)[0]
+    targets = [[(36,36),(30,20)],((36,36),(30,20)),np.array([(36,36),(30,20)])]
+    assert len({cache.key(genotype,500,target) for target in targets}) == 1
+    assert len({cache.key(genotype,500,target) for target in [(36,36),[36,36],np.array([36,36])]}) == 1
+
+def test_single_target_and_list_never_collide(geometry):
+    cache = life.FitnessCache()
+    population = genotypes(5,2) + [np.eye(6,dtype=bool).ravel() & (np.arange(36) < 8)]
+    single = cache.compute(population,500,(36,36))
+    listed = cache.compute(population,500,np.array([(36,36)]))
+    assert cache.hits == 0 and len(cache.entries) == 2*len(population)
+    for row,rows in zip(single,listed):
+        assert np.ndim(row[2]) == 0 and np.shape(rows[2]) == (1,)
+        assert row[2] == rows[2][0]
+
+def test_multi_target_lookups(geometry):
+    cache = life.FitnessCache()
+    population = genotypes(6,3)
+    targets = np.array([(36,36),(20,20)])
+    first = cache.compute(population,500,targets)
+    again = cache.compute(population,500,[tuple(cell) for cell in targets])
+    assert cache.hits == len(population)
+    assert all(a is b for a,b in zip(first,again))
+
+def test_cached_results_match_the_engine(geometry):
+    cache = life.FitnessCache(maxsize=4)
+    population = genotypes(6,4)
+    population = population + population[:2]
+    results = cache.compute(population,500,(36,36))
+    assert results == life.compute_fitness_batch(population,500,(36,36))
+    # the duplicates of the batch are computed once
+    assert (cache.hits,cache.misses) == (2,6)
+    # least recently used first out
+    assert len(cache.entries) == 4
+    assert cache.key(population[5],500,(36,36)) in cache.entries
+    assert cache.key(population[0],500,(36,36)) not in cache.entries
+
+def test_dying_genotypes_keyed_on_their_bounds(geometry):
+    cache = life.FitnessCache()
+    diagonal,antidiagonal = np.zeros((2,6,6),dtype=bool)
+    diagonal[[1,2],[1,2]] = True
+    antidiagonal[[1,2],[2,1]] = True
+    population = [diagonal.ravel(),antidiagonal.ravel(),np.roll(diagonal,1,axis=1).ravel()]
+    keys = [cache.key(genotype,500,(36,36)) for genotype in population]
+    assert all(key[0] == "dies" for key in keys)
+    assert cache.key(population[0],400,(36,36)) != keys[0]
+    # the bounds of the c++ core differ for the antidiagonal, so do the average sizes
+    assert len(set(keys)) == 3
+    assert cache.compute(population,500,(36,36)) == life.compute_fitness_batch(population,500,(36,36))
+
+def test_cartesian_cells_in_any_order(geometry,monkeypatch):
+    monkeypatch.setattr(life,"GENOTYPE","cartesian")
+    cache = life.FitnessCache()
+    cells = np.array([[18,18],[18,19],[18,20],[17,20],[16,19]])
+    shuffled = np.concatenate((cells[::-1],cells[:1],[[-1,-1]]))
+    assert cache.key(cells.ravel(),500,(36,36)) == cache.key(shuffled.ravel(),500,(36,36))
+    assert cache.compute([cells.ravel(),shuffled.ravel()],500,(36,36)) == \
+           life.compute_fitness_batch([cells.ravel()],500,(36,36))*2
@@ -0,0 +1,79 @@
+#! /usr/bin/python3
+
+## @package test_checkpoint
+#  Snapshots of checkpoint.py: round trip and exact resume of main.main.
+#
+#  Usage: python -m pytest test_checkpoint.py
+
+from random import Random
+import types
+
+import numpy as np
+import pytest
+
+import checkpoint
+import life
+import main
+
+@pytest.fixture
+def small_run(monkeypatch,tmp_path):
+    settings = dict(populationSize=20,selectionSize=20,numElites=4,evaluationWorkers=1,
+                    MAX_ITERATIONS=200,checkpointInterval=0,checkpointFile=str(tmp_path / "checkpoint.npz"),
+                    profileFile=None,traceFile=None,trajectoryFile=None)
+    for name,value in settings.items():
+        monkeypatch.setattr(main,name,value)
+    for name in ("N","min_bound","max_bound","GENOTYPExSIZE","GENOTYPEySIZE","PLACEMENT"):
+        monkeypatch.setattr(life,name,getattr(life,name))
+    monkeypatch.setattr(life,"ENGINE","numpy")
+    life.set_geometry(main.N,main.genotypeSize,main.placement)
+    return tmp_path / "checkpoint.npz"
+
+## Candidates and fitness of @population, in order
+def contents(population):
+    return [(np.reshape(individual.candidate,-1).tolist(),individual.fitness) for individual in population]
+
+def test_round_trip(small_run,monkeypatch):
+    monkeypatch.setattr(main,"numberOfGenerations",2)
+    monkeypatch.setattr(main,"checkpointInterval",2)
+    population = main.main(Random(5),5)
+    snapshot = checkpoint.Snapshot(str(small_run))
+
+    assert contents(population) == [(candidate.tolist(),fitness)
+                                    for candidate,fitness in zip(snapshot.candidates,snapshot.fitness)]
+    assert snapshot.seed == 5 and snapshot.num_generations == 2
+    cache = life.FitnessCache()
+    snapshot.restore_cache(cache)
+    assert len(cache.entries) == len(snapshot.cache_keys) > 0
+    for individual in population:
+        key = cache.key(individual.candidate,main.MAX_ITERATIONS,main.TARGET)
+        assert key in cache.entries
+
+def test_resume_matches_uninterrupted_run(small_run,monkeypatch):
+    monkeypatch.setattr(main,"numberOfGenerations",4)
+    uninterrupted = main.main(Random(9),9)
+
+    monkeypatch.setattr(main,"numberOfGenerations",2)
+    monkeypatch.setattr(main,"checkpointInterval",2)
+    main.main(Random(9),9)
+    monkeypatch.setattr(main,"numberOfGenerations",4)
+    resumed = main.main(Random(0),0,resume=checkpoint.Snapshot(str(small_run)))
+
+    assert contents(resumed) == contents(uninterrupted)
+
+def test_multi_target_cache(small_run):
+    cache = life.FitnessCache()
+    population = [np.arange(100) % k == 0 for k in (2,3,5,60)]
+    single = cache.compute(population,200,(36,36))
+    listed = cache.compute(population,200,[(36,36),(20,20)])
+    ec = types.SimpleNamespace(population=[types.SimpleNamespace(candidate=population[0],fitness=1.0)],
+                               num_generations=1,num_evaluations=4,maximize=False,_random=Random(3),
+                               _kwargs={"numpy_random": np.random.default_rng(3)})
+    checkpoint.save(str(small_run),ec,types.SimpleNamespace(cache=cache,genCount=1),3)
+
+    restored = life.FitnessCache()
+    checkpoint.Snapshot(str(small_run)).restore_cache(restored)
+    assert list(restored.entries) == list(cache.entries)
+    assert restored.compute(population,200,(36,36)) == single
+    for fitness,expected in zip(restored.compute(population,200,[(36,36),(20,20)]),listed):
+        for field,expected_field in zip(fitness,expected):
+            assert (np.asarray(field) == np.asarray(expected_field)).all()
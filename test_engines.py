@@ -0,0 +1,151 @@
+#! /usr/bin/python3
+
+## @package test_engines
+#  The in-process engines, with the cycle detection on, against the c++ core.
+#
+#  Usage: python -m pytest test_engines.py (needs the lifecore executable)
+
+import os
+
+import numpy as np
+import pytest
+
+import hashlife
+import life
+import profiling
+import sparselife
+
+LIFECORE = os.path.join(os.path.dirname(os.path.abspath(__file__)),"lifecore")
+
+""" Patterns as (row,column) cells """
+GLIDER = [(0,1),(1,2),(2,0),(2,1),(2,2)]
+LWSS = [(0,1),(0,4),(1,0),(2,0),(2,4),(3,0),(3,1),(3,2),(3,3)]
+BLINKER = [(0,0),(0,1),(0,2)]
+PENTADECATHLON = [(0,1),(1,1),(2,0),(2,2),(3,1),(4,1),(5,1),(6,1),(7,0),(7,2),(8,1),(9,1)]
+PULSAR = [(i,j) for i in (0,5,7,12) for j in (2,3,4,8,9,10)] + \
+         [(i,j) for j in (0,5,7,12) for i in (2,3,4,8,9,10)]
+
+## Grid of @n cells (border included) with the @patterns, (cells,top,left) each
+def draw(n,*patterns):
+    grid = np.zeros((n,n),dtype=bool)
+    for cells,top,left in patterns:
+        for i,j in cells:
+            grid[top+i,left+j] = True
+    return grid
+
+## Random soups, oscillators of periods 2 to 15 and spaceships
+def corpus(n,count,seed):
+    rng = np.random.default_rng(seed)
+    grids = []
+    for density in (0.1,0.2,0.35,0.5):
+        for size in (6,10,n-2):
+            for _ in range(count):
+                grid = np.zeros((n,n),dtype=bool)
+                top,left = rng.integers(1,n-size,2) if size < n-2 else (1,1)
+                grid[top:top+size,left:left+size] = rng.random((size,size)) < density
+                grids.append(grid)
+    grids += [draw(n,(PULSAR,5,5)),draw(n,(PENTADECATHLON,8,12)),draw(n,(PENTADECATHLON,3,3),(BLINKER,20,20)),
+              draw(n,(PULSAR,2,2),(PENTADECATHLON,17,20)),draw(n,(GLIDER,2,2)),draw(n,(GLIDER,2,2),(BLINKER,25,5)),
+              draw(n,(LWSS,10,2)),draw(n,(LWSS,2,2),(PULSAR,15,15)),draw(n,(GLIDER,20,20),(PENTADECATHLON,2,2))]
+    return np.array(grids)
+
+@pytest.fixture
+def grid_size(monkeypatch):
+    if not os.access(LIFECORE,os.X_OK):
+        pytest.skip("lifecore is not built")
+    n = 30
+    monkeypatch.setattr(life,"N",n+2)
+    monkeypatch.setattr(life,"min_bound",1)
+    monkeypatch.setattr(life,"max_bound",n+1)
+    monkeypatch.setattr(life,"CYCLE_HISTORY",64)
+    return n+2
+
+@pytest.mark.parametrize("target",[(28,28),(12,12),(5,20)])
+def test_engines_match_lifecore(grid_size,target):
+    grids = corpus(grid_size,25,sum(target))
+    max_it = 1000
+    with life.LifecoreClient(1,LIFECORE) as client:
+        expected = client.evaluate(grids,max_it,target)[:,:6]
+
+    for engine in life.BATCH_KERNELS:
+        results = life.simulate_batch(grids,max_it,target,engine)
+        mismatches = np.flatnonzero((results[:,:6] != expected).any(axis=1))
+        assert mismatches.size == 0,(engine,mismatches[:5],results[mismatches[:5],:6],expected[mismatches[:5]])
+        # longer cycles than the c++ core rules were followed to max_it
+        assert (results[:,6] > 2).any()
+
+    results = np.array([sparselife.simulate(grid,max_it,target,life.CYCLE_HISTORY) for grid in grids])
+    mismatches = np.flatnonzero((results[:,:6] != expected).any(axis=1))
+    assert mismatches.size == 0,("sparse",mismatches[:5],results[mismatches[:5],:6],expected[mismatches[:5]])
+
+def test_targets_match_single_runs(grid_size):
+    grids = corpus(grid_size,10,7)
+    targets = [(28,28),(12,12),(5,20)]
+    results = life.simulate_batch(grids,1000,targets)
+    with life.LifecoreClient(1,LIFECORE) as client:
+        for k,target in enumerate(targets):
+            assert (results[:,k,:6] == client.evaluate(grids,1000,target)[:,:6]).all()
+
+@pytest.mark.parametrize("engine",["worker","shm","library","lifecore","sparse","hashlife"])
+def test_engines_simulate_targets_at_once(grid_size,monkeypatch,engine):
+    if engine == "library" and not os.path.exists(life.LIBLIFECORE):
+        pytest.skip("liblifecore.so is not built")
+    monkeypatch.setattr(life,"CYCLE_HISTORY",0)
+    monkeypatch.setattr(life,"ENGINE",engine)
+    grids = corpus(grid_size,3,13)
+    targets = np.array([(28,28),(12,12),(5,20),(16,16)])
+    expected = life.simulate_batch(grids,400,targets)
+    try:
+        # more targets than the shared memory blocks were sized for restart the workers
+        single,_ = life.simulate_grids(grids,400,targets[0])
+        results,reasons = life.simulate_grids(grids,400,targets)
+    finally:
+        life.close_lifecore_clients()
+    results = np.asarray(results)
+    assert results.shape[:2] == (len(grids),len(targets))
+    assert (results[...,:6] == expected[...,:6]).all()
+    assert (reasons == expected[...,7]).all()
+    assert (np.asarray(single)[:,:6] == expected[:,0,:6]).all()
+
+def test_hash_collisions_compare_states(grid_size,monkeypatch):
+    grids = corpus(grid_size,10,3)
+    with life.LifecoreClient(1,LIFECORE) as client:
+        expected = client.evaluate(grids,1000,(28,28))[:,:6]
+    # every past state collides: only the full comparison tells them apart
+    monkeypatch.setattr(life,"_hash_states",lambda states: np.zeros(len(states),dtype=np.uint64))
+    for engine in life.BATCH_KERNELS:
+        assert (life.simulate_batch(grids,1000,(28,28),engine)[:,:6] == expected).all(),engine
+
+def test_hashlife_matches_lifecore(grid_size):
+    grids = corpus(grid_size,10,11)
+    with life.LifecoreClient(1,LIFECORE) as client:
+        expected = client.evaluate(grids,1000,(28,28))
+    results = np.array([hashlife.simulate(grid,1000,(28,28),life.CYCLE_HISTORY) for grid in grids])
+    assert (results[:,:6] == expected[:,:6]).all()
+
+def test_hashlife_macro_steps_keep_the_target_hit(grid_size,monkeypatch):
+    monkeypatch.setattr(hashlife,"MAX_STEP",4)
+    grids = corpus(grid_size,10,11)
+    with life.LifecoreClient(1,LIFECORE) as client:
+        expected = client.evaluate(grids,1000,(28,28))
+    results = np.array([hashlife.simulate(grid,1000,(28,28)) for grid in grids])
+    reached = expected[:,0] == 0
+    assert reached.any()
+    assert ((results[:,0] == 0) == reached).all()
+    assert (results[reached,2] == expected[reached,2]).all()
+
+@pytest.mark.parametrize("engine",["worker","shm","library","lifecore"])
+def test_lifecore_stop_reasons(grid_size,monkeypatch,engine):
+    if engine == "library" and not os.path.exists(life.LIBLIFECORE):
+        pytest.skip("liblifecore.so is not built")
+    monkeypatch.setattr(life,"CYCLE_HISTORY",0)
+    monkeypatch.setattr(life,"ENGINE",engine)
+    grids = corpus(grid_size,10,5)
+    expected = life.simulate_batch(grids,300,(28,28))
+    try:
+        results,reasons = life.simulate_grids(grids,300,(28,28))
+    finally:
+        life.close_lifecore_clients()
+    assert (np.asarray(results)[:,:6] == expected[:,:6]).all()
+    assert (reasons == expected[:,7]).all()
+    assert set(reasons) >= {profiling.STOP_DIED,profiling.STOP_STATIC,profiling.STOP_PERIODIC,profiling.STOP_TIMEOUT}
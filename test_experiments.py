@@ -0,0 +1,35 @@
+#! /usr/bin/python3
+
+## @package test_experiments
+#  Sweeps of experiments.py, run on a process pool.
+#
+#  Usage: python -m pytest test_experiments.py
+
+import csv
+import json
+import os
+
+import experiments
+
+def test_combinations():
+    runs = list(experiments.combinations([1,2],{"N": [40,60],"ENGINE": ["numpy"]}))
+    assert runs == [(1,{"ENGINE": "numpy","N": 40}),(1,{"ENGINE": "numpy","N": 60}),
+                    (2,{"ENGINE": "numpy","N": 40}),(2,{"ENGINE": "numpy","N": 60})]
+
+def test_sweep(tmp_path,monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    folder = tmp_path / "sweep"
+    experiments.main_runner(["--seeds","3","3","4","--workers","2","--output",str(folder),
+                             "--set","ENGINE","'numpy'","--set","populationSize","10",
+                             "--set","numberOfGenerations","2","--set","MAX_ITERATIONS","60",
+                             "--set","trajectoryFile","None"])
+    with open(folder / "results.csv",newline="") as f:
+        rows = sorted(csv.DictReader(f),key=lambda row: row["run"])
+    assert [row["run"] for row in rows] == ["run-0000","run-0001","run-0002"]
+    assert all(row["error"] == "" for row in rows)
+    # every run starts from the defaults: the same seed gives the same best individual
+    assert rows[0]["best_fitness"] == rows[1]["best_fitness"] and rows[0]["genotype"] == rows[1]["genotype"]
+    for row in rows:
+        directory = folder / row["run"]
+        assert json.loads((directory / "parameters.json").read_text())["seed"] == int(row["seed"])
+        assert os.path.exists(directory / "bestindividual.txt")
@@ -0,0 +1,61 @@
+#! /usr/bin/python3
+
+## @package test_gifwriter
+#  GIF files of gifwriter.GifWriter, decoded by Pillow.
+#
+#  Usage: python -m pytest test_gifwriter.py
+
+import io
+
+import numpy as np
+import pytest
+
+import gifwriter
+
+Image = pytest.importorskip("PIL.Image")
+
+PALETTE = [(0,0,0),(255,255,255),(200,30,30),(30,200,30),(30,30,200)]
+
+## Frames of the GIF @data as (height,width,3) arrays and their durations, in ms
+def decode(data):
+    image = Image.open(io.BytesIO(data))
+    frames,durations = [],[]
+    for k in range(image.n_frames):
+        image.seek(k)
+        frames.append(np.array(image.convert("RGB")))
+        durations.append(image.info["duration"])
+    return frames,durations
+
+def test_lzw_codes_of_a_short_stream():
+    # clear 4, then 0, 6 (0 0) and 1 on 3 bits, and end 5 on 4 bits: the decoder
+    # has added entry 7 (0 0 1) when it reads it
+    codes = 4 | 0 << 3 | 6 << 6 | 1 << 9 | 5 << 12
+    assert gifwriter.lzw_encode(bytes([0,0,0,1]),2) == codes.to_bytes(2,"little")
+
+def test_frames_round_trip():
+    rng = np.random.default_rng(1)
+    # random pixels of 5 colors fill the code table and reset it
+    frames = [rng.integers(0,len(PALETTE),(120,90)).astype(np.uint8)]
+    frames.append(frames[0].copy())
+    frames[1][40:50,10:30] = 2
+    frames.append(frames[1].copy())
+    frames.append(np.zeros((120,90),dtype=np.uint8))
+    writer = gifwriter.GifWriter(90,120,PALETTE,delay=7)
+    for frame in frames:
+        writer.add_frame(frame)
+    # the unchanged third frame extends the second one
+    assert len(writer) == 3
+
+    decoded,durations = decode(writer.getvalue(loop=True))
+    palette = np.array(PALETTE,dtype=np.uint8)
+    assert len(decoded) == 3
+    for image,frame in zip(decoded,[frames[0],frames[1],frames[3]]):
+        assert (image == palette[frame]).all()
+    assert durations == [70,140,70]
+
+def test_bad_frames_and_palettes():
+    with pytest.raises(ValueError):
+        gifwriter.GifWriter(4,4,[])
+    writer = gifwriter.GifWriter(4,4,PALETTE[:2])
+    with pytest.raises(ValueError):
+        writer.add_frame(np.zeros((4,5),dtype=np.uint8))
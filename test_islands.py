@@ -0,0 +1,57 @@
+#! /usr/bin/python3
+
+## @package test_islands
+#  Migration of islands.EliteMigrator.
+#
+#  Usage: python -m pytest test_islands.py
+
+import queue
+import types
+from random import Random
+
+import numpy as np
+from inspyred.ec import Individual
+
+import islands
+
+## Individuals with the scalar @fitness values, maximized
+def population(fitness):
+    individuals = []
+    for value in fitness:
+        individual = Individual(np.array([value,value]))
+        individual.fitness = value
+        individuals.append(individual)
+    return individuals
+
+## inspyred's args at generation @generation, evaluator @evaluator
+def arguments(generation,evaluator=None):
+    return {"_ec": types.SimpleNamespace(num_generations=generation,num_evaluations=0,evaluator=evaluator)}
+
+def test_elites_sent_every_interval():
+    inbox,outbox = queue.Queue(),queue.Queue()
+    migrator = islands.EliteMigrator(inbox,outbox,interval=3,migrants=2)
+    for generation in range(6):
+        migrator(Random(0),population([1.0,5.0,3.0,4.0]),arguments(generation))
+    sent = [outbox.get_nowait() for _ in range(outbox.qsize())]
+    # sent after generations 2 and 5, the counter being increased after the migration
+    assert len(sent) == 2 and migrator.sent == 4
+    assert [fitness for candidate,fitness in sent[0]] == [5.0,4.0]
+    assert (sent[0][0][0] == [5.0,5.0]).all()
+
+def test_immigrants_replace_the_worst():
+    inbox,outbox = queue.Queue(),queue.Queue()
+    migrator = islands.EliteMigrator(inbox,outbox,interval=10)
+    inbox.put([(np.array([9,9]),9.0)])
+    inbox.put([(np.array([7,7]),7.0),(np.array([0,0]),0.5)])
+    result = migrator(Random(0),population([1.0,5.0,3.0,4.0,2.0]),arguments(0))
+    assert [individual.fitness for individual in result] == [9.0,7.0,5.0,4.0,0.5]
+    assert migrator.received == 3 and outbox.empty()
+
+def test_immigrants_evaluated_on_arrival():
+    inbox,outbox = queue.Queue(),queue.Queue()
+    migrator = islands.EliteMigrator(inbox,outbox,evaluate=True)
+    inbox.put([(np.array([2,2]),100.0)])
+    args = arguments(0,lambda candidates,args: [float(candidate.sum()) for candidate in candidates])
+    result = migrator(Random(0),population([1.0,5.0,3.0]),args)
+    assert [individual.fitness for individual in result] == [5.0,4.0,3.0]
+    assert args["_ec"].num_evaluations == 1
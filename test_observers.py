@@ -0,0 +1,52 @@
+#! /usr/bin/python3
+
+## @package test_observers
+#  The files written by observers.AsyncObserver.
+#
+#  Usage: python -m pytest test_observers.py
+
+import collections
+import glob
+
+import numpy as np
+
+import observers
+
+Individual = collections.namedtuple("Individual",["candidate","fitness","maximize"])
+
+## Run @observer over @generations lists of individuals and close it
+def observe(observer,generations):
+    for g,population in enumerate(generations):
+        observer(population,g,len(population)*(g+1),{})
+    observer.close()
+
+def test_statistics_and_individuals(tmp_path):
+    statistics,individuals = tmp_path / "statistics.csv",tmp_path / "individuals.csv"
+    observer = observers.AsyncObserver(str(statistics),str(individuals),display=False,plot=False,
+                                       extra=lambda: {"hits": 7})
+    population = [Individual(np.array([True,False,True]),3.0,True),
+                  Individual(np.array([False,False,True]),1.0,True),
+                  Individual(np.array([True,True,True]),2.0,True)]
+    observe(observer,[population,population])
+
+    lines = statistics.read_text().splitlines()
+    assert lines[0] == ",".join(observers.STATISTICS + ["hits"])
+    assert lines[1].split(",") == ["0","3","3","1.0","3.0","2.0","2.0","1.0","7"]
+    assert len(lines) == 3
+    assert individuals.read_text().splitlines()[:3] == ["0,0,3.0,101","0,1,1.0,001","0,2,2.0,111"]
+
+def test_cartesian_candidates(tmp_path):
+    individuals = tmp_path / "individuals.csv"
+    observer = observers.AsyncObserver(False,str(individuals),display=False,plot=False)
+    population = [Individual(np.array([[12,-1],[300,4]]),(2.0,5.0),True),
+                  Individual(np.array([[0,1],[1,0]]) * 25,(1.0,6.0),True)]
+    observe(observer,[population])
+    assert individuals.read_text().splitlines() == ["0,0,2.0 5.0,12 -1 300 4","0,1,1.0 6.0,0 25 25 0"]
+
+def test_default_file_names(tmp_path,monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    observe(observers.AsyncObserver(display=False,plot=False),[[Individual(np.array([True]),1.0,True)]])
+    assert len(glob.glob("ecgol-statistics-*.csv")) == 1
+    assert len(glob.glob("ecgol-individuals-*.csv")) == 1
+    observe(observers.AsyncObserver(False,False,display=False,plot=False),[[Individual(np.array([True]),1.0,True)]])
+    assert len(glob.glob("ecgol-*.csv")) == 2
@@ -0,0 +1,93 @@
+#! /usr/bin/python3
+
+## @package test_pareto
+#  The NSGA-II operators of pareto.py.
+#
+#  Usage: python -m pytest test_pareto.py
+
+from random import Random
+
+import numpy as np
+from inspyred.ec import Individual
+from inspyred.ec import replacers
+from inspyred.ec.emo import Pareto
+
+import pareto
+
+## Individuals with Pareto fitness @values, minimized as in main.py
+#
+#  Their candidates are lists: inspyred compares them with ==
+def individuals(values):
+    population = []
+    for k,value in enumerate(values):
+        individual = Individual([k],maximize=False)
+        individual.fitness = Pareto(list(value))
+        population.append(individual)
+    return population
+
+def test_best_individual_by_weighted_sum():
+    population = individuals([(10,0,0),(0,2,1),(3,1,0),(5,5,5)])
+    # the weighted sums of the first front are 10, 16 and 6
+    assert pareto.best_individual(population) is population[2]
+    assert pareto.weighted_fitness(population[1].fitness) == 16
+    assert pareto.weighted_fitness(4.5) == 4.5
+
+def test_best_individual_with_scalar_fitness():
+    population = [Individual(np.array([k])) for k in range(3)]
+    for individual,fitness in zip(population,(2.0,7.0,1.0)):
+        individual.fitness = fitness
+    assert pareto.best_individual(population) is population[1]
+
+## Fronts of @population peeled off with inspyred's comparison of individuals
+def inspyred_fronts(population):
+    fronts = []
+    remaining = set(range(len(population)))
+    while remaining:
+        front = {p for p in remaining if not any(population[p] < population[q] for q in remaining)}
+        fronts.append(front)
+        remaining -= front
+    return fronts
+
+## Random integer objectives, with ties and dominated duplicates
+def random_values(count,seed):
+    return np.random.default_rng(seed).integers(0,6,(count,3))
+
+def test_fronts_match_inspyred():
+    for seed in range(5):
+        population = individuals(random_values(60,seed))
+        ranks = pareto.non_dominated_sort(pareto.objectives(population))
+        fronts = inspyred_fronts(population)
+        assert ranks.max() == len(fronts) - 1
+        for r,front in enumerate(fronts):
+            assert set(np.flatnonzero(ranks == r)) == front
+
+def test_crowding_distance():
+    values = np.array([[0,4],[1,2],[3,1],[4,0],[2,4],[5,5]],dtype=float)
+    ranks = np.array([0,0,0,0,1,1])
+    distance = pareto.crowding_distance(values,ranks)
+    assert np.isinf(distance[[0,3,4,5]]).all()
+    # gaps of the neighbours over the extent of the front, 4 on both objectives
+    assert np.allclose(distance[1:3],[(3/4 + 3/4),(3/4 + 2/4)])
+
+def test_replacement_keeps_the_fronts_of_inspyred():
+    for seed in range(5):
+        combined = individuals(random_values(80,seed))
+        population,offspring = combined[:40],combined[40:]
+        survivors = pareto.nsga_replacement(Random(seed),population,[],offspring,{})
+        expected = replacers.nsga_replacement(Random(seed),population,[],offspring,{})
+        assert len(survivors) == len(expected) == len(population)
+        # the fronts kept whole are the same, crowding only splits the last one
+        ranks = pareto.non_dominated_sort(pareto.objectives(population + offspring))
+        last = max(ranks[individual.candidate[0]] for individual in survivors)
+        assert ({individual.candidate[0] for individual in survivors if ranks[individual.candidate[0]] < last} ==
+                {individual.candidate[0] for individual in expected if ranks[individual.candidate[0]] < last})
+
+def test_tournament_prefers_front_then_crowding():
+    population = individuals([(0,4,0),(1,2,0),(2,1,0),(4,0,0),(3,3,3)])
+    # the only individual of the second front loses all its tournaments
+    selected = pareto.crowded_tournament_selection(Random(1),population,{"num_selected": 20})
+    assert len(selected) == 20 and all(individual is not population[4] for individual in selected)
+    # everybody in the tournament: an extreme of the first front wins
+    args = {"num_selected": 5,"tournament_size": 5}
+    assert all(individual is population[0] or individual is population[3] for individual in
+               pareto.crowded_tournament_selection(Random(1),population,args))
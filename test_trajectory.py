@@ -0,0 +1,61 @@
+#! /usr/bin/python3
+
+## @package test_trajectory
+#  Trajectory files of trajectory.py, written and read back.
+#
+#  Usage: python -m pytest test_trajectory.py
+
+import numpy as np
+import pytest
+
+import life
+import trajectory
+
+@pytest.fixture
+def geometry(monkeypatch):
+    for name in ("N","min_bound","max_bound","GENOTYPE","GENOTYPExSIZE","GENOTYPEySIZE","PLACEMENT"):
+        monkeypatch.setattr(life,name,getattr(life,name))
+    monkeypatch.setattr(life,"CYCLE_HISTORY",0)
+    monkeypatch.setattr(life,"GENOTYPE","matrix")
+    life.set_geometry(30,(6,6),(5,5))
+
+## Matrix genotype of a glider heading to the bottom right corner
+def glider():
+    genotype = np.zeros((6,6),dtype=bool)
+    genotype[[1,2,3,3,3],[2,3,1,2,3]] = True
+    return genotype.ravel()
+
+@pytest.mark.parametrize("target",[(26,26),(3,27)])
+def test_round_trip(geometry,tmp_path,target):
+    path = str(tmp_path / "glider.trj")
+    count = trajectory.record(glider(),200,target,path)
+    grids = list(life.generations(life.genotype_to_grid(glider()),200,target))
+    loaded = trajectory.Trajectory(path)
+
+    assert len(loaded) == count == len(grids)
+    assert (loaded.size,loaded.target,loaded.max_it) == (life.N,target,200)
+    assert all((loaded[g] == grid).all() for g,grid in enumerate(grids))
+    assert (loaded.columns["alive"] == [grid.sum() for grid in grids]).all()
+    top,bottom,left,right = (loaded.columns[name] for name in ("top","bottom","left","right"))
+    rows = [np.flatnonzero(grid.any(axis=1)) for grid in grids]
+    assert (top == [r[0] for r in rows]).all() and (bottom == [r[-1] for r in rows]).all()
+    columns = [np.flatnonzero(grid.any(axis=0)) for grid in grids]
+    assert (left == [c[0] for c in columns]).all() and (right == [c[-1] for c in columns]).all()
+
+    # the distances measured by the core for the fitness
+    expected = life.simulate_batch(np.array(grids[:1]),200,target)[0]
+    assert loaded.columns["distance"].min() == expected[5]
+    assert len(loaded) - 1 == expected[2]
+    assert loaded.metrics(3) == {name: int(loaded.columns[name][3]) for name in trajectory.COLUMNS}
+
+def test_not_a_trajectory(tmp_path):
+    path = tmp_path / "other.trj"
+    path.write_bytes(bytes(trajectory.HEADER_SIZE))
+    with pytest.raises(ValueError):
+        trajectory.Trajectory(str(path))
+
+def test_gif_of_the_frames(geometry,tmp_path):
+    path = str(tmp_path / "glider.trj")
+    count = trajectory.record(glider(),40,(26,26),path)
+    writer = trajectory.Trajectory(path).save_gif(str(tmp_path / "glider.gif"),step=2,magnification=2)
+    assert writer.added == (count + 1) // 2
@@ -0,0 +1,147 @@
+#! /usr/bin/python3
+
+## @package trajectory
+#  Trajectory of a simulation, recorded in a single memory-mappable file.
+#
+#  Every generation simulated by the c++ core rules (life.generations) gets
+#  one row of metrics: live cells, bounding box (top,bottom,left,right, the
+#  true extremes of the alive cells), centre (x,y) and Chebyshev distance to
+#  the target, the last two as measured by the core for the fitness. The board
+#  itself is stored bit-packed, one fixed-size frame per generation, so any
+#  generation is read at random without simulating again.
+#
+#  File layout (little-endian):
+#     header   HEADER_SIZE bytes: magic, version, grid size (life.N), generations,
+#              target (x,y) and max_it
+#     frames   generations x size x ceil(size/8) bytes, np.packbits of the rows
+#     columns  len(COLUMNS) x generations int32, one column after the other
+#
+#  Usage: python trajectory.py bestindividual.trj [--generation i] [--gif out.gif]
+
+import argparse
+import os
+import struct
+import sys
+
+import numpy as np
+
+import gifwriter
+import life
+
+MAGIC = b"ECGOLTRJ"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQiii")
+HEADER_SIZE = 64
+COLUMNS = ["alive","top","bottom","left","right","x","y","distance"]
+
+## Write the trajectory of a simulation to @path, one generation at a time
+#
+#  Frames go to the file as they are added; the metrics are kept in memory
+#  and written after them by close().
+class TrajectoryWriter():
+    def __init__(self,path,size,target,max_it):
+        self.path = path
+        self.size = size
+        self.target = tuple(target)
+        self.max_it = max_it
+        self.rows = []
+        self.file = open(path,"wb")
+        self.file.write(bytes(HEADER_SIZE))
+
+    def add(self,grid):
+        grid = np.asarray(grid,dtype=bool)
+        top,bottom,left,right = (int(b[0]) for b in life.tight_bounds_batch(grid[np.newaxis]))
+        min_i,max_i,min_j,max_j = life.compute_bounds_batch(grid[np.newaxis])
+        x = int((max_j[0] + min_j[0]) // 2)
+        y = int((max_i[0] + min_i[0]) // 2)
+        distance = max(abs(x - self.target[0]),abs(y - self.target[1]))
+        self.rows.append((int(grid.sum()),top,bottom,left,right,x,y,distance))
+        self.file.write(np.packbits(grid,axis=1).tobytes())
+
+    def __len__(self):
+        return len(self.rows)
+
+    def close(self):
+        columns = np.array(self.rows,dtype="<i4").reshape(-1,len(COLUMNS))
+        self.file.write(np.ascontiguousarray(columns.T).tobytes())
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC,VERSION,self.size,len(self.rows),
+                                    self.target[0],self.target[1],self.max_it))
+        self.file.close()
+
+## Record the simulation of @genotype to @path
+#
+#  @return the number of generations recorded, the initial one included
+def record(genotype,max_it,target,path):
+    writer = TrajectoryWriter(path,life.N,target,max_it)
+    for grid in life.generations(life.genotype_to_grid(genotype),max_it,target):
+        writer.add(grid)
+    writer.close()
+    return len(writer)
+
+## Trajectory file written by TrajectoryWriter, memory-mapped
+#
+#  trajectory[i] is the grid of generation i, trajectory.columns[name] the
+#  metric @name of every generation.
+class Trajectory():
+    def __init__(self,path):
+        with open(path,"rb") as f:
+            header = f.read(HEADER.size)
+        magic,version,self.size,count,tx,ty,self.max_it = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(path + " is not a trajectory file")
+        self.target = (tx,ty)
+        self.row_bytes = (self.size + 7) // 8
+        self.frames = np.memmap(path,dtype=np.uint8,mode="r",offset=HEADER_SIZE,
+                                shape=(count,self.size,self.row_bytes))
+        table = np.memmap(path,dtype="<i4",mode="r",offset=HEADER_SIZE + self.frames.nbytes,
+                          shape=(len(COLUMNS),count))
+        self.columns = dict(zip(COLUMNS,table))
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self,generation):
+        return np.unpackbits(self.frames[generation],axis=-1,count=self.size).astype(bool)
+
+    ## Metrics of @generation as a {column: value} dict
+    def metrics(self,generation):
+        return {name: int(column[generation]) for name,column in self.columns.items()}
+
+    ## Animated GIF of generations @start to @stop, every @step, as life.create_animation
+    def save_gif(self,path,start=0,stop=None,step=1,magnification=10,loop=False):
+        # the size of the file includes the border of life.N
+        if life.N != self.size:
+            life.set_grid_size(self.size-2)
+        size = (self.size-2) * magnification
+        writer = gifwriter.GifWriter(size,size,life.ANIMATION_PALETTE,life.ANIMATION_DELAY)
+        for generation in range(*slice(start,stop,step).indices(len(self))):
+            writer.add_frame(life.animation_frame(self[generation],self.target,magnification))
+        writer.save(path,loop)
+        return writer
+
+def main_trajectory(argv=None):
+    parser = argparse.ArgumentParser(description="Show a trajectory recorded by trajectory.py")
+    parser.add_argument("file")
+    parser.add_argument("--generation",type=int,help="print the grid of one generation")
+    parser.add_argument("--gif",help="render the trajectory to an animated GIF")
+    options = parser.parse_args(argv)
+
+    trajectory = Trajectory(options.file)
+    print("{0}: {1} generations, grid {2}, target {3}, max_it {4}".format(
+          os.path.basename(options.file),len(trajectory),trajectory.size,trajectory.target,trajectory.max_it))
+    if options.generation is not None:
+        print(trajectory.metrics(options.generation))
+        for row in trajectory[options.generation]:
+            print("".join("#" if cell else "." for cell in row))
+    elif options.gif:
+        writer = trajectory.save_gif(options.gif)
+        print("{0}: {1} frames ({2} stored)".format(options.gif,writer.added,len(writer)))
+    else:
+        print("generation " + " ".join("{0:>8}".format(name) for name in COLUMNS))
+        for generation in range(len(trajectory)):
+            print("{0:>10} ".format(generation) +
+                  " ".join("{0:>8}".format(int(trajectory.columns[name][generation])) for name in COLUMNS))
+
+if __name__ == "__main__":
+    main_trajectory(sys.argv[1:])